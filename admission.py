@@ -0,0 +1,180 @@
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Optional
+
+# Shown instead of an OpenAI answer when the call was rejected and there is no dataset answer
+BUSY_RESPONSE = ("I'm receiving a lot of questions right now and can't give a full answer at the moment. "
+                 "Please try again in a little while.")
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing an upstream call that cannot start soon enough."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at rate tokens per second up to capacity.
+    Reservations may drive the balance negative; the caller then waits out the debt.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        """
+        Takes amount tokens and returns the seconds to wait before using them, or
+        None (taking nothing) when that wait would exceed max_wait.
+        """
+        # A single request larger than the bucket could never be admitted otherwise
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (amount - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= amount
+            return wait
+
+    def refund(self, amount: float):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+
+class ConcurrencyLimiter:
+    """
+    At most limit holders at once, with at most max_waiting callers queued (FIFO).
+    Unlike asyncio.Semaphore it is not bound to one event loop, so the API server
+    and Streamlit sessions (one loop per asyncio.run) can share it.
+    """
+
+    def __init__(self, limit: int, max_waiting: int):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float):
+        """Takes a slot; raises AdmissionRejected if the queue is full or timeout passes first."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            if len(self._waiters) >= self.max_waiting:
+                raise AdmissionRejected('queue_full')
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                owned = waiter not in self._waiters and waiter[1].done() and not waiter[1].cancelled()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            # A slot granted just before the timeout fired is ours to hand back; one
+            # still in flight to a cancelled future is passed on by _grant
+            if owned:
+                self.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise AdmissionRejected('queue_timeout') from None
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            # The slot moves straight to the next waiter, so active stays the same
+            loop, future = self._waiters.popleft()
+        loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future):
+        if future.done():
+            # The waiter timed out or was cancelled after being picked
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class AdmissionController:
+    """
+    Admission control for upstream OpenAI calls: a bounded concurrency limit with
+    a bounded wait queue, plus optional token buckets on requests per minute and
+    on estimated tokens per minute. A call that cannot start within max_wait
+    seconds is rejected with AdmissionRejected rather than left hanging.
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_queue: int = 256, max_wait: float = 5.0,
+                 requests_per_minute: float = 0, tokens_per_minute: float = 0, burst_seconds: float = 10.0):
+        self.max_wait = max_wait
+        self.limiter = ConcurrencyLimiter(max_concurrency, max_queue)
+        self.request_bucket = (TokenBucket(requests_per_minute / 60, requests_per_minute / 60 * burst_seconds)
+                               if requests_per_minute > 0 else None)
+        self.token_bucket = (TokenBucket(tokens_per_minute / 60, tokens_per_minute / 60 * burst_seconds)
+                             if tokens_per_minute > 0 else None)
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        return cls(
+            max_concurrency=int(os.getenv('OPENAI_MAX_CONCURRENCY', '32')),
+            max_queue=int(os.getenv('OPENAI_MAX_QUEUE', '256')),
+            max_wait=float(os.getenv('OPENAI_QUEUE_TIMEOUT', '5')),
+            requests_per_minute=float(os.getenv('OPENAI_RPM', '0')),
+            tokens_per_minute=float(os.getenv('OPENAI_TPM', '0')),
+            burst_seconds=float(os.getenv('OPENAI_BURST_SECONDS', '10')),
+        )
+
+    @property
+    def limits_tokens(self) -> bool:
+        return self.token_bucket is not None
+
+    @contextlib.asynccontextmanager
+    async def admit(self, estimated_tokens: int = 0) -> AsyncIterator[None]:
+        """Holds a concurrency slot (and rate budget) for the duration of the block."""
+        started = time.monotonic()
+        await self.limiter.acquire(self.max_wait)
+        try:
+            remaining = self.max_wait - (time.monotonic() - started)
+            await self._wait_for_rate(estimated_tokens, max(0.0, remaining))
+            yield
+        finally:
+            self.limiter.release()
+
+    async def _wait_for_rate(self, estimated_tokens: int, max_wait: float):
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = self.request_bucket.reserve(1, max_wait)
+            if wait is None:
+                raise AdmissionRejected('rate_limited')
+        if self.token_bucket is not None and estimated_tokens:
+            token_wait = self.token_bucket.reserve(estimated_tokens, max_wait)
+            if token_wait is None:
+                if self.request_bucket is not None:
+                    self.request_bucket.refund(1)
+                raise AdmissionRejected('rate_limited')
+            wait = max(wait, token_wait)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        return {'active': self.limiter.active, 'waiting': self.limiter.waiting,
+                'max_concurrency': self.limiter.limit, 'max_queue': self.limiter.max_waiting}
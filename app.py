@@ -2,11 +2,14 @@ import os
 import streamlit as st
 import requests
 from chatbot import run_chatbot
+from session_cache import SessionCache
 from dotenv import load_dotenv
+from logging_config import configure_logging
 import logging
 
 # Load environment variables
 load_dotenv()
+configure_logging()
 
 # {{ edit: Set page config as the first Streamlit command }}
 st.set_page_config(page_title="EvalAssist - Your Real Estate Assistant by WAIV", page_icon="🏠", layout="wide")
@@ -15,10 +18,21 @@ API_BASE_URL = os.getenv('VALTOOL_API_URL')
 if not API_BASE_URL:
     raise ValueError("VALTOOL_API_URL is not set in the environment variables")
 
+@st.cache_resource
+def get_session_cache():
+    # Created once per Streamlit process, not on every script rerun
+    return SessionCache.from_env()
+
+# Successful logins, so a re-login in this Streamlit process skips ValTool
+session_cache = get_session_cache()
+
 def authenticate_user(email, password):
     if not API_BASE_URL:
         st.error("API URL is not set. Please check your environment variables.")
         return None, None
+    cached = session_cache.get_by_credentials(email, password)
+    if cached is not None:
+        return cached
     url = f'{API_BASE_URL}/api/login'
     headers = {'Content-Type': 'application/json'}
     data = {'EMail': email, 'Password': password}
@@ -32,7 +46,7 @@ def authenticate_user(email, password):
         auth_token = auth_response.get('waivUser', {}).get('meta', {}).get('token', '')
         test_token = auth_response.get('waivUser', {}).get('meta', {}).get('test_token', '') or cookies.get('test_token') or cookies.get('evp-valuation', '')
         
-        return {
+        result = {
             'auth_token': auth_token,
             'test_token': test_token,
             'user_name': auth_response.get('waivUser', {}).get('data', {}).get('name', 'N/A'),
@@ -40,6 +54,8 @@ def authenticate_user(email, password):
             'phone': auth_response.get('waivUser', {}).get('data', {}).get('phone', 'N/A'),
             'organizations': [org.get('name', 'N/A') for org in auth_response.get('waivOrgs', {}).get('data', [])]
         }, cookies
+        session_cache.put(email, password, result, auth_token or None)
+        return result
     except requests.HTTPError as e:
         st.error(f"Authentication failed: {e}")
         return None, None
@@ -95,6 +111,7 @@ def main():
             st.markdown(f"**Organizations:** {', '.join(st.session_state.organizations)}")  # {{ edit: Display Organizations }} 
         
         if st.button("Logout"):
+            session_cache.invalidate(st.session_state.get('auth_token'))
             st.session_state.authenticated = False
             st.session_state.pop('auth_token', None)
             st.session_state.pop('test_token', None)
@@ -0,0 +1,87 @@
+"""
+Throughput of POST /chatbot/chat/batch versus the same questions sent one at a
+time to POST /chatbot/chat, in process over ASGI against a stub OpenAI server.
+The question mix (dataset, typo'd, on-topic without a match, off-topic) comes
+from the perf suite, with some repeats as in back-office jobs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batch --questions 200 --openai-latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from benchmarks.common import percentiles, print_table
+from benchmarks.stubs import mock_openai_app, serve_in_subprocess
+from benchmarks.suite import chat_questions
+
+
+async def measure(args, questions):
+    import httpx
+    from main import app
+
+    rows = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://app', timeout=600) as client:
+            latencies = []
+            started = time.perf_counter()
+            for question in questions:
+                call_started = time.perf_counter()
+                response = await client.post('/chatbot/chat', json={'user_question': question})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - call_started)
+            elapsed = time.perf_counter() - started
+            rows.append({'mode': 'sequential /chat', 'seconds': elapsed, 'questions_per_s': len(questions) / elapsed,
+                         **percentiles(latencies)})
+
+            # ASGITransport hands over the body only once the stream ends, so this
+            # measures the whole batch, not when the first lines arrive
+            answered = 0
+            started = time.perf_counter()
+            async with client.stream('POST', '/chatbot/chat/batch', json={'questions': questions}) as response:
+                async for line in response.aiter_lines():
+                    if line:
+                        answered += 'response' in json.loads(line)
+            elapsed = time.perf_counter() - started
+            rows.append({'mode': 'one /chat/batch', 'seconds': elapsed, 'questions_per_s': len(questions) / elapsed})
+            assert answered == len(questions), f"{answered} of {len(questions)} answered"
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--repeat-ratio', type=float, default=0.25, help="share of questions that are repeats")
+    parser.add_argument('--openai-latency', type=float, default=0.3, help="stub OpenAI latency (s)")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    questions = chat_questions(rng, args.questions)
+    for i in rng.sample(range(len(questions)), int(len(questions) * args.repeat_ratio)):
+        questions[i] = rng.choice(questions)
+
+    logging.disable(logging.INFO)
+    with serve_in_subprocess(mock_openai_app, latency=args.openai_latency,
+                             jitter=args.openai_latency / 5) as openai_url:
+        os.environ.update({
+            'OPENAI_BASE_URL': f"{openai_url}/v1",
+            'OPENAI_API_KEY': 'sk-mock',
+            'VALTOOL_API_URL': 'http://127.0.0.1:9',
+            'STARTUP_WARMUP': 'false',
+            'LOG_FILE': os.devnull,
+            # Every question goes upstream, in both modes
+            'RESPONSE_CACHE_SIZE': '0',
+        })
+        rows = asyncio.run(measure(args, questions))
+    print_table(rows, ['mode', 'seconds', 'questions_per_s', 'p50_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
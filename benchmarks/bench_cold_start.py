@@ -0,0 +1,70 @@
+"""
+Reports per-worker startup time and memory for the QA index, built from
+qa_data.py versus mapped from the compiled artifact (see qa_store).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import print_table
+
+# Runs in a fresh interpreter so nothing is already imported or cached in-process
+PROBE = r"""
+import json, time
+started = time.perf_counter()
+import qa_index
+qa_index.qa_index.match("how does autoval wrk")
+elapsed = time.perf_counter() - started
+status = {}
+with open('/proc/self/status') as f:
+    for line in f:
+        key, _, value = line.partition(':')
+        if key in ('VmRSS', 'RssAnon', 'RssFile'):
+            status[key] = int(value.split()[0]) / 1024
+print(json.dumps({'startup_ms': elapsed * 1000, **status}))
+"""
+
+
+def probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--matcher', default='ngram', choices=['ngram', 'vector'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact = os.path.join(tmp, 'qa_index.bin')
+        subprocess.run([sys.executable, '-m', 'qa_store', 'build', '--output', artifact], check=True,
+                       capture_output=True)
+        base_env = {**os.environ, 'QA_MATCHER': args.matcher, 'PYTHONDONTWRITEBYTECODE': '1'}
+        base_env.pop('QA_INDEX_PATH', None)
+
+        rows = []
+        for label, env in (('qa_data.py', base_env), ('mmap artifact', {**base_env, 'QA_INDEX_PATH': artifact})):
+            samples = [probe(env) for _ in range(args.runs)]
+            rows.append({
+                'source': label,
+                'startup_ms': statistics.median(s['startup_ms'] for s in samples),
+                'rss_mb': statistics.median(s['VmRSS'] for s in samples),
+                'anon_mb': statistics.median(s['RssAnon'] for s in samples),
+                'file_backed_mb': statistics.median(s['RssFile'] for s in samples),
+            })
+
+    print_table(rows, ['source', 'startup_ms', 'rss_mb', 'anon_mb', 'file_backed_mb'])
+    print("\nanon_mb is private to each worker; file_backed_mb is shared page cache across workers.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares the difflib full scan with the n-gram and vector (TF-IDF) matchers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fuzzy --sizes 465 2000 10000 --queries 100
+"""
+import argparse
+import random
+
+import qa_data
+from qa_index import QAIndex
+from benchmarks.common import percentiles, perturb, print_table, time_calls
+
+FILLERS = ['property', 'order', 'inspection', 'report', 'valuation', 'organization',
+           'borrower', 'loan', 'appraiser', 'comparable', 'portfolio', 'county']
+
+
+def synthetic_qa(size, rng):
+    """Grows qa_data.qa_dict to size entries with plausible question variants."""
+    base = list(qa_data.qa_dict.items())
+    qa = dict(base[:size])
+    while len(qa) < size:
+        question, answer = rng.choice(base)
+        words = question.rstrip('?').split()
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FILLERS))
+        words.insert(rng.randrange(len(words) + 1), f"#{len(qa)}")
+        qa[' '.join(words) + '?'] = answer
+    return qa
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[len(qa_data.qa_dict), 2000, 10000])
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        qa = synthetic_qa(size, rng)
+        questions = list(qa)
+        queries = [perturb(rng.choice(questions), rng, edits=rng.randint(1, 4)) for _ in range(args.queries)]
+
+        results = {}
+        for name in ('difflib', 'ngram', 'vector'):
+            index = QAIndex(qa, matcher=name)
+            matches = []
+            stats = percentiles(time_calls(lambda q: matches.append(index.match(q)), queries))
+            rows.append({'size': size, 'matcher': name, **stats})
+            results[name] = matches
+
+        for row in rows[-2:]:
+            agree = sum(a.answer == b.answer and a.match_type == b.match_type
+                        for a, b in zip(results['difflib'], results[row['matcher']]))
+            row['agreement'] = f"{agree}/{len(queries)}"
+
+    print_table(rows, ['size', 'matcher', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'agreement'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Tail latency of OpenAI calls under each call policy (see call_policy.py),
+against a stub OpenAI server where a small share of requests is 10x slower and
+some fail with a 503. Calls go through openai_gateway.create_chat_completion
+with the response cache off and distinct questions, so each one goes upstream.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_hedging --calls 400 --openai-latency 0.2 --tail-ratio 0.03
+"""
+import argparse
+import asyncio
+import logging
+import os
+
+from benchmarks.common import drive, percentiles, print_table
+from benchmarks.stubs import mock_openai_app, serve_in_subprocess
+
+
+def policies(args):
+    from call_policy import CallPolicy
+
+    timeout = args.openai_latency * 3
+    return {
+        'single attempt': CallPolicy(attempt_timeout=600, max_attempts=1),
+        'timeout + retries': CallPolicy(attempt_timeout=timeout, max_attempts=3, backoff=0.05, backoff_max=0.5),
+        'hedged at p95': CallPolicy(attempt_timeout=timeout, max_attempts=3, backoff=0.05, backoff_max=0.5,
+                                    hedge=True),
+    }
+
+
+async def measure(args):
+    import openai_gateway
+    from metrics import OPENAI_SECONDS
+
+    client = openai_gateway.get_openai_client()
+    model = 'gpt-3.5-turbo'
+    rows = []
+    for name, policy in policies(args).items():
+        openai_gateway.call_policy = policy
+        requests_before = sum(OPENAI_SECONDS.count(model, outcome) for outcome in ('ok', 'error', 'cancelled'))
+        failures = 0
+
+        async def send(i):
+            nonlocal failures
+            messages = [{'role': 'system', 'content': 'You are a test.'},
+                        {'role': 'user', 'content': f"{name} question {i}"}]
+            try:
+                await openai_gateway.create_chat_completion(client, model, messages)
+            except Exception:
+                failures += 1
+
+        elapsed, latencies = await drive(send, args.calls, args.concurrency)
+        requests = sum(OPENAI_SECONDS.count(model, outcome) for outcome in ('ok', 'error', 'cancelled'))
+        stats = policy.stats()
+        rows.append({'policy': name, 'failed': failures, **percentiles(latencies),
+                     'requests_per_call': (requests - requests_before) / args.calls,
+                     'retries': sum(stats['retries'].values()),
+                     'hedges_won': stats['hedges']['won'], 'hedges_lost': stats['hedges']['lost']})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--openai-latency', type=float, default=0.2, help="stub OpenAI latency (s)")
+    parser.add_argument('--jitter', type=float, default=0.05, help="stub latency jitter (s)")
+    parser.add_argument('--tail-ratio', type=float, default=0.03, help="share of 10x slower requests")
+    parser.add_argument('--error-ratio', type=float, default=0.01, help="share of requests failing with a 503")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with serve_in_subprocess(mock_openai_app, latency=args.openai_latency, jitter=args.jitter,
+                             tail_ratio=args.tail_ratio, error_ratio=args.error_ratio) as openai_url:
+        os.environ.update({
+            'OPENAI_BASE_URL': f"{openai_url}/v1",
+            'OPENAI_API_KEY': 'sk-mock',
+            'RESPONSE_CACHE_SIZE': '0',
+            'OPENAI_MAX_CONCURRENCY': str(args.concurrency * 2),
+        })
+        rows = asyncio.run(measure(args))
+    print(f"{args.calls} calls, {args.concurrency} concurrent; {args.tail_ratio:.0%} of requests 10x slower, "
+          f"{args.error_ratio:.0%} failing")
+    print_table(rows, ['policy', 'failed', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'requests_per_call',
+                       'retries', 'hedges_won', 'hedges_lost'])
+
+
+if __name__ == '__main__':
+    main()
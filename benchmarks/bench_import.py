@@ -0,0 +1,78 @@
+"""
+Import and warm-up time of the API and Streamlit entry points, each measured in a
+fresh interpreter so nothing is cached in-process.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import --runs 5
+
+Point --root at another checkout (e.g. a `git worktree` of an older commit) to
+compare import times across commits; the warm-up row needs warmup.py there.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import print_table
+
+PROBES = {
+    'import main (API worker)': "import main",
+    'import chatbot (Streamlit)': "import chatbot",
+    'import main + warm-up': "import asyncio, main, warmup\n"
+                             "asyncio.run(warmup.Warmup(warmup.default_steps()).run())",
+}
+
+
+def run_probe(code, root, env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    return elapsed if result.returncode == 0 else None
+
+
+def slowest_imports(statement, root, env, top):
+    """The slowest direct imports of statement's modules, by cumulative -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=root, env=env,
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Each nesting level adds two spaces after the separator space; keep level 1
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            rows.append({'module': name.strip(), 'cumulative_ms': int(cumulative) / 1000})
+    return sorted(rows, key=lambda row: -row['cumulative_ms'])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--root', default=os.getcwd(), help="checkout to measure")
+    parser.add_argument('--top', type=int, default=10, help="slowest top-level imports of main to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('OPENAI_API_KEY', 'sk-mock')
+    env.setdefault('VALTOOL_API_URL', 'http://valtool.invalid')
+
+    baseline = min(run_probe('pass', args.root, env) for _ in range(args.runs))
+    rows = []
+    for name, code in PROBES.items():
+        samples = [run_probe(code, args.root, env) for _ in range(args.runs)]
+        if any(sample is None for sample in samples):
+            rows.append({'probe': name, 'note': 'failed'})
+            continue
+        samples = [(sample - baseline) * 1000 for sample in samples]
+        rows.append({'probe': name, 'min_ms': min(samples), 'median_ms': statistics.median(samples)})
+    print_table(rows, ['probe', 'min_ms', 'median_ms', 'note'])
+    print()
+    print_table(slowest_imports('import main', args.root, env, args.top), ['module', 'cumulative_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Intent extraction latency and import cost: the full spaCy pipeline (as
+chatbot.py used to run it), the trimmed lemmatization-only pipeline (one call per
+question and batched through nlp.pipe) and the precomputed lemma table.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_intents --queries 500
+
+The spaCy rows need the en_core_web_sm model; they are skipped when it is not
+installed.
+"""
+import argparse
+import random
+import subprocess
+import sys
+import time
+
+import qa_data
+from intent_extractor import DEFAULT_SPACY_MODEL, SPACY_EXCLUDE, LemmaTableExtractor, SpacyExtractor
+from topic_classifier import US_PROPERTY_TOPICS
+from benchmarks.common import percentiles, print_table, time_calls
+
+IMPORTS = {
+    'spacy import (no model)': "import spacy",
+    'spacy full pipeline': f"import spacy; spacy.load({DEFAULT_SPACY_MODEL!r})",
+    'spacy lemmatizer only': f"import spacy; spacy.load({DEFAULT_SPACY_MODEL!r}, exclude={list(SPACY_EXCLUDE)!r})",
+    'lemma table': "import intent_extractor, topic_classifier; "
+                   "intent_extractor.LemmaTableExtractor(topic_classifier.US_PROPERTY_TOPICS)",
+}
+
+
+def import_seconds(statement, repeat):
+    """Best wall time of a fresh interpreter running statement, minus interpreter startup."""
+    def run(code):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', code], capture_output=True)
+            best = min(best, time.perf_counter() - started)
+            if result.returncode != 0:
+                return None
+        return best
+
+    baseline = run('pass')
+    elapsed = run(statement)
+    return None if elapsed is None else elapsed - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3, help="fresh interpreters per import measurement")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [rng.choice(list(qa_data.qa_dict)) for _ in range(args.queries)]
+    keywords = set(US_PROPERTY_TOPICS)
+
+    rows = {}
+    for name, statement in IMPORTS.items():
+        seconds = import_seconds(statement, args.repeat)
+        rows[name] = {'mode': name, 'import_ms': None if seconds is None else seconds * 1000}
+
+    lemma = LemmaTableExtractor(keywords)
+    rows['lemma table'].update(percentiles(time_calls(lemma.extract, queries)))
+
+    try:
+        import spacy
+        full_nlp = spacy.load(DEFAULT_SPACY_MODEL)
+    except (ImportError, OSError) as e:
+        print(f"spaCy rows skipped: {e}")
+    else:
+        trimmed = SpacyExtractor(keywords, batch_size=args.batch_size)
+        rows['spacy full pipeline'].update(percentiles(time_calls(full_nlp, queries)))
+        rows['spacy lemmatizer only'].update(percentiles(time_calls(trimmed.extract, queries)))
+
+        started = time.perf_counter()
+        batched = trimmed.extract_many(queries)
+        per_query = (time.perf_counter() - started) / len(queries) * 1000
+        name = f'spacy lemmatizer, nlp.pipe({args.batch_size})'
+        rows[name] = {'mode': name, 'mean_ms': per_query}
+
+        agree = sum(a == lemma.extract(q) for q, a in zip(queries, batched))
+        print(f"lemma table agrees with spaCy lemmas on {agree}/{len(queries)} questions")
+
+    print_table(list(rows.values()), ['mode', 'import_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Login latency through POST /auth/login against a local stub ValTool server:
+the previous per-call requests.post (new connection each time, run in a thread)
+versus the pooled keep-alive ValToolClient used by the router.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_login --requests 500 --concurrency 50 --latency 0.02 --tls
+
+--tls serves the stub over HTTPS with a throwaway self-signed certificate (needs
+the openssl CLI); without it loopback HTTP hides the handshake cost that
+connection reuse saves.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+import httpx
+import requests
+from fastapi import FastAPI
+
+from benchmarks.common import drive, percentiles, print_table
+from benchmarks.stubs import self_signed_cert, serve_in_subprocess, stub_valtool_app
+
+
+async def legacy(valtool_url, total, concurrency):
+    def login(i):
+        response = requests.post(f"{valtool_url}/api/login", json={'EMail': f"user{i}@example.com", 'Password': 'pw'},
+                                 headers={'Content-Type': 'application/json'})
+        response.raise_for_status()
+        return response.json()
+
+    return await drive(lambda i: asyncio.to_thread(login, i), total, concurrency)
+
+
+async def pooled(total, concurrency):
+    from routers import auth
+    from valtool_client import ValToolClient
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.valtool_client = ValToolClient.from_env()
+        yield
+        await app.state.valtool_client.aclose()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(auth.router, prefix="/auth")
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://app') as client:
+            async def login(i):
+                response = await client.post('/auth/login', json={'email': f"user{i}@example.com", 'password': 'pw'})
+                response.raise_for_status()
+
+            return await drive(login, total, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help="Stub ValTool latency in seconds")
+    parser.add_argument('--tls', action='store_true', help="Serve the stub over HTTPS")
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+
+    tmp = tempfile.TemporaryDirectory()
+    ssl_files = None
+    if args.tls:
+        ssl_files = self_signed_cert(tmp.name)
+        # Trust the throwaway certificate in both requests and httpx
+        os.environ['REQUESTS_CA_BUNDLE'] = os.environ['SSL_CERT_FILE'] = ssl_files[0]
+
+    with tmp, serve_in_subprocess(stub_valtool_app, ssl_files=ssl_files, latency=args.latency) as valtool_url:
+        os.environ['VALTOOL_API_URL'] = valtool_url
+        rows = []
+        for name, run in (('requests.post per call', lambda: legacy(valtool_url, args.requests, args.concurrency)),
+                          ('pooled ValToolClient', lambda: pooled(args.requests, args.concurrency))):
+            elapsed, latencies = asyncio.run(run())
+            rows.append({'client': name, 'throughput_rps': args.requests / elapsed, **percentiles(latencies)})
+
+    print_table(rows, ['client', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Per-event cost of the /metrics instrumentation: Counter.inc, Histogram.observe
+and a timed block, versus the same loop without recording anything.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_metrics --events 200000
+"""
+import argparse
+import time
+
+from metrics import Counter, Histogram
+from benchmarks.common import print_table
+
+
+def per_event_ns(fn, events):
+    started = time.perf_counter()
+    for _ in range(events):
+        fn()
+    return (time.perf_counter() - started) / events * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200000)
+    args = parser.parse_args()
+
+    counter = Counter('bench_matches', 'bench', ['match_type'])
+    histogram = Histogram('bench_stage_seconds', 'bench', ['stage'])
+
+    def timed_block():
+        with histogram.time('find_best_match'):
+            pass
+
+    baseline = per_event_ns(lambda: None, args.events)
+    rows = [
+        {'event': name, 'ns_per_event': per_event_ns(fn, args.events) - baseline}
+        for name, fn in (
+            ('Counter.inc(label)', lambda: counter.inc('partial')),
+            ('Histogram.observe(value, label)', lambda: histogram.observe(0.0042, 'openai')),
+            ('with Histogram.time(label)', timed_block),
+        )
+    ]
+    print_table(rows, ['event', 'ns_per_event'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Cost of applying a knowledge base edit: a full QAIndex build versus the
+incremental rebuild used by the QA_SOURCE_PATH watcher, for a few edited
+questions over corpora of growing size. Also checks that the incremental index
+answers a set of queries exactly like a fresh build of the same entries.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_reload --sizes 465 10000 50000 --edits 10
+"""
+import argparse
+import random
+import time
+
+from qa_index import QAIndex, normalize_question
+from qa_source import IncrementalIndexBuilder
+from benchmarks.bench_fuzzy import synthetic_qa
+from benchmarks.common import perturb, print_table
+
+
+def edit(entries, rng, count):
+    """Copy of entries with count answers changed, count questions removed and count added."""
+    entries = dict(entries)
+    keys = rng.sample(list(entries), 2 * count)
+    for key in keys[:count]:
+        question, answer = entries[key]
+        entries[key] = (question, answer + " (updated)")
+    for key in keys[count:]:
+        del entries[key]
+    for i in range(count):
+        question = f"How do I use new feature {i} in {rng.choice(['AutoVal', 'Waivit', 'ValTool'])}?"
+        entries[normalize_question(question)] = (question, f"Answer {i}.")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[465, 10000, 50000])
+    parser.add_argument('--edits', type=int, default=10, help="answers edited, questions removed and added")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        entries = {normalize_question(q): (q, a) for q, a in synthetic_qa(size, rng).items()}
+        builder = IncrementalIndexBuilder()
+        builder.build(entries)
+
+        full, incremental = [], []
+        for _ in range(args.rounds):
+            entries = edit(entries, rng, args.edits)
+            qa = {question: answer for question, answer in entries.values()}
+            started = time.perf_counter()
+            fresh = QAIndex(qa)
+            full.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            index = builder.update(entries)
+            incremental.append(time.perf_counter() - started)
+
+        questions = [question for question, _ in entries.values()]
+        queries = [perturb(rng.choice(questions), rng, edits=rng.randint(0, 3)) for _ in range(args.queries)]
+        mismatches = sum(index.match(q) != fresh.match(q) for q in queries)
+        rows.append({
+            'questions': len(entries),
+            'full_build_ms': sorted(full)[len(full) // 2] * 1000,
+            'incremental_ms': sorted(incremental)[len(incremental) // 2] * 1000,
+            'mismatches': mismatches,
+        })
+    print(f"{args.edits} answers edited, {args.edits} questions removed and {args.edits} added per round")
+    print_table(rows, ['questions', 'full_build_ms', 'incremental_ms', 'mismatches'])
+
+
+if __name__ == '__main__':
+    main()
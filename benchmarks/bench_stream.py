@@ -0,0 +1,63 @@
+"""
+Time-to-first-byte and total time of POST /chatbot/chat versus the SSE
+/chatbot/chat/stream endpoint, against a local mock OpenAI server.
+
+The app is served by uvicorn on a background thread (httpx's ASGI transport
+buffers whole responses, which would hide streaming). Run from the repository root:
+
+    python -m benchmarks.bench_stream --requests 20 --latency 2.0
+"""
+import argparse
+import os
+import time
+
+import httpx
+
+from benchmarks.common import percentiles, print_table
+from benchmarks.stubs import mock_openai_app, serve_in_subprocess, serve_in_thread
+
+
+def measure(client, path, questions):
+    ttfb, total = [], []
+    for question in questions:
+        started = time.perf_counter()
+        with client.stream('POST', path, json={'user_question': question, 'chat_history': []}) as response:
+            first = None
+            for _ in response.iter_raw():
+                if first is None:
+                    first = time.perf_counter() - started
+        total.append(time.perf_counter() - started)
+        ttfb.append(first if first is not None else total[-1])
+    return ttfb, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=2.0, help="Mock OpenAI full-completion latency in seconds")
+    args = parser.parse_args()
+
+    with serve_in_subprocess(mock_openai_app, latency=args.latency) as openai_url:
+        os.environ.update({
+            'OPENAI_BASE_URL': f"{openai_url}/v1",
+            'OPENAI_API_KEY': 'sk-mock',
+            'VALTOOL_API_URL': os.getenv('VALTOOL_API_URL', 'http://valtool.invalid'),
+            'RESPONSE_CACHE_SIZE': '0',
+        })
+        from main import app
+
+        rows = []
+        with serve_in_thread(app) as app_url, httpx.Client(base_url=app_url, timeout=60) as client:
+            for path in ('/chatbot/chat', '/chatbot/chat/stream'):
+                # A dataset near-miss: the dataset answer can be sent before the LLM call starts
+                questions = [f"How does AutoVal work for order {i}?" for i in range(args.requests)]
+                ttfb, total = measure(client, path, questions)
+                rows.append({'endpoint': path,
+                             'ttfb_p50_ms': percentiles(ttfb)['p50_ms'], 'ttfb_p95_ms': percentiles(ttfb)['p95_ms'],
+                             'total_p50_ms': percentiles(total)['p50_ms']})
+
+    print_table(rows, ['endpoint', 'ttfb_p50_ms', 'ttfb_p95_ms', 'total_p50_ms'])
+
+
+if __name__ == '__main__':
+    main()
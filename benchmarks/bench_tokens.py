@@ -0,0 +1,87 @@
+"""
+Microbenchmark of IntelligentChatbot._build_messages with 10/100/1000-message
+histories: the previous quadratic rebuild-and-recount loop versus the running
+total over memoized per-message counts.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tokens --sizes 10 100 1000 --repeat 5
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.common import print_table
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-mock')
+os.environ.setdefault('VALTOOL_API_URL', 'http://valtool.invalid')
+
+WORDS = "property valuation inspection mortgage appraisal market comps borrower county zoning lien".split()
+
+
+def legacy_build_messages(bot, user_question, chat_history):
+    """The pre-memoization algorithm, kept here as the baseline."""
+    import tiktoken
+
+    def num_tokens(messages, model):
+        encoding = tiktoken.encoding_for_model(model)
+        return sum(len(encoding.encode(m.get('content', ''))) for m in messages)
+
+    token_budget = 4096 - 500
+    messages = [{"role": "system", "content": bot._get_system_prompt()}]
+    for message in chat_history[-bot.max_history_length:][::-1]:
+        role, content = message.get('role'), message.get('content')
+        if role and content:
+            temp_messages = messages + [{"role": role, "content": content}]
+            if num_tokens(temp_messages, bot.model) <= token_budget:
+                messages.append({"role": role, "content": content})
+            else:
+                break
+    messages = messages[:1] + messages[1:][::-1]
+    messages.append({"role": "user", "content": user_question})
+    return messages
+
+
+def make_history(size, rng):
+    return [{'role': 'user' if i % 2 == 0 else 'assistant',
+             'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))}
+            for i in range(size)]
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from chatbot import IntelligentChatbot
+    from token_budget import get_token_counter
+
+    bot = IntelligentChatbot()
+    rng = random.Random(3)
+    rows = []
+    for size in args.sizes:
+        history = make_history(size, rng)
+        bot.max_history_length = size
+        legacy = timed(lambda: legacy_build_messages(bot, "What is AutoVal?", history), args.repeat)
+        get_token_counter(bot.model)._counts.clear()
+        cold = timed(lambda: bot._build_messages("What is AutoVal?", history), 1)
+        warm = timed(lambda: bot._build_messages("What is AutoVal?", history), args.repeat)
+        rows.append({'history': size, 'legacy_ms': legacy, 'new_cold_ms': cold, 'new_warm_ms': warm,
+                     'speedup_warm': legacy / warm if warm else None})
+
+    print_table(rows, ['history', 'legacy_ms', 'new_cold_ms', 'new_warm_ms', 'speedup_warm'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares the previous topic checks (per-call regex compile in the router,
+substring scan over every keyword in IntelligentChatbot) with the precompiled
+TopicClassifier.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_topics --queries 5000
+"""
+import argparse
+import random
+import re
+
+import qa_data
+from topic_classifier import ROUTER_KEYWORDS, US_PROPERTY_TOPICS, router_topic_classifier, topic_classifier
+from benchmarks.common import percentiles, print_table, time_calls
+
+OFF_TOPIC = ["Who won the football game last night?", "What's a good pasta recipe?",
+             "How do I reset my phone?", "Tell me a joke about cats.", "What time is it in Tokyo?"]
+
+
+def legacy_router(question):
+    pattern = r'\b(' + '|'.join(re.escape(k) for k in ROUTER_KEYWORDS) + r')\b'
+    return re.search(pattern, question.lower()) is not None
+
+
+ALL_KEYWORDS = {k.lower() for keywords in US_PROPERTY_TOPICS.values() for k in keywords}
+
+
+def legacy_chatbot(question):
+    question_lower = question.lower()
+    return any(keyword in question_lower for keyword in ALL_KEYWORDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = list(qa_data.qa_dict) + OFF_TOPIC * 20
+    queries = [rng.choice(pool) for _ in range(args.queries)]
+
+    rows = []
+    for name, fn in (('router regex (compiled per call)', legacy_router),
+                     ('chatbot substring scan', legacy_chatbot),
+                     ('router TopicClassifier.is_relevant', router_topic_classifier.is_relevant),
+                     ('TopicClassifier.is_relevant', topic_classifier.is_relevant),
+                     ('TopicClassifier.categories', topic_classifier.categories)):
+        rows.append({'check': name, **percentiles(time_calls(fn, queries))})
+    for row in rows:
+        for key in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'):
+            row[key.replace('_ms', '_us')] = row.pop(key) * 1000
+    print_table(rows, ['check', 'mean_us', 'p50_us', 'p95_us', 'p99_us'])
+
+
+if __name__ == '__main__':
+    main()
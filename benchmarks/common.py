@@ -0,0 +1,83 @@
+import asyncio
+import random
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """Returns mean/p50/p95/p99/max of samples (seconds) in milliseconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))] * 1000
+
+    return {
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': pick(0.50),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def time_calls(fn: Callable, inputs: Sequence) -> List[float]:
+    """Calls fn once per input and returns the per-call durations in seconds."""
+    durations = []
+    for item in inputs:
+        started = time.perf_counter()
+        fn(item)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+async def drive(send: Callable[[int], Awaitable], total: int, concurrency: int) -> Tuple[float, List[float]]:
+    """
+    Awaits send(i) for i in range(total), at most concurrency at a time; returns
+    (wall seconds, per-call latencies in seconds).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await send(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - started, latencies
+
+
+def perturb(text: str, rng: random.Random, edits: int = 2) -> str:
+    """Applies a few random typos (drop, swap, duplicate) to text."""
+    chars = list(text)
+    for _ in range(edits):
+        if len(chars) < 3:
+            break
+        i = rng.randrange(1, len(chars) - 1)
+        op = rng.choice(('drop', 'swap', 'dup'))
+        if op == 'drop':
+            del chars[i]
+        elif op == 'swap':
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        else:
+            chars.insert(i, chars[i])
+    return ''.join(chars)
+
+
+def print_table(rows: List[Dict], columns: Sequence[str]):
+    """Prints rows as a fixed-width table."""
+    widths = [max([len(c)] + [len(_fmt(r.get(c))) for r in rows]) for c in columns]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(_fmt(row.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return '' if value is None else str(value)
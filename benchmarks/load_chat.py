@@ -0,0 +1,72 @@
+"""
+Load test for POST /chatbot/chat against a local mock OpenAI server.
+
+Every request is an on-topic question with no dataset match, so each one makes
+an upstream call; the response cache is disabled. With the async pipeline, wall
+time at concurrency N stays close to a single upstream round-trip instead of N
+of them.
+
+Run from the repository root:
+
+    python -m benchmarks.load_chat --requests 200 --concurrency 1 50 200 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.common import percentiles, print_table
+from benchmarks.stubs import mock_openai_app, serve_in_subprocess
+
+
+async def run_load(app, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://app', timeout=120) as client:
+        async def one(i):
+            nonlocal failures
+            payload = {'user_question': f"What are current mortgage rates trends in county {i}?", 'chat_history': []}
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post('/chatbot/chat', json=payload)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 50, 200])
+    parser.add_argument('--latency', type=float, default=0.5, help="Mock OpenAI latency in seconds")
+    args = parser.parse_args()
+
+    with serve_in_subprocess(mock_openai_app, latency=args.latency) as openai_url:
+        os.environ.update({
+            'OPENAI_BASE_URL': f"{openai_url}/v1",
+            'OPENAI_API_KEY': 'sk-mock',
+            'VALTOOL_API_URL': os.getenv('VALTOOL_API_URL', 'http://valtool.invalid'),
+            'RESPONSE_CACHE_SIZE': '0',
+        })
+        from main import app
+
+        rows = []
+        for concurrency in args.concurrency:
+            total = args.requests if concurrency > 1 else min(args.requests, 10)
+            elapsed, latencies, failures = asyncio.run(run_load(app, total, concurrency))
+            rows.append({'concurrency': concurrency, 'requests': total, 'failures': failures,
+                         'throughput_rps': total / elapsed, **percentiles(latencies)})
+
+    print_table(rows, ['concurrency', 'requests', 'failures', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
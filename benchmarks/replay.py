@@ -0,0 +1,197 @@
+"""
+Replays captured traffic (see traffic_capture.py / TRAFFIC_CAPTURE_PATH) against
+the app in process, with stub ValTool and OpenAI servers, and reports latency
+distributions per endpoint and the match-type mix next to the captured ones.
+
+Requests keep their captured spacing, compressed by --speed (2 = twice as fast);
+--speed 0 sends them back to back, at most --concurrency at a time. Messages of
+one captured conversation are sent in order within one replayed conversation.
+Stub latencies have no jitter by default, so two replays of the same capture
+against the same code only differ by the code's own timing.
+
+Streamed answers (/chat/stream, Server-Sent Events) and batches (/chat/batch,
+NDJSON) are read to the end, so their latency is to the last byte; failures the
+app reports inside a 200 body are counted as 'error_in_body'.
+
+Run from the repository root:
+
+    TRAFFIC_CAPTURE_PATH=traffic-prod.jsonl uvicorn main:app      # capture
+    python -m benchmarks.replay traffic-prod.jsonl --speed 4 --output replay-after.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.common import percentiles, print_table
+from benchmarks.stubs import mock_openai_app, serve_in_subprocess, stub_valtool_app
+
+MATCH_TYPES = ('exact', 'partial', 'no_match', 'off_topic')
+
+
+def load_capture(path, limit=None):
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    records.sort(key=lambda record: record['ts'])
+    return records[:limit] if limit else records
+
+
+def conversation_id_of(path, response):
+    """The conversation id the app assigned, from a /chat JSON body or the first /chat/stream event."""
+    if response.status_code != 200:
+        return None
+    if path == '/chatbot/chat/stream':
+        for event in response.text.split('\n\n'):
+            if event.startswith('event: conversation\n'):
+                return json.loads(event.split('data: ', 1)[1]).get('conversation_id')
+        return None
+    return response.json().get('conversation_id')
+
+
+def body_errors(path, response):
+    """Failures reported inside a 200 response: SSE error events, or NDJSON lines with an error."""
+    if response.status_code != 200:
+        return 0
+    if path == '/chatbot/chat/stream':
+        return sum(event.startswith('event: error\n') for event in response.text.split('\n\n'))
+    if path == '/chatbot/chat/batch':
+        return sum('error' in json.loads(line) for line in response.text.splitlines() if line.strip())
+    return 0
+
+
+def mix(counts):
+    total = sum(counts.values())
+    return {match_type: counts.get(match_type, 0) / total if total else 0.0 for match_type in MATCH_TYPES}
+
+
+async def replay(args, records):
+    import httpx
+    from main import app
+    from metrics import MATCHES
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    # Captured conversation pseudonym -> future of the conversation id the replay got for it
+    conversations = {}
+    matches_before = {match_type: MATCHES.value(match_type) for match_type in MATCH_TYPES}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://app', timeout=120) as client:
+            semaphore = asyncio.Semaphore(args.concurrency if args.speed == 0 else 1 << 30)
+
+            async def send(record):
+                path = record['path']
+                if path == '/auth/login':
+                    password = 'wrong' if record.get('status') == 401 else 'replay'
+                    body = {'email': f"{record['user']}@replay.invalid", 'password': password}
+                    conversation = None
+                elif path == '/chatbot/chat/batch':
+                    body = {'questions': record['questions']}
+                    conversation = None
+                else:
+                    body = {'user_question': record['question']}
+                    conversation = record.get('conversation')
+                    if conversation in conversations:
+                        body['conversation_id'] = await conversations[conversation]
+                    elif conversation is not None:
+                        conversations[conversation] = asyncio.get_running_loop().create_future()
+                    if 'conversation_id' not in body and record.get('history_turns'):
+                        body['chat_history'] = [{'role': 'user', 'content': '', 'step': 'info_gathering'}
+                                                for _ in range(record['history_turns'])]
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(path, json=body)
+                    latencies[path].append(time.perf_counter() - started)
+                statuses[path][response.status_code] += 1
+                errors = body_errors(path, response)
+                if errors:
+                    statuses[path]['error_in_body'] += errors
+                if conversation is not None and not conversations[conversation].done():
+                    conversations[conversation].set_result(conversation_id_of(path, response))
+
+            tasks = []
+            started = time.perf_counter()
+            first_ts = records[0]['ts'] if records else 0.0
+            for record in records:
+                if args.speed > 0:
+                    delay = (record['ts'] - first_ts) / args.speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(send(record)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+
+    replayed_matches = Counter({match_type: int(MATCHES.value(match_type) - matches_before[match_type])
+                                for match_type in MATCH_TYPES})
+    return elapsed, latencies, statuses, replayed_matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help="JSONL written by TRAFFIC_CAPTURE_PATH")
+    parser.add_argument('--speed', type=float, default=1.0, help="time compression; 0 = back to back")
+    parser.add_argument('--concurrency', type=int, default=16, help="in-flight requests when --speed 0")
+    parser.add_argument('--limit', type=int, help="replay only the first N requests")
+    parser.add_argument('--openai-latency', type=float, default=0.3, help="stub OpenAI latency (s)")
+    parser.add_argument('--valtool-latency', type=float, default=0.05, help="stub ValTool latency (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="stub latency jitter (s)")
+    parser.add_argument('--response-cache', action='store_true',
+                        help="keep the OpenAI response cache on (off by default so every call goes upstream)")
+    parser.add_argument('--output', help="also write the report as JSON")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture, args.limit)
+    logging.disable(logging.INFO)
+    with serve_in_subprocess(mock_openai_app, latency=args.openai_latency, jitter=args.jitter) as openai_url, \
+            serve_in_subprocess(stub_valtool_app, latency=args.valtool_latency, jitter=args.jitter) as valtool_url:
+        os.environ.update({
+            'OPENAI_BASE_URL': f"{openai_url}/v1",
+            'OPENAI_API_KEY': 'sk-mock',
+            'VALTOOL_API_URL': valtool_url,
+            'STARTUP_WARMUP': 'false',
+            'LOG_FILE': os.devnull,
+        })
+        # Replayed traffic must not be captured again
+        os.environ.pop('TRAFFIC_CAPTURE_PATH', None)
+        if not args.response_cache:
+            os.environ['RESPONSE_CACHE_SIZE'] = '0'
+        elapsed, latencies, statuses, replayed_matches = asyncio.run(replay(args, records))
+
+    captured_latencies = defaultdict(list)
+    captured_matches = Counter()
+    for record in records:
+        captured_latencies[record['path']].append(record.get('duration_ms', 0.0) / 1000)
+        if record.get('match_type'):
+            captured_matches[record['match_type']] += 1
+        captured_matches.update(record.get('match_types') or {})
+
+    endpoints = []
+    for path in sorted(latencies):
+        for source, samples in (('replay', latencies[path]), ('captured', captured_latencies[path])):
+            endpoints.append({'endpoint': path, 'source': source, 'requests': len(samples), **percentiles(samples),
+                              'statuses': dict(statuses[path]) if source == 'replay' else
+                              dict(Counter(r.get('status') for r in records if r['path'] == path))})
+    match_rows = [{'source': source, **{k: f"{v:.1%}" for k, v in mix(counts).items()}, 'total': sum(counts.values())}
+                  for source, counts in (('replay', replayed_matches), ('captured', captured_matches))]
+
+    print(f"Replayed {len(records)} requests in {elapsed:.2f}s (speed {args.speed or 'max'})\n")
+    print_table(endpoints, ['endpoint', 'source', 'requests', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'statuses'])
+    print()
+    print_table(match_rows, ['source', *MATCH_TYPES, 'total'])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'elapsed_s': elapsed, 'endpoints': endpoints,
+                       'match_mix': {'replay': dict(replayed_matches), 'captured': dict(captured_matches)}},
+                      f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
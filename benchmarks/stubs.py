@@ -0,0 +1,178 @@
+"""
+Local stand-ins for the upstream services, with configurable latency, so the
+app can be load tested without network access or API spend.
+"""
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _delay(latency: float, jitter: float) -> float:
+    return max(0.0, latency + random.uniform(-jitter, jitter))
+
+
+def mock_openai_app(latency: float = 0.5, jitter: float = 0.0, token_interval: float = 0.02,
+                    tail_ratio: float = 0.0, tail_factor: float = 10.0, error_ratio: float = 0.0) -> FastAPI:
+    """
+    Minimal /v1/chat/completions endpoint that answers after latency seconds. With
+    stream=True the first token arrives after latency / 4 and the rest every
+    token_interval seconds. A tail_ratio share of requests takes tail_factor times
+    as long, and an error_ratio share fails with a 503.
+    """
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            # A timed out or hedged-against client went away
+            return Response(status_code=499)
+        app.state.requests += 1
+        if random.random() < error_ratio:
+            return JSONResponse({'error': {'message': 'Service unavailable', 'type': 'server_error'}},
+                                status_code=503)
+        delay = _delay(latency, jitter) * (tail_factor if random.random() < tail_ratio else 1)
+        question = body['messages'][-1]['content']
+        content = f"Mock answer to: {question}"
+        if body.get('stream'):
+            return StreamingResponse(_stream_chunks(body, content, delay / 4, token_interval),
+                                     media_type='text/event-stream')
+        await asyncio.sleep(delay)
+        return {
+            'id': f"chatcmpl-mock-{app.state.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-3.5-turbo'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': 20, 'completion_tokens': len(content.split()),
+                      'total_tokens': 20 + len(content.split())},
+        }
+
+    return app
+
+
+def stub_valtool_app(latency: float = 0.05, jitter: float = 0.0) -> FastAPI:
+    """Stand-in for ValTool's /api/login returning the payload shape routers/auth.py reads."""
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.post("/api/login")
+    async def login(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        await asyncio.sleep(_delay(latency, jitter))
+        if body.get('Password') == 'wrong':
+            return JSONResponse({'message': 'Invalid credentials'}, status_code=401)
+        email = body.get('EMail', '')
+        return {
+            'waivUser': {
+                'meta': {'token': f"token-{email}-{app.state.requests}", 'test_token': f"test-{email}"},
+                'data': {'name': email.split('@')[0].title(), 'email': email, 'phone': '555-0100'},
+            },
+            'waivOrgs': {'data': [{'name': 'Stub Lending Co'}]},
+        }
+
+    return app
+
+
+async def _stream_chunks(body, content, first_token_delay, token_interval):
+    await asyncio.sleep(first_token_delay)
+    created = int(time.time())
+    for i, word in enumerate(content.split(' ')):
+        if i:
+            await asyncio.sleep(token_interval)
+        chunk = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': created,
+                 'model': body.get('model', 'gpt-3.5-turbo'),
+                 'choices': [{'index': 0, 'finish_reason': None,
+                              'delta': {'content': word if i == 0 else f" {word}"}}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    if (body.get('stream_options') or {}).get('include_usage'):
+        completion_tokens = len(content.split())
+        usage = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': created,
+                 'model': body.get('model', 'gpt-3.5-turbo'), 'choices': [],
+                 'usage': {'prompt_tokens': 20, 'completion_tokens': completion_tokens,
+                           'total_tokens': 20 + completion_tokens}}
+        yield f"data: {json.dumps(usage)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@contextlib.contextmanager
+def serve_in_thread(app: FastAPI, port: int = 0):
+    """Runs app with uvicorn on a background thread; yields its base URL."""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning',
+                                           limit_concurrency=10000, backlog=4096))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+def self_signed_cert(directory: str):
+    """Creates a self-signed certificate for 127.0.0.1 with openssl; returns (certfile, keyfile)."""
+    certfile, keyfile = os.path.join(directory, 'stub.crt'), os.path.join(directory, 'stub.key')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-keyout', keyfile, '-out', certfile, '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1'], check=True, capture_output=True)
+    return certfile, keyfile
+
+
+def _run_factory(factory, kwargs, port, ssl_files):
+    certfile, keyfile = ssl_files or (None, None)
+    uvicorn.run(factory(**kwargs), host='127.0.0.1', port=port, log_level='warning',
+                limit_concurrency=10000, backlog=4096, ssl_certfile=certfile, ssl_keyfile=keyfile)
+
+
+@contextlib.contextmanager
+def serve_in_subprocess(factory, port: int = 0, ssl_files=None, **kwargs):
+    """
+    Runs factory(**kwargs) with uvicorn in a separate process; yields its base URL.
+    Keeps the stub's CPU work off the interpreter being measured. Pass
+    ssl_files=(certfile, keyfile) to serve HTTPS, so connection reuse saves real
+    TLS handshakes.
+    """
+    port = port or free_port()
+    process = multiprocessing.get_context('spawn').Process(target=_run_factory,
+                                                           args=(factory, kwargs, port, ssl_files), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 15
+    while True:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                break
+        except OSError:
+            if time.monotonic() > deadline or not process.is_alive():
+                process.terminate()
+                raise RuntimeError(f"Stub server {factory.__name__} did not start")
+            time.sleep(0.05)
+    try:
+        yield f"{'https' if ssl_files else 'http'}://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.join(timeout=5)
@@ -0,0 +1,243 @@
+"""
+Reproducible performance suite: microbenchmarks of the chat hot path plus an
+in-process ASGI load test of /auth/login and /chatbot/chat against local stub
+ValTool and OpenAI servers. Writes a JSON report; `compare` diffs two reports,
+e.g. from two commits.
+
+Run from the repository root:
+
+    python -m benchmarks.suite run --output perf-before.json
+    git checkout <other commit>
+    python -m benchmarks.suite run --output perf-after.json
+    python -m benchmarks.suite compare perf-before.json perf-after.json
+
+Use --quick for a smoke run. Microbenchmarks that need the tiktoken encoding
+are reported as skipped when it cannot be loaded.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.common import drive, percentiles, perturb, print_table, time_calls
+from benchmarks.stubs import mock_openai_app, serve_in_subprocess, stub_valtool_app
+
+OFF_TOPIC = ["Who won the football game last night?", "What's a good pasta recipe?",
+             "How do I reset my phone?", "Tell me a joke about cats."]
+ON_TOPIC = ["What are current mortgage rates trends in county {i}?",
+            "How does zoning affect rental property investors in district {i}?",
+            "Should I refinance my loan in region {i}?"]
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+        return revision + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(latencies, elapsed=None, calls=None):
+    stats = percentiles(latencies)
+    calls = calls if calls is not None else len(latencies)
+    elapsed = elapsed if elapsed is not None else sum(latencies)
+    stats['throughput_per_s'] = calls / elapsed if elapsed else 0.0
+    stats['calls'] = calls
+    return stats
+
+
+def chat_questions(rng, count):
+    """A fixed mix: exact dataset questions, typo'd ones, on-topic without a match, off-topic."""
+    import qa_data
+
+    dataset = list(qa_data.qa_dict)
+    questions = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            questions.append(rng.choice(dataset))
+        elif kind == 1:
+            questions.append(perturb(rng.choice(dataset), rng, edits=2))
+        elif kind == 2:
+            questions.append(rng.choice(ON_TOPIC).format(i=i))
+        else:
+            questions.append(rng.choice(OFF_TOPIC))
+    return questions
+
+
+def run_micro(args, rng):
+    from routers.chatbot_backend import find_best_match, is_us_property_related
+    from chatbot import get_chatbot
+    from token_budget import num_tokens_from_messages
+
+    questions = chat_questions(rng, args.micro_calls)
+    # Load the lazily built QA index outside the measurement
+    find_best_match(questions[0])
+    results = {
+        'find_best_match': summarize(time_calls(find_best_match, questions)),
+        'is_us_property_related': summarize(time_calls(is_us_property_related, questions)),
+    }
+
+    bot = get_chatbot()
+    for size in args.history_sizes:
+        history = [{'role': 'user' if j % 2 == 0 else 'assistant',
+                    'content': f"{rng.choice(questions)} (turn {j})"} for j in range(size)]
+        try:
+            results[f'_build_messages[history={size}]'] = summarize(
+                time_calls(lambda q: bot._build_messages(q, history), questions))
+            messages = bot._build_messages(questions[0], history)
+            results[f'num_tokens_from_messages[history={size}]'] = summarize(
+                time_calls(lambda _: num_tokens_from_messages(messages, bot.model), questions))
+        except Exception as e:
+            # tiktoken downloads its encoding on first use; report rather than fail offline
+            reason = f"{type(e).__name__}: {e}"[:200]
+            results[f'_build_messages[history={size}]'] = {'skipped': reason}
+            results[f'num_tokens_from_messages[history={size}]'] = {'skipped': reason}
+    return results
+
+
+async def run_load(args, rng):
+    import httpx
+    from main import app
+
+    questions = chat_questions(rng, args.requests)
+    results = {}
+    # The lifespan creates the pooled ValTool client; ASGITransport does not run it by itself
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://app', timeout=120) as client:
+            failures = 0
+
+            async def login(i):
+                nonlocal failures
+                # A pool of users, so repeat logins exercise the session cache as in production
+                user = i % args.login_users
+                response = await client.post('/auth/login', json={'email': f"user{user}@example.com",
+                                                                  'password': 'pw'})
+                failures += response.status_code != 200
+
+            async def chat(i):
+                nonlocal failures
+                response = await client.post('/chatbot/chat', json={'user_question': questions[i]})
+                failures += response.status_code != 200
+
+            for name, send in (('POST /auth/login', login), ('POST /chatbot/chat', chat)):
+                for concurrency in args.concurrency:
+                    failures = 0
+                    elapsed, latencies = await drive(send, args.requests, concurrency)
+                    results[f'{name} c={concurrency}'] = {**summarize(latencies, elapsed), 'failures': failures}
+    return results
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    logging.disable(logging.INFO)
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+    }
+    with serve_in_subprocess(mock_openai_app, latency=args.openai_latency, jitter=args.openai_latency / 5) as openai_url, \
+            serve_in_subprocess(stub_valtool_app, latency=args.valtool_latency,
+                                jitter=args.valtool_latency / 5) as valtool_url:
+        os.environ.update({
+            'OPENAI_BASE_URL': f"{openai_url}/v1",
+            'OPENAI_API_KEY': 'sk-mock',
+            'VALTOOL_API_URL': valtool_url,
+            'STARTUP_WARMUP': 'false',
+            'LOG_FILE': os.devnull,
+        })
+        if not args.response_cache:
+            os.environ['RESPONSE_CACHE_SIZE'] = '0'
+        report['micro'] = run_micro(args, rng)
+        report['load'] = asyncio.run(run_load(args, rng))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\nWrote {args.output}")
+
+
+def print_report(report):
+    columns = ['benchmark', 'throughput_per_s', 'p50_ms', 'p95_ms', 'p99_ms', 'note']
+    for section in ('micro', 'load'):
+        rows = []
+        for name, stats in report.get(section, {}).items():
+            note = stats.get('skipped', '')[:60]
+            if stats.get('failures'):
+                note = f"{stats['failures']} failures"
+            rows.append({'benchmark': name, **{k: v for k, v in stats.items() if k in columns}, 'note': note})
+        print(f"\n[{section}]")
+        print_table(rows, columns)
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"before: {before['meta'].get('revision')}  after: {after['meta'].get('revision')}")
+    for section in ('micro', 'load'):
+        rows = []
+        for name, old in before.get(section, {}).items():
+            new = after.get(section, {}).get(name)
+            if new is None or 'skipped' in old or 'skipped' in new:
+                continue
+            row = {'benchmark': name}
+            for metric in ('p50_ms', 'p99_ms', 'throughput_per_s'):
+                row[metric] = f"{old[metric]:.3f} -> {new[metric]:.3f}"
+                row[metric.replace('_ms', '').replace('_per_s', '') + '_change'] = \
+                    f"{(new[metric] - old[metric]) / old[metric] * 100:+.1f}%" if old[metric] else ''
+            rows.append(row)
+        print(f"\n[{section}]")
+        print_table(rows, ['benchmark', 'p50_ms', 'p50_change', 'p99_ms', 'p99_change',
+                           'throughput_per_s', 'throughput_change'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the suite and write a JSON report")
+    run_parser.add_argument('--output', default='perf-report.json')
+    run_parser.add_argument('--quick', action='store_true', help="small sizes for a smoke run")
+    run_parser.add_argument('--micro-calls', type=int, default=2000)
+    run_parser.add_argument('--history-sizes', type=int, nargs='+', default=[10, 100])
+    run_parser.add_argument('--requests', type=int, default=400, help="requests per load scenario")
+    run_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    run_parser.add_argument('--login-users', type=int, default=50)
+    run_parser.add_argument('--openai-latency', type=float, default=0.3, help="stub OpenAI latency (s)")
+    run_parser.add_argument('--valtool-latency', type=float, default=0.05, help="stub ValTool latency (s)")
+    run_parser.add_argument('--response-cache', action='store_true',
+                            help="keep the OpenAI response cache on (off by default so every call goes upstream)")
+    run_parser.add_argument('--seed', type=int, default=7)
+
+    compare_parser = commands.add_parser('compare', help="diff two JSON reports")
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        compare(args)
+        return
+    if args.quick:
+        args.micro_calls, args.requests, args.concurrency = 200, 40, [1, 8]
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Timeouts, retries and hedging for upstream calls (OpenAI completions).
+
+Each attempt gets at most attempt_timeout seconds. Attempts that fail with a
+retryable error (a timeout, a dropped connection, 408/409/429 or a 5xx) are
+retried up to max_attempts in total, after a jittered exponential backoff
+(tenacity's wait_random_exponential). Anything else, such as a bad request or
+an AdmissionRejected, is raised right away.
+
+With hedging on, an attempt that has not finished after the hedge delay (the
+recent p95 latency for its key, or OPENAI_HEDGE_DELAY) gets a second, identical
+request; whichever finishes first is used and the other is cancelled. Hedges
+are capped at hedge_max_ratio of calls, so a slowdown of the whole upstream does
+not double the load on it.
+"""
+import asyncio
+import math
+import os
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from admission import AdmissionRejected
+
+T = TypeVar('T')
+
+# attempt(hedge) makes one upstream request; hedge is True for the second request of a hedged attempt
+Attempt = Callable[[bool], Awaitable[T]]
+
+# Retried besides 429 (rate_limited) and 5xx (server_error)
+RETRYABLE_STATUS = {408: 'timeout', 409: 'conflict'}
+
+
+def retry_reason(error: BaseException) -> Optional[str]:
+    """Why error is worth retrying (timeout, connection, rate_limited, server_error, conflict), or None."""
+    if isinstance(error, AdmissionRejected):
+        return None
+    if isinstance(error, TimeoutError):
+        return 'timeout'
+    try:
+        import openai
+    except ImportError:
+        return None
+    if isinstance(error, openai.APITimeoutError):
+        return 'timeout'
+    if isinstance(error, openai.APIConnectionError):
+        return 'connection'
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            return 'rate_limited'
+        if error.status_code >= 500:
+            return 'server_error'
+        return RETRYABLE_STATUS.get(error.status_code)
+    return None
+
+
+class LatencyWindow:
+    """The last size latencies of one key, with a cached quantile refreshed every few samples."""
+
+    REFRESH_EVERY = 16
+
+    def __init__(self, size: int, quantile: float):
+        self.quantile = quantile
+        self._samples: deque = deque(maxlen=size)
+        self._added = 0
+        self._value: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self._added += 1
+        if self._value is None or self._added % self.REFRESH_EVERY == 0:
+            ordered = sorted(self._samples)
+            self._value = ordered[min(len(ordered) - 1, math.ceil(self.quantile * len(ordered)) - 1)]
+
+    def value(self) -> Optional[float]:
+        return self._value
+
+
+class CallPolicy:
+    """Retries and optional hedging around single upstream requests; shared across event loops."""
+
+    def __init__(self, attempt_timeout: float = 30.0, max_attempts: int = 3, backoff: float = 0.5,
+                 backoff_max: float = 8.0, hedge: bool = False, hedge_delay: Optional[float] = None,
+                 hedge_quantile: float = 0.95, hedge_min_samples: int = 20, hedge_max_ratio: float = 0.1,
+                 window: int = 500):
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        self.window = window
+        self._latencies: Dict[Hashable, LatencyWindow] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries: Dict[str, int] = {}
+        # Every hedge sent ends up in exactly one of won, lost (the first request finished
+        # first) or failed (it raised, e.g. could not be admitted)
+        self.hedges_sent = 0
+        self.hedges = {'won': 0, 'lost': 0, 'failed': 0}
+
+    @classmethod
+    def from_env(cls) -> 'CallPolicy':
+        hedge_delay = os.getenv('OPENAI_HEDGE_DELAY')
+        return cls(
+            attempt_timeout=float(os.getenv('OPENAI_ATTEMPT_TIMEOUT', '30')),
+            max_attempts=int(os.getenv('OPENAI_MAX_ATTEMPTS', '3')),
+            backoff=float(os.getenv('OPENAI_RETRY_BACKOFF', '0.5')),
+            backoff_max=float(os.getenv('OPENAI_RETRY_BACKOFF_MAX', '8')),
+            hedge=os.getenv('OPENAI_HEDGE', 'false').lower() in ('1', 'true', 'yes'),
+            hedge_delay=float(hedge_delay) if hedge_delay else None,
+            hedge_quantile=float(os.getenv('OPENAI_HEDGE_QUANTILE', '0.95')),
+            hedge_min_samples=int(os.getenv('OPENAI_HEDGE_MIN_SAMPLES', '20')),
+            hedge_max_ratio=float(os.getenv('OPENAI_HEDGE_MAX_RATIO', '0.1')),
+        )
+
+    async def call(self, attempt: Attempt, key: Hashable = None, hedge: bool = True) -> T:
+        """
+        Returns the result of the first successful attempt(...), retrying retryable
+        errors. Latencies are tracked per key (the model) for the hedge delay;
+        hedge=False never hedges (streams, whose second copy would cost a whole
+        generation).
+        """
+        hedge = hedge and self.hedge
+        if hedge:
+            with self._lock:
+                self.calls += 1
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.backoff_max),
+            retry=retry_if_exception(lambda error: retry_reason(error) is not None),
+            before_sleep=self._count_retry,
+            reraise=True,
+        )
+        return await retrying(self._attempt, attempt, key, hedge)
+
+    def hedge_delay_for(self, key: Hashable) -> Optional[float]:
+        """Seconds after which an unfinished request is hedged, or None while too few latencies are known."""
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        window = self._latencies.get(key)
+        if window is None or len(window) < self.hedge_min_samples:
+            return None
+        return window.value()
+
+    async def _attempt(self, attempt: Attempt, key: Hashable, hedge: bool) -> T:
+        if not hedge:
+            return await asyncio.wait_for(attempt(False), self.attempt_timeout)
+
+        loop = asyncio.get_running_loop()
+        first = loop.create_task(self._timed(attempt, key, False))
+        second = None
+        try:
+            delay = self.hedge_delay_for(key)
+            if delay is not None:
+                done, _ = await asyncio.wait({first}, timeout=delay)
+                if not done and self._may_hedge():
+                    second = loop.create_task(self._timed(attempt, key, True))
+            if second is None:
+                return await first
+            return await self._race(first, second)
+        finally:
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _race(self, first: asyncio.Task, second: asyncio.Task) -> T:
+        done, _ = await asyncio.wait({first, second}, return_when=asyncio.FIRST_COMPLETED)
+        winner = first if first in done and first.exception() is None else \
+            second if second in done and second.exception() is None else None
+        if winner is None:
+            # Whichever finished first failed; the other may still succeed
+            await asyncio.wait({first, second})
+            winner = first if first.exception() is None else second if second.exception() is None else None
+        with self._lock:
+            if winner is second:
+                self.hedges['won'] += 1
+            elif second.done() and not second.cancelled() and second.exception() is not None:
+                self.hedges['failed'] += 1
+            else:
+                self.hedges['lost'] += 1
+        if winner is None:
+            raise first.exception()
+        return winner.result()
+
+    async def _timed(self, attempt: Attempt, key: Hashable, hedge: bool) -> T:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # A cancelled loser is not counted: the time it had run would only drag the p95 down
+        result = await asyncio.wait_for(attempt(hedge), self.attempt_timeout)
+        self._observe(key, loop.time() - started)
+        return result
+
+    def _observe(self, key: Hashable, seconds: float):
+        with self._lock:
+            window = self._latencies.get(key)
+            if window is None:
+                window = self._latencies[key] = LatencyWindow(self.window, self.hedge_quantile)
+            window.add(seconds)
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges_sent >= self.hedge_max_ratio * self.calls:
+                return False
+            self.hedges_sent += 1
+            return True
+
+    def _count_retry(self, retry_state):
+        reason = retry_reason(retry_state.outcome.exception())
+        with self._lock:
+            self.retries[reason] = self.retries.get(reason, 0) + 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {'calls': self.calls, 'hedges_sent': self.hedges_sent, 'hedges': dict(self.hedges),
+                    'retries': dict(self.retries),
+                    'hedge_delays': {key: self.hedge_delay_for(key) for key in self._latencies}}
@@ -1,28 +1,24 @@
 import asyncio
 import os
 import logging
-from typing import List, Dict, Tuple
-import streamlit as st
-import aiohttp
-from openai import AsyncOpenAI
-import spacy  # Install spaCy and download the English model
-import tiktoken  # Add this import for token counting
-import qa_data
-import difflib
+import threading
+from typing import List, Dict, Optional, Tuple
+import functools
+from qa_index import get_qa_index
+from context_manager import ContextManager, ContextStore
+from conversation_store import new_conversation_id
+from topic_classifier import topic_classifier
+from intent_extractor import create_intent_extractor
+from admission import BUSY_RESPONSE, AdmissionRejected
+from openai_gateway import create_chat_completion, get_openai_client
+from metrics import MATCHES, STAGE_SECONDS
+from token_budget import get_token_counter
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("chatbot_debug.log"),
-        logging.StreamHandler()
-    ]
-)
+# Handlers are configured by the entry point (main.py / app.py, see logging_config)
 logger = logging.getLogger(__name__)
 
 API_BASE_URL = os.getenv('VALTOOL_API_URL')
@@ -33,145 +29,116 @@ if not API_BASE_URL or not OPENAI_API_KEY:
     logger.error("Missing required environment variables. Please check your .env file.")
     raise EnvironmentError("Missing required environment variables")
 
-nlp = spacy.load('en_core_web_sm')
 
 
+def render_system_prompt(topic: Optional[str], dialogue_state: Optional[Dict] = None) -> str:
+    prompt = f"""
+        You are EvalAssist, an expert assistant for WAIV, specializing in the US property market.
+        Current Topic: {topic}
+        Provide accurate, up-to-date information with a professional yet friendly tone.
+        Be sure to consider the user's previous questions and intents: {dialogue_state or {}}
+        """
+    return prompt.strip()
 
-def num_tokens_from_messages(messages, model="gpt-3.5-turbo"):
-    """Returns the number of tokens used by a list of messages."""
-    encoding = tiktoken.encoding_for_model(model)
-    num_tokens = 0
-    for message in messages:
-        content = message.get('content', '')
-        num_tokens += len(encoding.encode(content))
-    return num_tokens
 
-class ContextManager:
-    def __init__(self):
-        self.dialogue_state = {}
-        self.current_topic = None
-        self.user_id = None
-        self.topic_mapping = {
-            "market": "market",
-            "valuation": "valuation",
-            "inspection": "inspection",
-            "transaction": "transaction",
-            "financing": "financing",
-            "ownership": "ownership",
-            "investment": "investment",
-            "legal": "legal",
-            "professional": "professional",
-            "platform": "platform"
-        }
-
-    def update_context(self, user_input, intents):
-        detected_topic = self._determine_topic(intents)
-        if detected_topic != self.current_topic:
-            # Handle topic shift
-            self.current_topic = detected_topic
-
-    def _determine_topic(self, intents):
-        # Implement logic to determine the topic based on intents
-        if not intents:
-            return self.current_topic  # Remain on the current topic if no new intents found
-        # Example logic
-        for intent in intents:
-            if intent in self.topic_mapping:
-                return self.topic_mapping[intent]
-        return 'general'
-
-    def get_context(self):
-        # Return relevant context for the conversation
-        # For now, we can return an empty list or implement if needed
-        return []
+@functools.lru_cache(maxsize=64)
+def cached_system_prompt(topic: Optional[str]) -> str:
+    """System prompt for a conversation on topic with no dialogue state."""
+    return render_system_prompt(topic)
+
 
 class IntelligentChatbot:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
         self.model = "gpt-3.5-turbo"  # Use appropriate model name
         self.max_history_length = 10
-        self.us_property_topics = {
-            "market": ["market", "trends", "housing market", "real estate market"],
-            "valuation": ["evaluation", "appraisal", "value", "estimate", "AVM", "FASTR", "AVV", "BPO", "CMA"],
-            "inspection": ["inspection", "home inspection", "property inspection", "condition", "inspector"],
-            "transaction": ["buying", "selling", "offer", "contract", "negotiation", "closing"],
-            "financing": ["mortgage", "rates", "loan", "credit", "pre-approval", "down payment", "refinance"],
-            "ownership": ["property tax", "homeowner's insurance", "insurance", "repair", "maintenance", "HOA"],
-            "investment": ["investment", "rental", "REIT", "investor", "rental property", "income property"],
-            "legal": ["title", "deed", "lien", "zoning", "permit", "occupancy"],
-            "professional": ["broker", "agent", "appraiser", "inspector", "attorney"],
-            "platform": ["Waivit", "Waiv"]  # Keep platform-specific terms separate
-        }
-        # Create sets for faster lookup
-        self.all_keywords_set = {keyword.lower() for keywords in self.us_property_topics.values() for keyword in keywords}
-        self.keyword_to_category = {keyword.lower(): category for category, keywords in self.us_property_topics.items() for keyword in keywords}
+        self.topic_classifier = topic_classifier
+        self.us_property_topics = topic_classifier.topics
         self.intent_keywords = set(self.us_property_topics.keys())
-        self.context_manager = ContextManager()
-        self.qa_dict = qa_data.qa_dict
+        self.intent_extractor = create_intent_extractor(self.intent_keywords)
+        # One ContextManager per conversation; see generate_response
+        self.contexts = ContextStore.from_env()
 
-    def find_best_match(self, user_question):
-        """Finds the best match for the user query in qa_dict."""
-        questions = list(self.qa_dict.keys())
-        user_question_normalized = user_question.strip().lower()
-
-        # Exact match (case-insensitive)
-        if user_question_normalized in (q.lower() for q in questions):
-            original_question = next(q for q in questions if q.lower() == user_question_normalized)
-            return self.qa_dict[original_question], 'exact'
+    @property
+    def client(self):
+        return get_openai_client()
 
-        # Partial match using difflib for fuzzy matching
-        matches = difflib.get_close_matches(user_question_normalized, (q.lower() for q in questions), n=1, cutoff=0.6)
-        if matches:
-            matched_question = next(q for q in questions if q.lower() == matches[0])
-            return self.qa_dict[matched_question], 'partial'
+    @property
+    def qa_index(self):
+        return get_qa_index()
 
-        return None, 'no_match'
+    def find_best_match(self, user_question):
+        """Finds the best match for the user query in the shared QA index."""
+        return self.qa_index.find_best_match(user_question)
 
-    async def generate_response(self, user_question: str, chat_history: List[Dict[str, str]]) -> Tuple[str, str]:
+    async def generate_response(self, user_question: str, chat_history: List[Dict[str, str]],
+                                conversation_id: Optional[str] = None) -> Tuple[str, str]:
         # Check for exact or partial match in qa_dict
-        answer, match_type = self.find_best_match(user_question)
+        with STAGE_SECONDS.time('find_best_match'):
+            answer, match_type = self.find_best_match(user_question)
         
         if match_type == 'exact':
+            MATCHES.inc('exact')
             return answer, "qa_exact_match"
-        elif match_type == 'partial':
+
+        context = self.contexts.get(conversation_id)
+        if match_type == 'partial':
+            MATCHES.inc('partial')
             # Build messages using the existing method to ensure correct format
-            messages = self._build_messages(user_question, chat_history)
-            generated_response = await self._generate_openai_response(messages)
+            with STAGE_SECONDS.time('build_messages'):
+                messages = self._build_messages(user_question, chat_history, context)
+            try:
+                generated_response = await self._generate_openai_response(messages)
+            except AdmissionRejected:
+                # Overloaded: answer from the dataset alone rather than wait for OpenAI
+                return answer, "qa_partial_match"
             combined_response = f"{answer}\n\nAdditional information:\n{generated_response}"
             return combined_response, "qa_partial_match"
         
         # If no match, proceed with existing generation logic
-        if not self._is_relevant_question(user_question):
+        with STAGE_SECONDS.time('topic_gate'):
+            relevant = self._is_relevant_question(user_question)
+        if not relevant:
+            MATCHES.inc('off_topic')
             return self._generate_fenced_response(), "off_topic_response"
+        MATCHES.inc('no_match')
 
-        intents = self._extract_intents(user_question)
-        self.context_manager.update_context(user_question, intents)
+        with STAGE_SECONDS.time('intent_extraction'):
+            intents = self._extract_intents(user_question)
+        context.update_context(user_question, intents)
 
-        messages = self._build_messages(user_question, chat_history)
+        with STAGE_SECONDS.time('build_messages'):
+            messages = self._build_messages(user_question, chat_history, context)
 
-        response = await self._generate_openai_response(messages)
+        try:
+            response = await self._generate_openai_response(messages)
+        except AdmissionRejected:
+            return BUSY_RESPONSE, "busy_response"
         return response, "chatbot_response"
 
     async def _generate_openai_response(self, messages: List[Dict[str, str]]):
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages
-            )
-
-            chatbot_response = response.choices[0].message.content
+            chatbot_response = await create_chat_completion(self.client, self.model, messages)
             return chatbot_response
 
+        except AdmissionRejected:
+            raise
         except Exception as e:
-            logger.error(f"Error generating response: {e}", exc_info=True)
-            return "I apologize, but I'm having trouble processing your request. Can I assist you with anything else about the US property market or WAIV services?", "error_response"
+            logger.error("Error generating response: %s", e, exc_info=True)
+            return "I apologize, but I'm having trouble processing your request. Can I assist you with anything else about the US property market or WAIV services?"
 
-    def _build_messages(self, user_question: str, chat_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    def _build_messages(self, user_question: str, chat_history: List[Dict[str, str]],
+                        context: Optional[ContextManager] = None) -> List[Dict[str, str]]:
         # Token limit for the model (e.g., 4096 for gpt-3.5-turbo)
         max_tokens = 4096
         token_budget = max_tokens - 500  # Reserve tokens for response and current input
 
-        messages = [{"role": "system", "content": self._get_system_prompt()}]
+        system_prompt = self._get_system_prompt(context)
+        messages = [{"role": "system", "content": system_prompt}]
+
+        # Keep a running total instead of recounting the whole list for each message;
+        # per-message counts are memoized across requests since history is resent every turn
+        counter = get_token_counter(self.model)
+        total_tokens = counter.count(system_prompt)
 
         # Include chat history while respecting token limit
         reversed_history = chat_history[-self.max_history_length:][::-1]  # Start from the most recent message
@@ -182,11 +149,11 @@ class IntelligentChatbot:
                 # Ensure the role is one of the allowed values
                 if role not in ['system', 'user', 'assistant']:
                     role = 'user'  # Default to user if role is unknown
-                
-                temp_messages = messages + [{"role": role, "content": content}]
-                total_tokens = num_tokens_from_messages(temp_messages, model=self.model)
-                if total_tokens <= token_budget:
+
+                message_tokens = counter.count(content)
+                if total_tokens + message_tokens <= token_budget:
                     messages.append({"role": role, "content": content})
+                    total_tokens += message_tokens
                 else:
                     break  # Stop adding history if token limit is reached
 
@@ -196,19 +163,20 @@ class IntelligentChatbot:
         # Add the current user question
         messages.append({"role": "user", "content": user_question})
 
-        # Log the messages for debugging
-        logger.debug(f"Built messages: {messages}")
+        # Log the messages for debugging; formatting the whole list is only worth it at DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Built messages: %s", messages)
 
         return messages
 
     def _is_relevant_question(self, question: str) -> bool:
-        question_lower = question.lower()
-        for keyword in self.all_keywords_set:
-            if keyword in question_lower:
-                category = self.keyword_to_category.get(keyword, "unknown")
-                logger.debug(f"Keyword '{keyword}' matched in category '{category}'.")
-                return True
-        return False
+        match = self.topic_classifier.first_match(question)
+        if match is None:
+            return False
+        if logger.isEnabledFor(logging.DEBUG):
+            keyword, categories = match
+            logger.debug("Keyword '%s' matched in categories %s.", keyword, categories)
+        return True
 
     def _generate_fenced_response(self) -> str:
         return (
@@ -217,33 +185,42 @@ class IntelligentChatbot:
             "any questions related to real estate in the United States or WAIV services. What would you like to know?"
         )
 
-    def _get_system_prompt(self) -> str:
-        prompt = f"""
-        You are EvalAssist, an expert assistant for WAIV, specializing in the US property market.
-        Current Topic: {self.context_manager.current_topic}
-        Provide accurate, up-to-date information with a professional yet friendly tone.
-        Be sure to consider the user's previous questions and intents: {self.context_manager.dialogue_state}
-        """
-        return prompt.strip()
+    def _get_system_prompt(self, context: Optional[ContextManager] = None) -> str:
+        if context is not None and context.has_dialogue_state:
+            return render_system_prompt(context.current_topic, context.dialogue_state)
+        # Without dialogue state the prompt only depends on the topic, so it is shared
+        return cached_system_prompt(context.current_topic if context is not None else None)
 
     def _extract_intents(self, user_question):
-        doc = nlp(user_question)
-        intents = []
-        for token in doc:
-            # Check if the lemma of the token matches any intent keyword
-            if token.lemma_.lower() in self.intent_keywords:
-                intents.append(token.lemma_.lower())
-        return intents
+        return self.intent_extractor.extract(user_question)
+
+
+_chatbot: Optional[IntelligentChatbot] = None
+_chatbot_lock = threading.Lock()
 
-chatbot = IntelligentChatbot()
 
-async def handle_user_query_frontend(user_question: str, chat_history: List[Dict[str, str]]) -> Tuple[str, str]:
+def get_chatbot() -> IntelligentChatbot:
+    """
+    The process-wide chatbot, shared by the FastAPI router and the Streamlit app.
+    Built once even when warm-up steps ask for it from several threads at once.
+    """
+    global _chatbot
+    if _chatbot is None:
+        with _chatbot_lock:
+            if _chatbot is None:
+                _chatbot = IntelligentChatbot()
+    return _chatbot
+
+async def handle_user_query_frontend(user_question: str, chat_history: List[Dict[str, str]],
+                                     conversation_id: Optional[str] = None) -> Tuple[str, str]:
     # First, try to generate a response locally
-    response_text, next_step = await chatbot.generate_response(user_question, chat_history)
+    response_text, next_step = await get_chatbot().generate_response(user_question, chat_history, conversation_id)
 
     return response_text, next_step
 
 def run_chatbot():
+    import streamlit as st
+
     if 'authenticated' not in st.session_state or not st.session_state.authenticated:
         st.warning("Please log in to use the chatbot.")
         return
@@ -252,6 +229,9 @@ def run_chatbot():
 
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
+    # Keys this browser session's ContextManager in the shared chatbot
+    if 'conversation_id' not in st.session_state:
+        st.session_state.conversation_id = new_conversation_id()
 
     for message in st.session_state.chat_history:
         with st.chat_message(message["role"]):
@@ -266,7 +246,8 @@ def run_chatbot():
 
         # Send user input to backend and get response and step
         with st.spinner("Thinking..."):
-            response_text, next_step = asyncio.run(handle_user_query_frontend(prompt, st.session_state.chat_history))
+            response_text, next_step = asyncio.run(handle_user_query_frontend(prompt, st.session_state.chat_history,
+                                                                           st.session_state.conversation_id))
 
         with st.chat_message("assistant"):
             st.markdown(response_text)
@@ -1,20 +1,49 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+TOPIC_MAPPING = {
+    "market": "market",
+    "valuation": "valuation",
+    "inspection": "inspection",
+    "transaction": "transaction",
+    "financing": "financing",
+    "ownership": "ownership",
+    "investment": "investment",
+    "legal": "legal",
+    "professional": "professional",
+    "platform": "platform"
+}
+
+
 class ContextManager:
-    def __init__(self):
-        self.dialogue_state = {}
-        self.current_topic = None
-        self.user_id = None
-        self.topic_mapping = {  # **Add this block**
-            "market": "market",
-            "valuation": "valuation",
-            "inspection": "inspection",
-            "transaction": "transaction",
-            "financing": "financing",
-            "ownership": "ownership",
-            "investment": "investment",
-            "legal": "legal",
-            "professional": "professional",
-            "platform": "platform"
-        }
+    """
+    Dialogue context of one conversation.
+
+    Uses __slots__ and shares the topic mapping at class level so tens of thousands
+    of live conversations cost a small fixed size each; dialogue_state is only
+    allocated once something is stored in it.
+    """
+
+    __slots__ = ('current_topic', 'user_id', '_dialogue_state')
+
+    topic_mapping = TOPIC_MAPPING
+
+    def __init__(self, user_id: Optional[str] = None):
+        self.current_topic: Optional[str] = None
+        self.user_id = user_id
+        self._dialogue_state: Optional[Dict] = None
+
+    @property
+    def dialogue_state(self) -> Dict:
+        if self._dialogue_state is None:
+            self._dialogue_state = {}
+        return self._dialogue_state
+
+    @property
+    def has_dialogue_state(self) -> bool:
+        return bool(self._dialogue_state)
 
     def update_context(self, user_input, intents):
         detected_topic = self._determine_topic(intents)
@@ -30,4 +59,46 @@ class ContextManager:
         for intent in intents:
             if intent in self.topic_mapping:
                 return self.topic_mapping[intent]
-        return 'general'
\ No newline at end of file
+        return 'general'
+
+    def get_context(self):
+        # Return relevant context for the conversation
+        # For now, we can return an empty list or implement if needed
+        return []
+
+
+class ContextStore:
+    """
+    ContextManager per conversation, kept in a bounded LRU keyed by conversation
+    (or session) id so concurrent users never share a topic.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._contexts: "OrderedDict[str, ContextManager]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ContextStore':
+        return cls(int(os.getenv('CONTEXT_STORE_SIZE', '10000')))
+
+    def get(self, conversation_id: Optional[str]) -> ContextManager:
+        """The context for conversation_id, created on first use; a throwaway one when there is no id."""
+        if not conversation_id:
+            return ContextManager()
+        with self._lock:
+            context = self._contexts.get(conversation_id)
+            if context is not None:
+                self._contexts.move_to_end(conversation_id)
+                return context
+            context = self._contexts[conversation_id] = ContextManager()
+            while len(self._contexts) > self.max_entries:
+                self._contexts.popitem(last=False)
+            return context
+
+    def discard(self, conversation_id: str):
+        with self._lock:
+            self._contexts.pop(conversation_id, None)
+
+    def __len__(self) -> int:
+        return len(self._contexts)
@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Turn = Dict[str, Optional[str]]
+
+
+def new_conversation_id() -> str:
+    return uuid.uuid4().hex
+
+
+class InMemoryConversationStore:
+    """
+    Conversation turns kept in process memory.
+
+    At most max_conversations are kept (least recently active evicted first),
+    conversations idle for longer than idle_ttl seconds are dropped, and each one
+    keeps only its last max_turns turns.
+    """
+
+    # Calls only take an in-process lock, so async callers make them inline
+    blocking = False
+
+    def __init__(self, max_conversations: int = 10000, idle_ttl: float = 3600.0, max_turns: int = 100):
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self._conversations: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, turns: Iterable[Turn] = ()) -> str:
+        """Starts a conversation, optionally seeded with existing turns, and returns its id."""
+        conversation_id = new_conversation_id()
+        with self._lock:
+            self._conversations[conversation_id] = (time.monotonic(), list(turns)[-self.max_turns:])
+            self._evict()
+        return conversation_id
+
+    def get(self, conversation_id: str) -> Optional[List[Turn]]:
+        """Returns the turns of a conversation, or None if it is unknown or expired."""
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.idle_ttl:
+                del self._conversations[conversation_id]
+                return None
+            # A read is activity too: entries stay ordered by it, least recently used first
+            self._conversations[conversation_id] = (time.monotonic(), entry[1])
+            self._conversations.move_to_end(conversation_id)
+            return list(entry[1])
+
+    def append(self, conversation_id: str, *turns: Turn):
+        """Appends turns to a conversation, creating it if needed."""
+        with self._lock:
+            entry = self._conversations.pop(conversation_id, None)
+            history = entry[1] if entry is not None else []
+            history.extend(turns)
+            del history[:-self.max_turns]
+            self._conversations[conversation_id] = (time.monotonic(), history)
+            self._evict()
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def _evict(self):
+        # Entries are ordered by last activity, so idle ones are at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._conversations:
+            oldest_id, (last_active, _) = next(iter(self._conversations.items()))
+            if last_active >= cutoff and len(self._conversations) <= self.max_conversations:
+                break
+            del self._conversations[oldest_id]
+
+
+class SQLiteConversationStore:
+    """
+    Conversation turns persisted in SQLite (WAL mode), so they survive restarts and
+    are visible to every worker on the host. Same interface as InMemoryConversationStore.
+    """
+
+    # Calls do disk I/O and may wait on other writers; async callers run them in a thread
+    blocking = True
+
+    # Idle conversations are purged every this many appends
+    PURGE_INTERVAL = 500
+
+    def __init__(self, path: str = 'conversations.db', idle_ttl: float = 3600.0, max_turns: int = 100):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self._local = threading.local()
+        self._appends = 0
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    last_active REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS turns (
+                    conversation_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    turn TEXT NOT NULL,
+                    PRIMARY KEY (conversation_id, seq)
+                );
+                CREATE INDEX IF NOT EXISTS conversations_last_active ON conversations (last_active);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, turns: Iterable[Turn] = ()) -> str:
+        conversation_id = new_conversation_id()
+        self.append(conversation_id, *turns)
+        return conversation_id
+
+    def get(self, conversation_id: str) -> Optional[List[Turn]]:
+        conn = self._connect()
+        now = time.time()
+        # A read is activity too: refresh last_active, unless the conversation already expired
+        with conn:
+            refreshed = conn.execute("UPDATE conversations SET last_active = ? WHERE id = ? AND last_active >= ?",
+                                     (now, conversation_id, now - self.idle_ttl)).rowcount
+        if not refreshed:
+            return None
+        rows = conn.execute(
+            "SELECT turn FROM turns WHERE conversation_id = ? ORDER BY seq DESC LIMIT ?",
+            (conversation_id, self.max_turns),
+        ).fetchall()
+        return [json.loads(turn) for (turn,) in reversed(rows)]
+
+    def append(self, conversation_id: str, *turns: Turn):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO conversations (id, last_active) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET last_active = excluded.last_active",
+                (conversation_id, time.time()),
+            )
+            (next_seq,) = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM turns WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+            conn.executemany(
+                "INSERT INTO turns (conversation_id, seq, turn) VALUES (?, ?, ?)",
+                [(conversation_id, next_seq + i, json.dumps(turn)) for i, turn in enumerate(turns)],
+            )
+            conn.execute("DELETE FROM turns WHERE conversation_id = ? AND seq < ?",
+                         (conversation_id, next_seq + len(turns) - self.max_turns))
+        self._appends += 1
+        if self._appends % self.PURGE_INTERVAL == 0:
+            self.purge_idle()
+
+    def delete(self, conversation_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM turns WHERE conversation_id = ?", (conversation_id,))
+            conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def purge_idle(self):
+        """Deletes conversations idle for longer than idle_ttl."""
+        conn = self._connect()
+        cutoff = time.time() - self.idle_ttl
+        with conn:
+            conn.execute("DELETE FROM turns WHERE conversation_id IN "
+                         "(SELECT id FROM conversations WHERE last_active < ?)", (cutoff,))
+            purged = conn.execute("DELETE FROM conversations WHERE last_active < ?", (cutoff,)).rowcount
+        if purged:
+            logger.info("Purged %d idle conversations", purged)
+
+
+def create_conversation_store():
+    """Builds the conversation store selected by the CONVERSATION_STORE environment variable."""
+    backend = os.getenv('CONVERSATION_STORE', 'memory')
+    idle_ttl = float(os.getenv('CONVERSATION_IDLE_TTL', '3600'))
+    max_turns = int(os.getenv('CONVERSATION_MAX_TURNS', '100'))
+    if backend == 'sqlite':
+        return SQLiteConversationStore(os.getenv('CONVERSATION_DB_PATH', 'conversations.db'),
+                                       idle_ttl=idle_ttl, max_turns=max_turns)
+    if backend != 'memory':
+        raise ValueError(f"Unknown CONVERSATION_STORE '{backend}', expected 'memory' or 'sqlite'")
+    return InMemoryConversationStore(int(os.getenv('CONVERSATION_MAX', '10000')),
+                                     idle_ttl=idle_ttl, max_turns=max_turns)
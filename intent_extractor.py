@@ -0,0 +1,107 @@
+import functools
+import logging
+import os
+import re
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPACY_MODEL = 'en_core_web_sm'
+# Only the lemmatizer and what it reads (tok2vec -> tagger -> attribute_ruler for POS)
+# are needed for token.lemma_; the parser and NER are most of the per-call cost.
+SPACY_EXCLUDE = ('parser', 'ner', 'senter')
+
+_WORD = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+
+
+def inflections(word: str) -> List[str]:
+    """The word and its regular plural forms."""
+    forms = [word, word + 's']
+    if word.endswith(('s', 'x', 'z', 'ch', 'sh')):
+        forms.append(word + 'es')
+    if word.endswith('y') and len(word) > 2 and word[-2] not in 'aeiou':
+        forms.append(word[:-1] + 'ies')
+    return forms
+
+
+def build_lemma_table(vocabulary: Iterable[str]) -> Dict[str, str]:
+    """Maps every surface form of the vocabulary words to its lemma."""
+    table: Dict[str, str] = {}
+    for word in vocabulary:
+        lemma = word.lower()
+        for form in inflections(lemma):
+            table.setdefault(form, lemma)
+    return table
+
+
+class LemmaTableExtractor:
+    """
+    Intent extraction from a precomputed lemma table for the intent vocabulary.
+
+    Intents are single-word topic names, so looking each word up in a table of
+    their inflected forms gives the same answer as running spaCy's lemmatizer,
+    without loading a model.
+    """
+
+    def __init__(self, intent_keywords: Iterable[str]):
+        self.lemmas = build_lemma_table(intent_keywords)
+
+    def extract(self, text: str) -> List[str]:
+        """Intent keywords mentioned in text, in order of occurrence."""
+        lemmas = self.lemmas
+        return [lemmas[word] for word in _WORD.findall(text.lower()) if word in lemmas]
+
+    def extract_many(self, texts: Iterable[str]) -> List[List[str]]:
+        return [self.extract(text) for text in texts]
+
+
+@functools.lru_cache(maxsize=None)
+def load_spacy_pipeline(model: str = DEFAULT_SPACY_MODEL):
+    """spaCy pipeline with only the lemmatization components, loaded once per process."""
+    import spacy
+
+    return spacy.load(model, exclude=list(SPACY_EXCLUDE))
+
+
+class SpacyExtractor:
+    """
+    Intent extraction from spaCy lemmas, using a pipeline trimmed to the
+    components lemmatization needs. extract_many() batches through nlp.pipe.
+    """
+
+    def __init__(self, intent_keywords: Iterable[str], model: str = DEFAULT_SPACY_MODEL,
+                 batch_size: int = 64):
+        self.intent_keywords = {keyword.lower() for keyword in intent_keywords}
+        self.model = model
+        self.batch_size = batch_size
+
+    @property
+    def nlp(self):
+        return load_spacy_pipeline(self.model)
+
+    def _intents(self, doc) -> List[str]:
+        intents = []
+        for token in doc:
+            lemma = token.lemma_.lower()
+            if lemma in self.intent_keywords:
+                intents.append(lemma)
+        return intents
+
+    def extract(self, text: str) -> List[str]:
+        return self._intents(self.nlp(text))
+
+    def extract_many(self, texts: Iterable[str]) -> List[List[str]]:
+        return [self._intents(doc) for doc in self.nlp.pipe(texts, batch_size=self.batch_size)]
+
+
+INTENT_EXTRACTORS = {'lemma': LemmaTableExtractor, 'spacy': SpacyExtractor}
+
+
+def create_intent_extractor(intent_keywords: Iterable[str]):
+    """Builds the intent extractor selected by the INTENT_EXTRACTOR environment variable."""
+    name = os.getenv('INTENT_EXTRACTOR', 'lemma')
+    if name not in INTENT_EXTRACTORS:
+        raise ValueError(f"Unknown INTENT_EXTRACTOR '{name}', expected one of {sorted(INTENT_EXTRACTORS)}")
+    if name == 'spacy':
+        return SpacyExtractor(intent_keywords, model=os.getenv('SPACY_MODEL', DEFAULT_SPACY_MODEL))
+    return LemmaTableExtractor(intent_keywords)
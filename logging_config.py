@@ -0,0 +1,70 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Optional
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a queue so request handlers never block on disk or
+    console I/O: the root logger only enqueues records, and a background
+    QueueListener thread formats and writes them to a size-rotated file and stderr.
+
+    Configured from LOG_LEVEL (INFO), LOG_FILE (chatbot_debug.log),
+    LOG_MAX_BYTES (10 MB), LOG_BACKUP_COUNT (5) and LOG_QUEUE_SIZE (10000;
+    records are dropped rather than blocking when the queue is full). Safe to call
+    more than once; only the first call configures anything.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.getenv('LOG_FILE', 'chatbot_debug.log'),
+        maxBytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+        backupCount=int(os.getenv('LOG_BACKUP_COUNT', '5')),
+        encoding='utf-8',
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
@@ -1,16 +1,93 @@
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routers import auth, chatbot_backend
+from valtool_client import ValToolClient
+from warmup import Warmup
+from logging_config import configure_logging
+from metrics import REGISTRY, register_cache_stats
+from openai_gateway import admission, call_policy, in_flight, response_cache
+from chatbot import get_chatbot
+from token_budget import get_token_counter
+from qa_source import get_source_watcher
+from traffic_capture import TrafficCapture, TrafficCaptureMiddleware
 import uvicorn
 
+load_dotenv()
+# The only place logging is configured for the API: a queue handler on the root
+# logger, with a background thread writing to the rotating file and stderr
+configure_logging()
+
+# Hit rates the caches already count, read when /metrics is scraped
+register_cache_stats('response_cache', response_cache.stats)
+register_cache_stats('session_cache', auth.session_cache.stats)
+register_cache_stats('token_count_cache', lambda: get_token_counter(get_chatbot().model).stats())
+REGISTRY.collector('openai_admission_slots', 'OpenAI calls in flight (state="active") or queued (state="waiting").',
+                   lambda: [({'state': state}, admission.stats()[state]) for state in ('active', 'waiting')])
+# Opt-in: sanitized /chatbot/chat and /auth/login requests appended to TRAFFIC_CAPTURE_PATH for replay
+traffic_capture = TrafficCapture.from_env()
+if traffic_capture is not None:
+    REGISTRY.collector('traffic_capture_records', 'Captured requests by outcome (written or dropped).',
+                       lambda: [({'outcome': outcome}, traffic_capture.stats()[outcome])
+                                for outcome in ('written', 'dropped')], kind='counter')
+REGISTRY.collector('openai_coalesced', 'OpenAI calls avoided by joining an identical call already in flight.',
+                   lambda: [({}, in_flight.stats()['coalesced'])], kind='counter')
+REGISTRY.collector('openai_retries', 'OpenAI requests retried, by reason (timeout, connection, rate_limited, ...).',
+                   lambda: [({'reason': reason}, count) for reason, count in call_policy.stats()['retries'].items()],
+                   kind='counter')
+REGISTRY.collector('openai_hedges', 'Hedge requests by result: won (answered first), lost (cancelled) or failed.',
+                   lambda: [({'result': result}, count) for result, count in call_policy.stats()['hedges'].items()],
+                   kind='counter')
+REGISTRY.collector('openai_hedge_delay_seconds', 'Current hedge delay (recent latency quantile) per model.',
+                   lambda: [({'model': str(model)}, delay) for model, delay in call_policy.stats()['hedge_delays'].items()
+                            if delay is not None])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled, keep-alive HTTP client for ValTool per worker
+    app.state.valtool_client = ValToolClient.from_env()
+    # Heavy chatbot resources load lazily; warm them in the background unless STARTUP_WARMUP=false
+    app.state.warmup = Warmup.from_env()
+    app.state.warmup.start()
+    # With QA_SOURCE_PATH set, edits to the knowledge base file are picked up without a restart
+    source_watcher = get_source_watcher()
+    if source_watcher is not None:
+        source_watcher.start()
+    if traffic_capture is not None:
+        traffic_capture.start()
+    yield
+    if traffic_capture is not None:
+        traffic_capture.stop()
+    if source_watcher is not None:
+        source_watcher.stop()
+    await app.state.warmup.stop()
+    await app.state.valtool_client.aclose()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="EvalAssist - Your Real Estate Assistant by WAIV",
     description="API for authenticating users and handling chatbot queries related to the US property market.",
     version="1.0.0"
 )
 
+if traffic_capture is not None:
+    app.add_middleware(TrafficCaptureMiddleware, capture=traffic_capture)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(chatbot_backend.router, prefix="/chatbot", tags=["Chatbot"])
 
+@app.get("/ready", tags=["Health"])
+async def ready():
+    """Readiness probe: 200 once the warm-up has loaded every resource, 503 until then."""
+    status = app.state.warmup.status()
+    return JSONResponse(status, status_code=200 if status['ready'] else 503)
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the pipeline, OpenAI, cache and ValTool metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+In-process metrics in the Prometheus text exposition format, served by GET /metrics.
+
+Counters and histograms keep plain floats per label set behind one lock, so
+recording an event is a dict lookup, a bisect and an addition (well under a
+microsecond; see benchmarks/bench_metrics.py). Values that other components
+already count (cache hit rates, for instance) are read by collectors at scrape
+time instead of being recorded on the hot path.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; spans in-process stages (tens of microseconds) up to slow upstream calls
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            yield self.name + '_total', dict(zip(self.labelnames, labelvalues)), value
+
+
+class Histogram:
+    """Bucketed distribution (cumulative on export), optionally split by label values."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labelvalues: str) -> 'Timer':
+        """Context manager observing the elapsed time of its block."""
+        return Timer(self, labelvalues)
+
+    def count(self, *labelvalues: str) -> float:
+        series = self._series.get(labelvalues)
+        return sum(series[:-1]) if series else 0.0
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            items = [(labelvalues, list(series)) for labelvalues, series in self._series.items()]
+        for labelvalues, series in items:
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                yield self.name + '_bucket', {**labels, 'le': _format_value(bound)}, cumulative
+            yield self.name + '_count', labels, cumulative
+            yield self.name + '_sum', labels, series[-1]
+
+
+class Timer:
+    __slots__ = ('histogram', 'labelvalues', 'started')
+
+    def __init__(self, histogram: Histogram, labelvalues: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+
+
+class GaugeCollector:
+    """Gauges (or counters) whose values are read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+                 kind: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self._collect = collect
+
+    def samples(self) -> Iterable[Sample]:
+        suffix = '_total' if self.kind == 'counter' else ''
+        for labels, value in self._collect():
+            yield self.name + suffix, labels, value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, name: str, documentation: str, collect, kind: str = 'gauge') -> GaugeCollector:
+        return self.register(GaugeCollector(name, documentation, collect, kind))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            # Counter samples are named name_total; HELP and TYPE must use the same name
+            name = metric.name + '_total' if metric.kind == 'counter' else metric.name
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# USD per 1K tokens (prompt, completion); OPENAI_PRICE_PROMPT / OPENAI_PRICE_COMPLETION override
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-4o': (0.0025, 0.01),
+}
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'chatbot_stage_seconds', 'Time spent in each stage of the chat pipeline.', ['stage'])
+MATCHES = REGISTRY.counter(
+    'chatbot_matches', 'Chat questions by how they were answered.', ['match_type'])
+OPENAI_SECONDS = REGISTRY.histogram(
+    'openai_request_seconds', 'Latency of OpenAI chat completion calls (to the last token when streaming).',
+    ['model', 'outcome'])
+OPENAI_TOKENS = REGISTRY.counter(
+    'openai_tokens', 'OpenAI tokens billed, by kind (prompt or completion).', ['model', 'kind'])
+OPENAI_COST = REGISTRY.counter(
+    'openai_cost_usd', 'Estimated OpenAI spend in USD (see MODEL_PRICES).', ['model'])
+OPENAI_ADMISSIONS = REGISTRY.counter(
+    'openai_admission', 'OpenAI calls by admission outcome (admitted, queue_full, queue_timeout, rate_limited).',
+    ['outcome'])
+OPENAI_HEDGE_TOKENS = REGISTRY.counter(
+    'openai_hedge_tokens', 'Estimated tokens of hedge requests (prompt plus expected completion; an upper bound).',
+    ['model'])
+OPENAI_HEDGE_COST = REGISTRY.counter(
+    'openai_hedge_cost_usd', 'Estimated USD spent on hedge requests (an upper bound; see MODEL_PRICES).', ['model'])
+OPENAI_QUEUE_SECONDS = REGISTRY.histogram(
+    'openai_queue_seconds', 'Time admitted OpenAI calls waited for a concurrency slot and rate budget.')
+VALTOOL_LOGIN_SECONDS = REGISTRY.histogram(
+    'valtool_login_seconds', 'Latency of upstream ValTool login calls.', ['outcome'])
+
+
+def model_price(model: str) -> Optional[Tuple[float, float]]:
+    prompt, completion = os.getenv('OPENAI_PRICE_PROMPT'), os.getenv('OPENAI_PRICE_COMPLETION')
+    if prompt and completion:
+        return float(prompt), float(completion)
+    for name, price in MODEL_PRICES.items():
+        if model == name or model.startswith(name + '-'):
+            return price
+    return None
+
+
+def estimate_cost(model: str, prompt_tokens: float, completion_tokens: float) -> float:
+    """USD for the given tokens at model's price, or 0 when the model has no known price."""
+    price = model_price(model)
+    if price is None:
+        return 0.0
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1000
+
+
+def record_openai_usage(model: str, usage):
+    """Counts the tokens and estimated cost of one completion (usage may be None)."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    OPENAI_TOKENS.inc(model, 'prompt', amount=prompt_tokens)
+    OPENAI_TOKENS.inc(model, 'completion', amount=completion_tokens)
+    if model_price(model) is not None:
+        OPENAI_COST.inc(model, amount=estimate_cost(model, prompt_tokens, completion_tokens))
+
+
+def register_cache_stats(name: str, stats: Callable[[], Dict[str, float]]):
+    """
+    Exposes a cache's stats() as a <name>_lookups_total{result=...} counter and a
+    <name>_hit_ratio gauge, both read at scrape time.
+    """
+    results = ('hits', 'near_hits', 'shared_hits', 'misses')
+
+    def counts():
+        values = stats()
+        return [({'result': result}, values[result]) for result in results if result in values]
+
+    def ratio():
+        values = stats()
+        hits = values.get('hits', 0) + values.get('near_hits', 0) + values.get('shared_hits', 0)
+        lookups = hits + values.get('misses', 0)
+        return [({}, hits / lookups if lookups else 0.0)]
+
+    REGISTRY.collector(f'{name}_lookups', f'{name} lookups by result.', counts, kind='counter')
+    REGISTRY.collector(f'{name}_hit_ratio', f'{name} hits / lookups since start.', ratio)
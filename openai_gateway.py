@@ -0,0 +1,222 @@
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import re
+import time
+from typing import AsyncIterator, Dict, List
+
+from admission import AdmissionController, AdmissionRejected
+from call_policy import CallPolicy
+from metrics import (OPENAI_ADMISSIONS, OPENAI_HEDGE_COST, OPENAI_HEDGE_TOKENS, OPENAI_QUEUE_SECONDS,
+                     OPENAI_SECONDS, estimate_cost, record_openai_usage)
+from qa_index import normalize_question
+from response_cache import ResponseCache, prompt_digest
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Shared by the FastAPI router and the Streamlit bot
+response_cache = ResponseCache.from_env()
+admission = AdmissionController.from_env()
+# Per-attempt timeouts, retries and (with OPENAI_HEDGE) hedging of slow calls
+call_policy = CallPolicy.from_env()
+# Identical questions asked while one is already being answered share its upstream call
+in_flight = SingleFlight()
+COALESCE_REQUESTS = os.getenv('OPENAI_COALESCE', 'true').lower() not in ('0', 'false', 'no')
+
+_WORD = re.compile(r'\w+')
+
+# Completion tokens budgeted per call by the tokens-per-minute limit (OPENAI_TPM)
+EXPECTED_COMPLETION_TOKENS = int(os.getenv('OPENAI_EXPECTED_COMPLETION_TOKENS', '300'))
+
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client():
+    """
+    Shared AsyncOpenAI client, created (and the openai package imported) on first
+    use. Its own retries are off: call_policy retries, within its timeouts.
+    """
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+
+
+def estimate_prompt_tokens(model: str, messages: List[Dict[str, str]]) -> int:
+    from token_budget import num_tokens_from_messages
+
+    try:
+        return num_tokens_from_messages(messages, model)
+    except Exception:
+        # No tokenizer (tiktoken fetches its encoding on first use): ~4 characters per token
+        return sum(len(m.get('content') or '') for m in messages) // 4
+
+
+def estimate_tokens(model: str, messages: List[Dict[str, str]]) -> int:
+    """Prompt tokens plus the expected completion, for the tokens-per-minute budget."""
+    return estimate_prompt_tokens(model, messages) + EXPECTED_COMPLETION_TOKENS
+
+
+@contextlib.asynccontextmanager
+async def admitted(model: str, messages: List[Dict[str, str]]) -> AsyncIterator[None]:
+    """
+    Holds an admission slot for one upstream call. Raises AdmissionRejected when
+    the call cannot start within OPENAI_QUEUE_TIMEOUT, so callers can degrade.
+    """
+    estimate = estimate_tokens(model, messages) if admission.limits_tokens else 0
+    started = time.perf_counter()
+    try:
+        async with admission.admit(estimate):
+            OPENAI_QUEUE_SECONDS.observe(time.perf_counter() - started)
+            OPENAI_ADMISSIONS.inc('admitted')
+            yield
+    except AdmissionRejected as e:
+        OPENAI_ADMISSIONS.inc(e.reason)
+        logger.warning("OpenAI call rejected by admission control: %s", e.reason)
+        raise
+
+
+def _cache_fields(messages: List[Dict[str, str]]):
+    """
+    (question, context): the last message, and everything sent before it (system
+    prompt and history) serialized, so answers are only reused in the same context.
+    """
+    question = messages[-1].get('content') or '' if messages else ''
+    context = json.dumps(messages[:-1], sort_keys=True, ensure_ascii=False)
+    return question, context
+
+
+def coalesce_key(model: str, messages: List[Dict[str, str]]):
+    """
+    (model, normalized question, context digest) for request coalescing. The
+    question ignores case, spacing and punctuation; the context digest covers the
+    system prompt and history, so only calls that would get the same answer share.
+    """
+    question, context = _cache_fields(messages)
+    return model, ' '.join(_WORD.findall(normalize_question(question))), prompt_digest(context)
+
+
+async def create_chat_completion(client, model: str, messages: List[Dict[str, str]]) -> str:
+    """
+    Returns the assistant reply for messages, served from the response cache when
+    the same question was already answered for this model, system prompt and history.
+    Concurrent identical requests (see coalesce_key) share one upstream call,
+    made under call_policy. Raises AdmissionRejected when the upstream call
+    cannot be admitted in time.
+    """
+    question, context = _cache_fields(messages)
+    cached = await response_cache.get(question, model, context)
+    if cached is not None:
+        logger.debug("Response cache hit for %r", question)
+        return cached
+
+    if not COALESCE_REQUESTS:
+        return await _complete(client, model, messages, question, context)
+    return await in_flight.run(coalesce_key(model, messages),
+                               lambda: _complete(client, model, messages, question, context))
+
+
+async def _complete(client, model: str, messages: List[Dict[str, str]], question: str, context: str) -> str:
+    response = await call_policy.call(lambda hedge: _request(client, model, messages, hedge), key=model)
+    record_openai_usage(model, getattr(response, 'usage', None))
+    content = response.choices[0].message.content
+    if content:
+        response_cache.put(question, model, context, content)
+    return content
+
+
+async def _request(client, model: str, messages: List[Dict[str, str]], hedge: bool):
+    """One admitted upstream request; a hedge is charged its estimated cost up front."""
+    async with admitted(model, messages):
+        if hedge:
+            # Upper bound: the request that loses is cancelled, but may be billed in full
+            prompt_tokens = estimate_prompt_tokens(model, messages)
+            OPENAI_HEDGE_TOKENS.inc(model, amount=prompt_tokens + EXPECTED_COMPLETION_TOKENS)
+            OPENAI_HEDGE_COST.inc(model, amount=estimate_cost(model, prompt_tokens, EXPECTED_COMPLETION_TOKENS))
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = await client.chat.completions.create(model=model, messages=messages)
+            outcome = 'ok'
+        except asyncio.CancelledError:
+            # Timed out, or lost a hedged race
+            outcome = 'cancelled'
+            raise
+        finally:
+            OPENAI_SECONDS.observe(time.perf_counter() - started, model, outcome)
+    return response
+
+
+async def stream_chat_completion(client, model: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """
+    Yields the assistant reply for messages as it is generated (stream=True). A
+    cached answer is yielded in one piece; a completed stream is added to the cache.
+    """
+    question, context = _cache_fields(messages)
+    cached = await response_cache.get(question, model, context)
+    if cached is not None:
+        logger.debug("Response cache hit for %r", question)
+        yield cached
+        return
+
+    parts = []
+    # Only opening the stream is retried (never hedged): each attempt is admitted and
+    # timed on its own, and the one that opened keeps its slot until the stream is
+    # exhausted, stalls for longer than the attempt timeout, or the consumer goes away
+    stream, slot, started = await call_policy.call(
+        lambda hedge: _open_stream(client, model, messages), key=model, hedge=False)
+    outcome = 'error'
+    try:
+        chunks = stream.__aiter__()
+        while True:
+            # Each chunk gets the attempt timeout, so a stalled stream cannot hold its slot
+            # until the client's read timeout
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), call_policy.attempt_timeout)
+            except StopAsyncIteration:
+                break
+            if getattr(chunk, 'usage', None) is not None:
+                record_openai_usage(model, chunk.usage)
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                parts.append(token)
+                yield token
+        outcome = 'ok'
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = 'cancelled'
+        raise
+    finally:
+        OPENAI_SECONDS.observe(time.perf_counter() - started, model, outcome)
+        try:
+            # Closes the HTTP response, so an abandoned stream stops generating (and being billed)
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                await close()
+        finally:
+            await slot.aclose()
+    if parts:
+        response_cache.put(question, model, context, ''.join(parts))
+
+
+async def _open_stream(client, model: str, messages: List[Dict[str, str]]):
+    """
+    One admitted attempt at opening a stream. Returns (stream, slot, started): slot
+    still holds the admission, for the caller to close once the stream is consumed.
+    """
+    slot = contextlib.AsyncExitStack()
+    await slot.enter_async_context(admitted(model, messages))
+    started = time.perf_counter()
+    try:
+        # include_usage adds a final chunk (with no choices) carrying the token counts
+        stream = await client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                      stream_options={"include_usage": True})
+    except BaseException as e:
+        outcome = 'cancelled' if isinstance(e, asyncio.CancelledError) else 'error'
+        OPENAI_SECONDS.observe(time.perf_counter() - started, model, outcome)
+        await slot.aclose()
+        raise
+    return stream, slot, started
@@ -0,0 +1,379 @@
+import difflib
+import heapq
+import os
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Same threshold the original difflib.get_close_matches call used
+DEFAULT_CUTOFF = 0.6
+DEFAULT_MAX_CANDIDATES = 32
+DEFAULT_MAX_DF_RATIO = 0.25
+
+
+def normalize_question(question: str) -> str:
+    """Normalizes a question the same way for indexing and lookups."""
+    return question.strip().lower()
+
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """Returns the set of padded character n-grams of text."""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class QAMatch(NamedTuple):
+    answer: Optional[str]
+    match_type: str
+    question: Optional[str] = None
+    score: float = 0.0
+
+
+class DifflibMatcher:
+    """Reference matcher: scores every key with SequenceMatcher, like difflib.get_close_matches."""
+
+    def __init__(self, keys: Sequence[str], cutoff: float = DEFAULT_CUTOFF):
+        self.keys = keys
+        self.cutoff = cutoff
+
+    def best(self, query: str) -> Optional[Tuple[int, float]]:
+        """Returns (key id, similarity) of the best key scoring at least cutoff."""
+        return _rescore(query, range(len(self.keys)), self.keys, self.cutoff)
+
+    def top_k(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Returns up to k (key id, similarity) pairs scoring at least cutoff, best first."""
+        return _rescore_top(query, range(len(self.keys)), self.keys, self.cutoff, k)
+
+
+class NGramMatcher:
+    """
+    Candidate-pruning fuzzy matcher.
+
+    A character trigram inverted index and a length filter shortlist the keys that
+    can plausibly reach the cutoff, and only that shortlist is rescored exactly with
+    SequenceMatcher, so scores are the same ones difflib would report.
+    """
+
+    def __init__(self, keys: Sequence[str], cutoff: float = DEFAULT_CUTOFF,
+                 max_candidates: int = DEFAULT_MAX_CANDIDATES, max_df_ratio: float = DEFAULT_MAX_DF_RATIO):
+        self.keys = keys
+        self.cutoff = cutoff
+        self.max_candidates = max_candidates
+        self.max_df_ratio = max_df_ratio
+        # Ids still in the postings but no longer live (see qa_source), and the live count
+        self.retired = frozenset()
+        self.size = len(keys)
+        # Live keys per gram when the postings also hold retired ids; None means len(postings[gram])
+        self.doc_freq = None
+        self.lengths = [len(key) for key in keys]
+        postings = defaultdict(list)
+        for key_id, key in enumerate(keys):
+            for gram in char_ngrams(key):
+                postings[gram].append(key_id)
+        self.postings = dict(postings)
+
+    @classmethod
+    def from_arrays(cls, keys: Sequence[str], lengths: Sequence[int], postings,
+                    cutoff: float = DEFAULT_CUTOFF, retired: frozenset = frozenset(),
+                    doc_freq: Optional[Dict[str, int]] = None) -> 'NGramMatcher':
+        """
+        Rebuilds a matcher around precomputed lengths and a postings mapping (see
+        qa_store). retired lists ids the postings still hold but that must never be
+        returned, so an incremental rebuild (see qa_source) need not rewrite them;
+        doc_freq then gives the live keys per gram, so gram selectivity is judged
+        as in a fresh build.
+        """
+        matcher = cls.__new__(cls)
+        matcher.keys = keys
+        matcher.cutoff = cutoff
+        matcher.max_candidates = DEFAULT_MAX_CANDIDATES
+        matcher.max_df_ratio = DEFAULT_MAX_DF_RATIO
+        matcher.retired = retired
+        matcher.size = len(keys) - len(retired)
+        matcher.lengths = lengths
+        matcher.postings = postings
+        matcher.doc_freq = doc_freq
+        return matcher
+
+    def candidates(self, query: str) -> List[int]:
+        """Returns the ids of the keys sharing the most trigrams with query."""
+        postings = self.postings
+        # Skip grams present in a large share of keys ("wha", "hat", ...); they add
+        # counting work without separating candidates
+        max_df = max(1, int(self.size * self.max_df_ratio))
+        if self.doc_freq is None:
+            lists = [ids for ids in map(postings.get, char_ngrams(query)) if ids is not None]
+            selective = [ids for ids in lists if len(ids) <= max_df] or lists
+        else:
+            # Grams with no live key left are skipped, as a fresh build would not have them
+            doc_freq = self.doc_freq
+            live = [(postings[gram], doc_freq[gram]) for gram in char_ngrams(query) if doc_freq.get(gram)]
+            lists = [ids for ids, _ in live]
+            selective = [ids for ids, count in live if count <= max_df] or lists
+        if not lists:
+            return []
+
+        counts = Counter()
+        for ids in selective:
+            counts.update(ids)
+        scored = counts.items()
+        if self.retired:
+            scored = [item for item in scored if item[0] not in self.retired]
+
+        # ratio = 2*M / (la + lb) can only reach cutoff if min/max length >= cutoff / (2 - cutoff)
+        query_length = len(query)
+        min_length_ratio = self.cutoff / (2 - self.cutoff)
+        lengths = self.lengths
+
+        def length_ok(key_id):
+            la = lengths[key_id]
+            return min(la, query_length) >= min_length_ratio * max(la, query_length)
+
+        by_count = defaultdict(list)
+        for key_id, count in scored:
+            if length_ok(key_id):
+                by_count[count].append(key_id)
+        # Most shared grams first; ties at the cut go to the closer length, then the larger
+        # key, never to the id, so an incrementally rebuilt index (ids in edit order)
+        # shortlists like a fresh one
+        ranked = []
+        for count in sorted(by_count, reverse=True):
+            key_ids = by_count[count]
+            room = self.max_candidates - len(ranked)
+            if len(key_ids) > room:
+                keys = self.keys
+                key_ids = heapq.nlargest(room, key_ids,
+                                         key=lambda key_id: (-abs(lengths[key_id] - query_length), keys[key_id]))
+            ranked += key_ids
+            if len(ranked) >= self.max_candidates:
+                break
+        return ranked
+
+    def best(self, query: str) -> Optional[Tuple[int, float]]:
+        """Returns (key id, similarity) of the best key scoring at least cutoff."""
+        return _rescore(query, self.candidates(query), self.keys, self.cutoff)
+
+    def top_k(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Returns up to k (key id, similarity) pairs scoring at least cutoff, best first."""
+        return _rescore_top(query, self.candidates(query), self.keys, self.cutoff, k)
+
+
+def _rescore(query: str, key_ids, keys: Sequence[str], cutoff: float) -> Optional[Tuple[int, float]]:
+    # Mirrors difflib.get_close_matches: cheap upper bounds first, ties go to the larger key
+    matcher = difflib.SequenceMatcher()
+    matcher.set_seq2(query)
+    best = None
+    for key_id in key_ids:
+        matcher.set_seq1(keys[key_id])
+        if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+            score = matcher.ratio()
+            if score >= cutoff and (best is None or (score, keys[key_id]) > (best[1], keys[best[0]])):
+                best = (key_id, score)
+    return best
+
+
+def _rescore_top(query: str, key_ids, keys: Sequence[str], cutoff: float, k: int) -> List[Tuple[int, float]]:
+    matcher = difflib.SequenceMatcher()
+    matcher.set_seq2(query)
+    scored = []
+    for key_id in key_ids:
+        matcher.set_seq1(keys[key_id])
+        if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+            score = matcher.ratio()
+            if score >= cutoff:
+                scored.append((score, keys[key_id], key_id))
+    return [(key_id, score) for score, _, key_id in heapq.nlargest(k, scored)]
+
+
+def _vector_matcher(keys: Sequence[str], **options):
+    # Imported on demand so the default n-gram index does not pay for numpy
+    from qa_vectors import VectorMatcher
+    return VectorMatcher(keys, **options)
+
+
+MATCHERS = {
+    'difflib': DifflibMatcher,
+    'ngram': NGramMatcher,
+    'vector': _vector_matcher,
+}
+
+
+class QAIndex:
+    """Lookup structures over a qa_dict, built once and shared by every caller."""
+
+    def __init__(self, qa_dict: Dict[str, str], matcher: str = 'ngram', cutoff: Optional[float] = None):
+        keys: List[str] = []
+        questions: List[str] = []
+        answers: List[str] = []
+        for question, answer in qa_dict.items():
+            keys.append(normalize_question(question))
+            questions.append(question)
+            answers.append(answer)
+        self._set_entries(keys, questions, answers)
+        self.matcher = build_matcher(matcher, self.keys, cutoff)
+
+    def _set_entries(self, keys: Sequence[str], questions: Sequence[str], answers: Sequence[str]):
+        # Keep the first question for a normalized key, like the old linear scan did
+        self.ids: Dict[str, int] = {}
+        unique = []
+        for entry_id, key in enumerate(keys):
+            if key not in self.ids:
+                self.ids[key] = entry_id
+                unique.append(entry_id)
+        if len(unique) == len(keys):
+            self.keys, self.questions, self.answers = list(keys), questions, answers
+        else:
+            self.keys = [keys[i] for i in unique]
+            self.questions = [questions[i] for i in unique]
+            self.answers = [answers[i] for i in unique]
+            self.ids = {key: key_id for key_id, key in enumerate(self.keys)}
+
+    @classmethod
+    def from_entries(cls, keys: Sequence[str], questions: Sequence[str], answers: Sequence[str],
+                     matcher) -> 'QAIndex':
+        """Assembles an index from prebuilt parallel sequences and a matcher instance."""
+        index = cls.__new__(cls)
+        index._set_entries(keys, questions, answers)
+        index.matcher = matcher
+        return index
+
+    @classmethod
+    def from_lookup(cls, ids: Dict[str, int], keys: Sequence[str], questions: Sequence[str],
+                    answers: Sequence[str], matcher) -> 'QAIndex':
+        """
+        Assembles an index around an existing exact-match dict without re-deduplicating;
+        keys, questions and answers may hold entries ids no longer points to.
+        """
+        index = cls.__new__(cls)
+        index.ids, index.keys, index.questions, index.answers = ids, keys, questions, answers
+        index.matcher = matcher
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _result(self, key_id: int, match_type: str, score: float) -> QAMatch:
+        return QAMatch(self.answers[key_id], match_type, self.questions[key_id], score)
+
+    def match(self, user_question: str) -> QAMatch:
+        """Finds the best match for the user query, with the matched question and its similarity."""
+        user_question_normalized = normalize_question(user_question)
+
+        # Exact match (case-insensitive)
+        key_id = self.ids.get(user_question_normalized)
+        if key_id is not None:
+            return self._result(key_id, 'exact', 1.0)
+
+        # Partial match using the configured fuzzy matcher
+        best = self.matcher.best(user_question_normalized)
+        if best is not None:
+            return self._result(best[0], 'partial', best[1])
+
+        return QAMatch(None, 'no_match')
+
+    def match_many(self, user_questions: Sequence[str]) -> List[QAMatch]:
+        """
+        match() for a batch: each distinct normalized question is looked up once.
+        Only VectorMatcher (QA_MATCHER=vector) scores the unresolved ones together
+        (best_many); the default n-gram and difflib matchers still take one best()
+        call per question, so a large batch costs about as much as separate match()
+        calls.
+        """
+        normalized = [normalize_question(question) for question in user_questions]
+        results: Dict[str, QAMatch] = {}
+        pending = []
+        for key in dict.fromkeys(normalized):
+            key_id = self.ids.get(key)
+            if key_id is not None:
+                results[key] = self._result(key_id, 'exact', 1.0)
+            else:
+                pending.append(key)
+        best_many = getattr(self.matcher, 'best_many', None)
+        bests = best_many(pending) if best_many is not None else [self.matcher.best(key) for key in pending]
+        for key, best in zip(pending, bests):
+            results[key] = self._result(best[0], 'partial', best[1]) if best is not None else QAMatch(None, 'no_match')
+        return [results[key] for key in normalized]
+
+    def search(self, user_question: str, k: int = 5) -> List[QAMatch]:
+        """Returns up to k ranked candidate matches with their similarity scores."""
+        user_question_normalized = normalize_question(user_question)
+        results = []
+        for key_id, score in self.matcher.top_k(user_question_normalized, k):
+            match_type = 'exact' if self.keys[key_id] == user_question_normalized else 'partial'
+            results.append(self._result(key_id, match_type, score))
+        return results
+
+    def find_best_match(self, user_question: str) -> Tuple[Optional[str], str]:
+        """Finds the best match for the user query in the index."""
+        result = self.match(user_question)
+        return result.answer, result.match_type
+
+
+def build_matcher(name: str, keys: Sequence[str], cutoff: Optional[float] = None):
+    """Instantiates a fuzzy matcher by name over keys."""
+    if name not in MATCHERS:
+        raise ValueError(f"Unknown QA matcher '{name}', expected one of {sorted(MATCHERS)}")
+    # Each matcher has its own default cutoff; ratios and cosines are not on the same scale
+    options = {} if cutoff is None else {'cutoff': cutoff}
+    return MATCHERS[name](keys, **options)
+
+
+def load_default_index() -> QAIndex:
+    """
+    Builds the index from the QA_SOURCE_PATH file (JSON/JSONL, hot-reloaded; see
+    qa_source) when set. Otherwise loads the compiled index artifact named by
+    QA_INDEX_PATH when it is present and current, or builds it from qa_data.qa_dict.
+    """
+    matcher = os.getenv('QA_MATCHER', 'ngram')
+    if os.getenv('QA_SOURCE_PATH'):
+        import qa_source
+        return qa_source.get_source_watcher().load()
+
+    path = os.getenv('QA_INDEX_PATH')
+    if path and os.path.exists(path):
+        import qa_store
+        index = qa_store.load_index(path, matcher=matcher)
+        if index is not None:
+            return index
+
+    import qa_data
+    return QAIndex(qa_data.qa_dict, matcher=matcher)
+
+
+_default_index: Optional[QAIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_qa_index() -> QAIndex:
+    """
+    The index shared by the FastAPI router and the Streamlit bot, loaded on first
+    use (or by the startup warm-up) rather than at import.
+    """
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = load_default_index()
+    return _default_index
+
+
+def is_loaded() -> bool:
+    return _default_index is not None
+
+
+def set_qa_index(index: QAIndex):
+    """
+    Swaps in a new shared index. Readers call get_qa_index() per question and keep
+    using the index they already hold, so a swap never blocks or tears a lookup.
+    """
+    global _default_index
+    _default_index = index
+
+
+def __getattr__(name):
+    # Keeps `from qa_index import qa_index` working; it loads the index on access
+    if name == 'qa_index':
+        return get_qa_index()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,362 @@
+"""
+Hot-reloadable knowledge base read from a JSON or JSONL file.
+
+Point workers at the file with QA_SOURCE_PATH. Accepted layouts:
+
+    {"What is AutoVal?": "AutoVal is ...", ...}                  (.json object)
+    [{"question": "What is AutoVal?", "answer": "..."}, ...]     (.json array)
+    {"question": "What is AutoVal?", "answer": "..."}            (.jsonl, one per line)
+
+A background thread polls the file (every QA_RELOAD_INTERVAL seconds) and, when
+it changes, applies only the added, removed and edited questions to the lookup
+structures, then swaps the new index in with qa_index.set_qa_index. Readers are
+never blocked; a file that fails to parse is logged and the current index kept.
+
+Start from the existing dataset with:
+
+    python -m qa_source export --output qa_source.json
+    python -m qa_source check qa_source.json
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from metrics import REGISTRY
+from qa_index import (DEFAULT_CUTOFF, NGramMatcher, QAIndex, char_ngrams, normalize_question,
+                      set_qa_index)
+
+logger = logging.getLogger(__name__)
+
+QA_RELOADS = REGISTRY.counter(
+    'qa_source_reloads', 'Knowledge base reloads by outcome (applied or error).', ['outcome'])
+
+# Retired ids kept by incremental rebuilds before the storage is compacted
+COMPACT_MIN_RETIRED = 1024
+
+
+class QARow(NamedTuple):
+    question: str
+    answer: str
+    location: str
+
+
+class SourceReport(NamedTuple):
+    """Questions that will never be served as written, found while compiling a source."""
+    # Same question text listed more than once; the first listing is used
+    duplicates: List[Dict]
+    # Different text that normalizes to an earlier question's key, so exact lookups never reach it
+    shadowed: List[Dict]
+
+    def as_dict(self) -> Dict:
+        return {'duplicates': self.duplicates, 'shadowed': self.shadowed}
+
+
+def read_rows(path: str) -> List[QARow]:
+    """Reads question/answer rows, in file order, from a JSON or JSONL source."""
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    rows.append(_row(json.loads(line), f"line {line_number}"))
+            return rows
+        # Keep objects as pair lists so repeated keys are seen instead of silently merged
+        data = json.load(f, object_pairs_hook=lambda pairs: pairs)
+    if _is_object(data):
+        for position, (question, answer) in enumerate(data, 1):
+            location = f"key {position}"
+            rows.append(QARow(_text(question, 'question', location), _text(answer, 'answer', location), location))
+        return rows
+    if isinstance(data, list):
+        return [_row(dict(item) if _is_object(item) else item, f"item {position}")
+                for position, item in enumerate(data, 1)]
+    raise ValueError(f"{path}: expected a JSON object or array of question/answer objects")
+
+
+def _is_object(value) -> bool:
+    # A JSON object as parsed with the pair-list hook in read_rows
+    return isinstance(value, list) and all(isinstance(item, tuple) for item in value)
+
+
+def _row(item, location: str) -> QARow:
+    if not isinstance(item, dict) or 'question' not in item or 'answer' not in item:
+        raise ValueError(f"{location}: expected an object with 'question' and 'answer'")
+    return QARow(_text(item['question'], 'question', location), _text(item['answer'], 'answer', location),
+                 location)
+
+
+def _text(value, field: str, location: str) -> str:
+    if not isinstance(value, str):
+        kind = ('null' if value is None else 'a boolean' if isinstance(value, bool) else
+                'a number' if isinstance(value, (int, float)) else 'an object or array')
+        raise ValueError(f"{location}: {field} must be a string, not {kind}")
+    return value
+
+
+def compile_rows(rows: List[QARow]) -> Tuple[Dict[str, Tuple[str, str]], SourceReport]:
+    """
+    Returns {normalized key: (question, answer)} in file order, keeping the first
+    row per key like QAIndex does, and a report of the rows that lost out.
+    """
+    entries: Dict[str, Tuple[str, str]] = {}
+    first_location: Dict[str, str] = {}
+    duplicates, shadowed = [], []
+    for row in rows:
+        key = normalize_question(row.question)
+        if key not in entries:
+            entries[key] = (row.question, row.answer)
+            first_location[key] = row.location
+        elif entries[key][0] == row.question:
+            duplicates.append({'question': row.question, 'location': row.location,
+                               'first': first_location[key], 'same_answer': entries[key][1] == row.answer})
+        else:
+            shadowed.append({'question': row.question, 'location': row.location,
+                             'shadowed_by': entries[key][0], 'first': first_location[key]})
+    return entries, SourceReport(duplicates, shadowed)
+
+
+class IncrementalIndexBuilder:
+    """
+    Produces successive QAIndex snapshots, doing work proportional to what changed.
+
+    Keys, questions, answers and key lengths live in append-only lists shared by
+    every snapshot: an edited or added question gets a new id at the end, and a
+    removed one is dropped from the exact-match dict and marked retired, which the
+    n-gram matcher skips. Posting lists are only extended (by copy) for the
+    trigrams of added keys, so older snapshots still serving requests never see a
+    change. Retired ids are reclaimed by a full rebuild once they outnumber the
+    live ones.
+
+    Only the default n-gram matcher is updated incrementally; with QA_MATCHER set to
+    difflib or vector every change rebuilds the index in full.
+    """
+
+    def __init__(self, matcher: str = 'ngram', cutoff: Optional[float] = None):
+        self.matcher = matcher
+        self.cutoff = cutoff
+        self.entries: Dict[str, Tuple[str, str]] = {}
+        self._reset()
+
+    def _reset(self):
+        self._keys: List[str] = []
+        self._questions: List[str] = []
+        self._answers: List[str] = []
+        self._lengths: List[int] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+        # Live (not retired) ids per gram, which the matcher uses instead of posting list lengths
+        self._doc_freq: Dict[str, int] = {}
+        self._retired = frozenset()
+
+    def build(self, entries: Dict[str, Tuple[str, str]]) -> QAIndex:
+        """Full rebuild from {key: (question, answer)}."""
+        self._reset()
+        self.entries = {}
+        return self.update(entries)
+
+    def update(self, entries: Dict[str, Tuple[str, str]]) -> QAIndex:
+        """Snapshot for entries, reusing everything that did not change since the last call."""
+        if self.matcher != 'ngram':
+            self.entries = dict(entries)
+            return QAIndex({question: answer for question, answer in entries.values()},
+                           matcher=self.matcher, cutoff=self.cutoff)
+
+        removed = [key for key, value in self.entries.items() if entries.get(key) != value]
+        added = [key for key, value in entries.items() if self.entries.get(key) != value]
+        if len(self._retired) + len(removed) > max(COMPACT_MIN_RETIRED, len(entries)):
+            return self.build(entries)
+
+        ids = dict(self._ids)
+        retired = [ids.pop(key) for key in removed]
+        doc_freq = dict(self._doc_freq)
+        for key in removed:
+            for gram in char_ngrams(key):
+                doc_freq[gram] -= 1
+        new_ids: Dict[str, List[int]] = defaultdict(list)
+        for key in added:
+            question, answer = entries[key]
+            key_id = len(self._keys)
+            self._keys.append(key)
+            self._questions.append(question)
+            self._answers.append(answer)
+            self._lengths.append(len(key))
+            ids[key] = key_id
+            for gram in char_ngrams(key):
+                new_ids[gram].append(key_id)
+                doc_freq[gram] = doc_freq.get(gram, 0) + 1
+
+        postings = dict(self._postings)
+        for gram, key_ids in new_ids.items():
+            postings[gram] = postings.get(gram, []) + key_ids
+
+        self._ids, self._postings, self._doc_freq = ids, postings, doc_freq
+        self._retired = self._retired.union(retired)
+        self.entries = dict(entries)
+        cutoff = DEFAULT_CUTOFF if self.cutoff is None else self.cutoff
+        fuzzy = NGramMatcher.from_arrays(self._keys, self._lengths, postings, cutoff, retired=self._retired,
+                                         doc_freq=doc_freq)
+        return QAIndex.from_lookup(ids, self._keys, self._questions, self._answers, fuzzy)
+
+
+class QASourceWatcher:
+    """Loads the QA source file and swaps in a rebuilt index whenever the file changes."""
+
+    def __init__(self, path: str, interval: float = 2.0, matcher: str = 'ngram', cutoff: Optional[float] = None):
+        self.path = path
+        self.interval = interval
+        self.builder = IncrementalIndexBuilder(matcher, cutoff)
+        self.report = SourceReport([], [])
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self.last_reload_seconds: Optional[float] = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> 'QASourceWatcher':
+        return cls(
+            os.environ['QA_SOURCE_PATH'],
+            interval=float(os.getenv('QA_RELOAD_INTERVAL', '2')),
+            matcher=os.getenv('QA_MATCHER', 'ngram'),
+        )
+
+    def _stat_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def load(self) -> QAIndex:
+        """Full build from the file; raises if it cannot be read."""
+        with self._lock:
+            signature = self._stat_signature()
+            entries, report = compile_rows(read_rows(self.path))
+            index = self.builder.build(entries)
+            self._signature = signature
+            self._log_report(report)
+            self.report = report
+        logger.info("Loaded %d questions from %s", len(index), self.path)
+        return index
+
+    def reload_if_changed(self) -> bool:
+        """Applies the file's changes and swaps the index in; False if unchanged or unreadable."""
+        with self._lock:
+            try:
+                signature = self._stat_signature()
+                if signature == self._signature:
+                    return False
+                started = time.perf_counter()
+                entries, report = compile_rows(read_rows(self.path))
+            except (OSError, ValueError) as e:
+                # json.JSONDecodeError is a ValueError; keep serving the current index
+                if str(e) != self.last_error:
+                    logger.error("Could not reload QA source %s: %s", self.path, e)
+                self.last_error = str(e)
+                QA_RELOADS.inc('error')
+                return False
+            previous = self.builder.entries
+            index = self.builder.update(entries)
+            set_qa_index(index)
+            self._signature = signature
+            self.last_error = None
+            self.last_reload_seconds = time.perf_counter() - started
+            self.reloads += 1
+            self._log_report(report)
+            self.report = report
+        changed = sum(1 for key, value in entries.items() if previous.get(key) != value)
+        removed = sum(1 for key in previous if key not in entries)
+        QA_RELOADS.inc('applied')
+        logger.info("Reloaded %s: %d questions, %d added or edited, %d removed, in %.1f ms",
+                    self.path, len(index), changed, removed, self.last_reload_seconds * 1000)
+        return True
+
+    def _log_report(self, report: SourceReport):
+        # Only findings new since the last load, so every reload does not repeat them all
+        known = {(row['question'], row['location']) for row in self.report.duplicates + self.report.shadowed}
+        for row in report.duplicates:
+            if (row['question'], row['location']) in known:
+                continue
+            logger.warning("QA source %s: duplicate question %r at %s (first at %s)",
+                           self.path, row['question'], row['location'], row['first'])
+        for row in report.shadowed:
+            if (row['question'], row['location']) in known:
+                continue
+            logger.warning("QA source %s: %r at %s is shadowed by %r (first at %s)",
+                           self.path, row['question'], row['location'], row['shadowed_by'], row['first'])
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # Nothing to reload until the index has been loaded (lazily, or by the warm-up)
+            if self._signature is not None:
+                try:
+                    self.reload_if_changed()
+                except Exception:
+                    logger.exception("QA source reload failed")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='qa-source-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def status(self) -> Dict:
+        return {
+            'path': self.path,
+            'questions': len(self.builder.entries),
+            'reloads': self.reloads,
+            'last_reload_ms': None if self.last_reload_seconds is None else self.last_reload_seconds * 1000,
+            'last_error': self.last_error,
+            **self.report.as_dict(),
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def get_source_watcher() -> Optional[QASourceWatcher]:
+    """The process-wide watcher for QA_SOURCE_PATH, or None when it is not set."""
+    if not os.getenv('QA_SOURCE_PATH'):
+        return None
+    return QASourceWatcher.from_env()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the hot-reloadable QA source file.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export', help="Write qa_data.qa_dict as a QA source file")
+    export.add_argument('--output', default='qa_source.json', help=".json or .jsonl")
+    check = subparsers.add_parser('check', help="Report duplicate and shadowed questions in a source file")
+    check.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        import qa_data
+        with open(args.output, 'w', encoding='utf-8') as f:
+            if args.output.endswith('.jsonl'):
+                for question, answer in qa_data.qa_dict.items():
+                    f.write(json.dumps({'question': question, 'answer': answer}, ensure_ascii=False) + '\n')
+            else:
+                json.dump(qa_data.qa_dict, f, indent=2, ensure_ascii=False)
+        print(f"Wrote {len(qa_data.qa_dict)} questions to {args.output}")
+        return
+
+    entries, report = compile_rows(read_rows(args.path))
+    print(f"{len(entries)} questions, {len(report.duplicates)} duplicates, {len(report.shadowed)} shadowed")
+    for row in report.duplicates:
+        print(f"  duplicate {row['location']}: {row['question']!r} (first at {row['first']})")
+    for row in report.shadowed:
+        print(f"  shadowed  {row['location']}: {row['question']!r} by {row['shadowed_by']!r} ({row['first']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Compiled, memory-mappable QA index artifact.
+
+The build step turns qa_data.qa_dict into a single file holding the normalized
+keys, original questions, answers (as offset-addressed UTF-8 blobs), the n-gram
+postings used by NGramMatcher and the TF-IDF matrix used by VectorMatcher. Each
+worker maps the file read-only, so the bulky parts (answers, postings, vectors)
+live once in the page cache no matter how many uvicorn workers are running.
+
+Build it with:
+
+    python -m qa_store build --output qa_index.bin
+
+and point workers at it with QA_INDEX_PATH=qa_index.bin.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from qa_index import NGramMatcher, QAIndex, build_matcher, char_ngrams
+from qa_vectors import VectorMatcher
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QAIDX\x00\x01\x00"
+ALIGNMENT = 64
+QA_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'qa_data.py')
+
+
+def source_fingerprint(path: str = QA_DATA_PATH) -> Optional[str]:
+    """sha256 of the qa_data.py source, used to detect stale artifacts without importing it."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def gram_hash(gram: str) -> int:
+    return zlib.crc32(gram.encode('utf-8'))
+
+
+class StringTable(Sequence):
+    """Read-only sequence of strings stored as one UTF-8 blob plus an offsets array."""
+
+    def __init__(self, blob, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])]).decode('utf-8')
+
+
+class HashedPostings:
+    """Gram -> key ids lookup over sorted gram hashes, a drop-in for NGramMatcher's postings dict."""
+
+    def __init__(self, hashes: np.ndarray, offsets: np.ndarray, ids: np.ndarray):
+        self.hashes = hashes
+        self.offsets = offsets
+        self.ids = ids
+
+    def get(self, gram: str, default=None):
+        h = gram_hash(gram)
+        pos = int(np.searchsorted(self.hashes, h))
+        if pos >= len(self.hashes) or int(self.hashes[pos]) != h:
+            return default
+        return self.ids[int(self.offsets[pos]):int(self.offsets[pos + 1])].tolist()
+
+
+def _string_arrays(values: Sequence[str]):
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _postings_arrays(keys: Sequence[str]):
+    postings: Dict[int, List[int]] = {}
+    for key_id, key in enumerate(keys):
+        for gram in char_ngrams(key):
+            postings.setdefault(gram_hash(gram), []).append(key_id)
+    hashes = np.array(sorted(postings), dtype=np.uint32)
+    offsets = np.zeros(len(hashes) + 1, dtype=np.int64)
+    np.cumsum([len(postings[int(h)]) for h in hashes], out=offsets[1:])
+    ids = np.array([key_id for h in hashes for key_id in postings[int(h)]], dtype=np.int32)
+    return hashes, offsets, ids
+
+
+def build_index_file(qa_dict: Dict[str, str], path: str, fingerprint: Optional[str] = None) -> Dict:
+    """Compiles qa_dict into the artifact at path and returns its header."""
+    index = QAIndex(qa_dict, matcher='difflib')
+    keys, questions, answers = index.keys, list(index.questions), list(index.answers)
+    vectors = VectorMatcher(keys)
+    gram_hashes, gram_offsets, gram_ids = _postings_arrays(keys)
+
+    sections = {}
+    for name, values in (('keys', keys), ('questions', questions), ('answers', answers)):
+        sections[f'{name}_offsets'], sections[f'{name}_blob'] = _string_arrays(values)
+    sections.update({
+        'key_lengths': np.array([len(k) for k in keys], dtype=np.int32),
+        'gram_hashes': gram_hashes,
+        'gram_offsets': gram_offsets,
+        'gram_ids': gram_ids,
+        'vector_idf': vectors.idf,
+        'vector_indptr': vectors.indptr,
+        'vector_indices': vectors.indices,
+        'vector_data': vectors.data,
+    })
+
+    header = {'count': len(keys), 'source_sha256': fingerprint, 'sections': {}}
+    offset = 0
+    for name, array in sections.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        header['sections'][name] = {'offset': offset, 'dtype': array.dtype.str, 'length': int(array.size)}
+        offset += array.nbytes
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.seek(data_start + header['sections'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+    # Atomic replace so running workers never map a half-written file
+    os.replace(tmp_path, path)
+    return header
+
+
+def load_index(path: str, matcher: str = 'ngram', check_source: bool = True) -> Optional[QAIndex]:
+    """
+    Maps the artifact read-only and assembles a QAIndex over it. Returns None when the
+    artifact is unreadable or was built from a different qa_data.py.
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not map QA index %s: %s", path, e)
+        return None
+
+    if mapped[:len(MAGIC)] != MAGIC:
+        logger.warning("%s is not a QA index artifact", path)
+        return None
+    (header_length,) = struct.unpack_from('<Q', mapped, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(bytes(mapped[header_start:header_start + header_length]))
+    if check_source:
+        fingerprint = source_fingerprint()
+        if fingerprint is not None and header.get('source_sha256') not in (None, fingerprint):
+            logger.warning("QA index %s is stale (qa_data.py changed); rebuilding in memory", path)
+            return None
+    data_start = -(-(header_start + header_length) // ALIGNMENT) * ALIGNMENT
+
+    def section(name):
+        meta = header['sections'][name]
+        return np.frombuffer(mapped, dtype=np.dtype(meta['dtype']), count=meta['length'],
+                             offset=data_start + meta['offset'])
+
+    # Keys are decoded into the process for the exact-match dict; questions and
+    # answers stay in the shared mapping and are decoded on access.
+    keys = list(StringTable(section('keys_blob'), section('keys_offsets')))
+    questions = StringTable(section('questions_blob'), section('questions_offsets'))
+    answers = StringTable(section('answers_blob'), section('answers_offsets'))
+
+    if matcher == 'ngram':
+        postings = HashedPostings(section('gram_hashes'), section('gram_offsets'), section('gram_ids'))
+        fuzzy = NGramMatcher.from_arrays(keys, section('key_lengths').tolist(), postings)
+    elif matcher == 'vector':
+        fuzzy = VectorMatcher.from_arrays(keys, section('vector_idf'), section('vector_indptr'),
+                                          section('vector_indices'), section('vector_data'))
+    else:
+        fuzzy = build_matcher(matcher, keys)
+    return QAIndex.from_entries(keys, questions, answers, fuzzy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the compiled QA index artifact.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Compile qa_data.qa_dict into an index file")
+    build.add_argument('--output', default=os.getenv('QA_INDEX_PATH', 'qa_index.bin'))
+    args = parser.parse_args()
+
+    import qa_data
+    header = build_index_file(qa_data.qa_dict, args.output, fingerprint=source_fingerprint())
+    print(f"Wrote {header['count']} questions to {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import re
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Similarity a cosine score has to reach before a retrieved question counts as a partial match
+DEFAULT_VECTOR_CUTOFF = 0.35
+DEFAULT_DIM = 2 ** 16
+# Dense (keys x buckets) cells best_many may allocate per block of queries (float32, so 16 MB)
+MAX_BLOCK_CELLS = 4 * 1024 * 1024
+# Smaller blocks than this are scored one query at a time
+MIN_BLOCK_QUERIES = 32
+
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from',
+    'i', 'if', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'the', 'this', 'to',
+    'will', 'with', 'you', 'your',
+})
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def text_features(text: str) -> List[str]:
+    """Word unigrams, word bigrams and in-word character trigrams of a normalized question."""
+    words = [w for w in _WORD_RE.findall(text) if w not in STOPWORDS]
+    features = [f"w:{w}" for w in words]
+    features.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = f"<{w}>"
+        features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def feature_bucket(feature: str, dim: int) -> int:
+    """Stable (process independent) hash bucket of a feature."""
+    return zlib.crc32(feature.encode('utf-8')) % dim
+
+
+class VectorMatcher:
+    """
+    Hashed TF-IDF retrieval over the index keys.
+
+    Keys are stored as an L2-normalized sparse CSR matrix (indptr/indices/data), so
+    scoring a query is one sparse matrix-vector product and the top-k comes from
+    np.argpartition instead of a sort over every key.
+    """
+
+    def __init__(self, keys: Sequence[str], cutoff: float = DEFAULT_VECTOR_CUTOFF, dim: int = DEFAULT_DIM):
+        self.keys = keys
+        self.cutoff = cutoff
+        self.dim = dim
+
+        rows = [self._term_counts(key) for key in keys]
+        df = np.zeros(dim, dtype=np.float32)
+        for buckets, _ in rows:
+            df[buckets] += 1
+        self.idf = (np.log((1 + len(keys)) / (1 + df)) + 1).astype(np.float32)
+
+        indptr = [0]
+        indices, data = [], []
+        for buckets, counts in rows:
+            weights = counts * self.idf[buckets]
+            norm = float(np.linalg.norm(weights)) or 1.0
+            indices.append(buckets)
+            data.append(weights / norm)
+            indptr.append(indptr[-1] + len(buckets))
+        self._set_matrix(
+            np.asarray(indptr, dtype=np.int64),
+            np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32),
+            np.concatenate(data).astype(np.float32) if data else np.zeros(0, dtype=np.float32),
+        )
+
+    @classmethod
+    def from_arrays(cls, keys: Sequence[str], idf: np.ndarray, indptr: np.ndarray, indices: np.ndarray,
+                    data: np.ndarray, cutoff: float = DEFAULT_VECTOR_CUTOFF) -> 'VectorMatcher':
+        """Rebuilds a matcher around a precomputed (possibly memory-mapped) matrix, see qa_store."""
+        matcher = cls.__new__(cls)
+        matcher.keys = keys
+        matcher.cutoff = cutoff
+        matcher.dim = len(idf)
+        matcher.idf = idf
+        matcher._set_matrix(indptr, indices, data)
+        return matcher
+
+    def _set_matrix(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self._nonempty = np.diff(indptr) > 0
+        self._row_starts = indptr[:-1][self._nonempty]
+        # Key id of every stored entry, built on first use by best_many
+        self._entry_rows = None
+
+    def _term_counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        buckets = np.fromiter((feature_bucket(f, self.dim) for f in text_features(text)), dtype=np.int32)
+        unique, counts = np.unique(buckets, return_counts=True)
+        # Sublinear term frequency keeps long questions from dominating
+        return unique, (1 + np.log(counts)).astype(np.float32)
+
+    def query_vector(self, query: str) -> np.ndarray:
+        """Dense, L2-normalized TF-IDF vector of a query."""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        buckets, counts = self._term_counts(query)
+        if len(buckets):
+            weights = counts * self.idf[buckets]
+            vector[buckets] = weights / (float(np.linalg.norm(weights)) or 1.0)
+        return vector
+
+    def scores(self, query: str) -> np.ndarray:
+        """Cosine similarity of query against every key."""
+        products = self.data * self.query_vector(query)[self.indices]
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        if len(products):
+            scores[self._nonempty] = np.add.reduceat(products, self._row_starts)
+        return scores
+
+    def top_k(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Returns up to k (key id, score) pairs scoring at least cutoff, best first."""
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0 and scores[i] >= self.cutoff]
+
+    def best(self, query: str) -> Optional[Tuple[int, float]]:
+        """Returns (key id, similarity) of the best key scoring at least cutoff."""
+        top = self.top_k(query, 1)
+        if top and top[0][1] >= self.cutoff:
+            return top[0]
+        return None
+
+    def best_many(self, queries: Sequence[str]) -> List[Optional[Tuple[int, float]]]:
+        """
+        best() for many queries. Queries are grouped into blocks; for each block the
+        key matrix restricted to the buckets the block uses is scattered into a dense
+        array and scored with one matrix product instead of one sparse pass per
+        query. Blocks are sized so that array stays within MAX_BLOCK_CELLS; on very
+        large indexes, where only a few queries would fit, it falls back to best().
+        """
+        if self._entry_rows is None:
+            self._entry_rows = np.repeat(np.arange(len(self.keys)), np.diff(self.indptr))
+        results: List[Optional[Tuple[int, float]]] = []
+        block: List[Tuple[np.ndarray, np.ndarray]] = []
+        block_buckets = 0
+        for query in queries:
+            term_counts = self._term_counts(query)
+            # Upper bound on the block's distinct buckets, so the dense array fits the budget
+            if block and (block_buckets + len(term_counts[0])) * len(self.keys) > MAX_BLOCK_CELLS:
+                results.extend(self._best_block(block))
+                block, block_buckets = [], 0
+            block.append(term_counts)
+            block_buckets += len(term_counts[0])
+        if block:
+            results.extend(self._best_block(block))
+        return results
+
+    def _best_block(self, term_counts: List[Tuple[np.ndarray, np.ndarray]]) -> List[Optional[Tuple[int, float]]]:
+        if len(term_counts) < MIN_BLOCK_QUERIES:
+            return [self._best_scores(self._scores_for(buckets, counts)) for buckets, counts in term_counts]
+        used = np.unique(np.concatenate([buckets for buckets, _ in term_counts]))
+        if not len(used) or not len(self.data):
+            return [None] * len(term_counts)
+        # Rows: the buckets this block uses; columns: its queries
+        weights = np.zeros((len(used), len(term_counts)), dtype=np.float32)
+        for column, (buckets, counts) in enumerate(term_counts):
+            if len(buckets):
+                values = counts * self.idf[buckets]
+                weights[np.searchsorted(used, buckets), column] = values / (float(np.linalg.norm(values)) or 1.0)
+        columns = np.minimum(np.searchsorted(used, self.indices), len(used) - 1)
+        hit = used[columns] == self.indices
+        keys = np.zeros((len(self.keys), len(used)), dtype=np.float32)
+        keys[self._entry_rows[hit], columns[hit]] = self.data[hit]
+        scores = keys @ weights
+        return [self._best_scores(scores[:, column]) for column in range(len(term_counts))]
+
+    def _scores_for(self, buckets: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if len(buckets):
+            weights = counts * self.idf[buckets]
+            vector[buckets] = weights / (float(np.linalg.norm(weights)) or 1.0)
+        products = self.data * vector[self.indices]
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        if len(products):
+            scores[self._nonempty] = np.add.reduceat(products, self._row_starts)
+        return scores
+
+    def _best_scores(self, scores: np.ndarray) -> Optional[Tuple[int, float]]:
+        if not len(scores):
+            return None
+        key_id = int(scores.argmax())
+        score = float(scores[key_id])
+        return (key_id, score) if score > 0 and score >= self.cutoff else None
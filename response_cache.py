@@ -0,0 +1,320 @@
+import asyncio
+import difflib
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from qa_index import normalize_question
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+def prompt_digest(context: str) -> str:
+    """Short, stable digest of a prompt context (system prompt and history) for use in cache keys."""
+    return hashlib.sha1(context.encode('utf-8')).hexdigest()[:16]
+
+
+class SQLiteResponseStore:
+    """
+    Answer cache shared by every process on the host (uvicorn workers, Streamlit),
+    kept in SQLite in WAL mode so readers never wait for a writer.
+
+    Keys are 16-byte digests of the cache key and values zlib-compressed UTF-8.
+    Entries expire after ttl seconds; once more than max_entries are stored the
+    least recently used go first. Both are enforced every PRUNE_INTERVAL writes,
+    so the table can briefly run over max_entries by about that many rows per
+    process. Failures (a locked or unwritable database) are logged and treated
+    as misses; the cache never fails a request.
+    """
+
+    # Writes between expiry/size enforcement passes
+    PRUNE_INTERVAL = 64
+    # A hit only refreshes last_used when it is older than this, so most reads stay reads
+    TOUCH_INTERVAL = 60.0
+
+    def __init__(self, path: str = 'response_cache.db', max_entries: int = 100000, ttl: float = 3600.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        # Guards the counters: get() and put() run in executor threads
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key BLOB PRIMARY KEY,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    value BLOB NOT NULL
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # A short busy timeout: waiting long on a cache would defeat its purpose
+            conn = sqlite3.connect(self.path, timeout=0.5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def digest(key: CacheKey) -> bytes:
+        return hashlib.blake2b('\x1f'.join(key).encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        now = time.time()
+        digest = self.digest(key)
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT expires_at, last_used, value FROM responses WHERE key = ?",
+                               (digest,)).fetchone()
+            if row is None or row[0] < now:
+                with self._lock:
+                    self.misses += 1
+                return None
+            if now - row[1] > self.TOUCH_INTERVAL:
+                with conn:
+                    conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, digest))
+        except sqlite3.Error as e:
+            self._failed('read', e)
+            return None
+        with self._lock:
+            self.hits += 1
+        return zlib.decompress(row[2]).decode('utf-8')
+
+    def put(self, key: CacheKey, response: str):
+        now = time.time()
+        value = zlib.compress(response.encode('utf-8'))
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO responses (key, expires_at, last_used, value) "
+                             "VALUES (?, ?, ?, ?)", (self.digest(key), now + self.ttl, now, value))
+            with self._lock:
+                self._writes += 1
+                due = self._writes % self.PRUNE_INTERVAL == 0
+            if due:
+                self.prune()
+        except sqlite3.Error as e:
+            self._failed('write', e)
+
+    def prune(self):
+        """Deletes expired entries, then the least recently used beyond max_entries."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            (count,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                conn.execute("DELETE FROM responses WHERE key IN "
+                             "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (count - self.max_entries,))
+
+    def clear(self):
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM responses")
+        except sqlite3.Error as e:
+            self._failed('clear', e)
+
+    def __len__(self) -> int:
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except sqlite3.Error as e:
+            self._failed('count', e)
+            return 0
+
+    def _failed(self, operation: str, error: sqlite3.Error):
+        with self._lock:
+            self.errors += 1
+        logger.warning("Shared response cache %s failed (%s): %s", operation, self.path, error)
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache with TTL for generated chatbot answers.
+
+    Entries are keyed on (normalized question, model, context digest), where the
+    context is everything sent before the question: the system prompt and any
+    chat history, so a follow-up such as "tell me more" is only reused within the
+    same conversation state. When near_duplicate_threshold is set, a miss falls
+    back to the most similar cached question for the same model and context
+    (SequenceMatcher ratio at or above the threshold), so light paraphrases and
+    typos reuse an existing answer.
+
+    With a shared store (see SQLiteResponseStore) this cache is a read-through L1
+    in front of it: a local miss is looked up there and copied into the L1, so hot
+    keys stay in process and each answer is paid for once per host rather than
+    once per worker. The L1 is checked inline; the blocking SQLite reads run in a
+    worker thread and writes are handed to one without waiting for them, so a
+    locked database never stalls the event loop.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0,
+                 near_duplicate_threshold: Optional[float] = None,
+                 shared: Optional[SQLiteResponseStore] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.shared = shared
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        # (model, context digest) -> normalized questions cached under it, for near-duplicate lookups
+        self._questions: Dict[Tuple[str, str], set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        threshold = os.getenv('RESPONSE_CACHE_NEAR_DUPLICATE')
+        ttl = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+        shared_path = os.getenv('RESPONSE_CACHE_SHARED_PATH')
+        shared = None
+        if shared_path:
+            shared = SQLiteResponseStore(shared_path, int(os.getenv('RESPONSE_CACHE_SHARED_SIZE', '100000')), ttl)
+        return cls(
+            max_size=int(os.getenv('RESPONSE_CACHE_SIZE', '1024')),
+            ttl=ttl,
+            near_duplicate_threshold=float(threshold) if threshold else None,
+            shared=shared,
+        )
+
+    @staticmethod
+    def make_key(question: str, model: str, context: str) -> CacheKey:
+        return normalize_question(question), model, prompt_digest(context)
+
+    async def get(self, question: str, model: str, context: str) -> Optional[str]:
+        """Returns the cached answer for the question, or None on a miss."""
+        if self.max_size <= 0:
+            return None
+        key = self.make_key(question, model, context)
+        now = time.monotonic()
+        with self._lock:
+            value = self._lookup(key, now)
+            if value is not None:
+                self.hits += 1
+                return value
+        if self.shared is not None:
+            # Outside the lock: other threads keep using the L1 while this reads the database
+            value = await asyncio.to_thread(self.shared.get, key)
+            if value is not None:
+                with self._lock:
+                    self._store(key, value)
+                    self.shared_hits += 1
+                return value
+        with self._lock:
+            if self.near_duplicate_threshold is not None:
+                similar = self._nearest(key)
+                if similar is not None:
+                    value = self._lookup(similar, now)
+                    if value is not None:
+                        self.near_hits += 1
+                        return value
+            self.misses += 1
+            return None
+
+    def put(self, question: str, model: str, context: str, response: str):
+        """
+        Caches an answer, evicting the least recently used entries past max_size.
+        Called from a running event loop; the shared store is written in the background.
+        """
+        if self.max_size <= 0:
+            return
+        key = self.make_key(question, model, context)
+        with self._lock:
+            self._store(key, response)
+        if self.shared is not None:
+            # Not awaited: the answer is already in the L1, and put() logs its own failures
+            asyncio.get_running_loop().run_in_executor(None, self.shared.put, key, response)
+
+    def _store(self, key: CacheKey, response: str):
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        self._questions.setdefault(key[1:], set()).add(key[0])
+        while len(self._entries) > self.max_size:
+            oldest, _ = self._entries.popitem(last=False)
+            self._forget(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._questions.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            hits = self.hits + self.near_hits + self.shared_hits
+            lookups = hits + self.misses
+            stats = {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': hits / lookups if lookups else 0.0,
+            }
+        if self.shared is not None:
+            stats['shared_errors'] = self.shared.errors
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: CacheKey, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < now:
+            del self._entries[key]
+            self._forget(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _forget(self, key: CacheKey):
+        questions = self._questions.get(key[1:])
+        if questions is not None:
+            questions.discard(key[0])
+            if not questions:
+                del self._questions[key[1:]]
+
+    def _nearest(self, key: CacheKey) -> Optional[CacheKey]:
+        # Linear in the number of cached questions for this model/prompt, which
+        # max_size bounds; the cheap ratio upper bounds skip most full comparisons
+        threshold = self.near_duplicate_threshold
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(key[0])
+        best, best_score = None, threshold
+        for question in self._questions.get(key[1:], ()):
+            matcher.set_seq1(question)
+            if matcher.real_quick_ratio() >= best_score and matcher.quick_ratio() >= best_score:
+                score = matcher.ratio()
+                if score >= best_score:
+                    best, best_score = question, score
+        return None if best is None else (best,) + key[1:]
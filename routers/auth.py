@@ -1,10 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from pydantic import BaseModel
-import requests
+from typing import Optional
+import httpx
 import logging
 from dotenv import load_dotenv
 import os
 import json  # {{ edit: Import json for better logging }}
+from valtool_client import ValToolClient
+from session_cache import SessionCache
 
 router = APIRouter()
 
@@ -13,9 +16,11 @@ load_dotenv()
 API_BASE_URL = os.getenv('VALTOOL_API_URL')
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Successful logins, keyed by credentials and by auth token
+session_cache = SessionCache.from_env()
+
 class AuthRequest(BaseModel):
     email: str
     password: str
@@ -28,50 +33,92 @@ class AuthResponse(BaseModel):
     phone: str       # {{ edit: Added phone to AuthResponse }}
     organizations: list  # {{ edit: Added organizations to AuthResponse }}
 
+def get_valtool_client(request: Request) -> ValToolClient:
+    """The pooled ValTool client created in the app lifespan (see main.py)."""
+    client = getattr(request.app.state, 'valtool_client', None)
+    if client is None:
+        # Router mounted without the lifespan: create the shared client lazily
+        client = request.app.state.valtool_client = ValToolClient.from_env()
+    return client
+
+async def fetch_auth_response(valtool: ValToolClient, auth: AuthRequest) -> AuthResponse:
+    """Logs in against ValTool and extracts the fields the app needs."""
+    auth_data, _ = await valtool.login(auth.email, auth.password)
+
+    # {{ edit: Log the entire auth_data for debugging }}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Authentication Response: %s", json.dumps(auth_data, indent=2))
+
+    # {{ edit: Extract auth_token from waivUser.meta.token }}
+    auth_token = auth_data.get('waivUser', {}).get('meta', {}).get('token', 'N/A')
+
+    # {{ edit: Extract test_token from waivUser.meta.test_token if available }}
+    test_token = auth_data.get('waivUser', {}).get('meta', {}).get('test_token', 'N/A')
+
+    # {{ edit: Extract user details from waivUser.data }}
+    user_data = auth_data.get('waivUser', {}).get('data', {})
+    user_name = user_data.get('name', 'N/A')
+    email = user_data.get('email', 'N/A')
+    phone = user_data.get('phone', 'N/A')
+
+    # {{ edit: Extract organization names from waivOrgs.data }}
+    waiv_orgs = auth_data.get('waivOrgs', {}).get('data', [])
+    organizations = [org.get('name', 'N/A') for org in waiv_orgs]
+
+    return AuthResponse(
+        auth_token=auth_token,
+        test_token=test_token,
+        user_name=user_name,
+        email=email,
+        phone=phone,
+        organizations=organizations
+    )
+
+def session_token(session: AuthResponse):
+    return session.auth_token if session.auth_token != 'N/A' else None
+
 @router.post("/login", response_model=AuthResponse)
-def login(auth: AuthRequest):
-    url = f"{API_BASE_URL}/api/login"
-    headers = {'Content-Type': 'application/json'}
-    data = {'EMail': auth.email, 'Password': auth.password}
-    
+async def login(auth: AuthRequest, valtool: ValToolClient = Depends(get_valtool_client)):
     try:
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        auth_data = response.json()
-        
-        # {{ edit: Log the entire auth_data for debugging }}
-        logger.debug(f"Authentication Response: {json.dumps(auth_data, indent=2)}")
-        
-        # {{ edit: Extract auth_token from waivUser.meta.token }}
-        auth_token = auth_data.get('waivUser', {}).get('meta', {}).get('token', 'N/A')
-        
-        # {{ edit: Extract test_token from waivUser.meta.test_token if available }}
-        test_token = auth_data.get('waivUser', {}).get('meta', {}).get('test_token', 'N/A')
-        
-        # {{ edit: Extract user details from waivUser.data }}
-        user_data = auth_data.get('waivUser', {}).get('data', {})
-        user_name = user_data.get('name', 'N/A')
-        email = user_data.get('email', 'N/A')
-        phone = user_data.get('phone', 'N/A')
-        
-        # {{ edit: Extract organization names from waivOrgs.data }}
-        waiv_orgs = auth_data.get('waivOrgs', {}).get('data', [])
-        organizations = [org.get('name', 'N/A') for org in waiv_orgs]
-        
-        logger.info(f"User {auth.email} authenticated successfully.")
-        return AuthResponse(
-            auth_token=auth_token,
-            test_token=test_token,
-            user_name=user_name,
-            email=email,
-            phone=phone,
-            organizations=organizations
+        # Repeat logins are served from the session cache, and concurrent logins
+        # for the same credentials share one ValTool call
+        session = await session_cache.login(
+            auth.email, auth.password,
+            lambda: fetch_auth_response(valtool, auth),
+            token_of=session_token
         )
-    except requests.HTTPError as http_err:
-        logger.error(f"HTTP error during authentication for user {auth.email}: {http_err}")
-        raise HTTPException(status_code=response.status_code, detail="Authentication failed.")
+        logger.info("User %s authenticated successfully.", auth.email)
+        return session
+    except httpx.HTTPStatusError as http_err:
+        logger.error("HTTP error during authentication for user %s: %s", auth.email, http_err)
+        raise HTTPException(status_code=http_err.response.status_code, detail="Authentication failed.")
+    except httpx.PoolTimeout:
+        logger.error("ValTool connection pool exhausted during authentication for user %s", auth.email)
+        raise HTTPException(status_code=503, detail="Authentication service busy, please retry.")
+    except httpx.TimeoutException as timeout_err:
+        logger.error("Timeout during authentication for user %s: %r", auth.email, timeout_err)
+        raise HTTPException(status_code=504, detail="Authentication service timed out.")
     except Exception as err:
-        logger.error(f"Unexpected error during authentication for user {auth.email}: {err}")
+        logger.error("Unexpected error during authentication for user %s: %s", auth.email, err)
         raise HTTPException(status_code=500, detail="Internal server error.")
 
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if authorization and authorization.lower().startswith('bearer '):
+        return authorization[7:].strip()
+    return None
+
+@router.get("/session", response_model=AuthResponse)
+async def get_session(authorization: Optional[str] = Header(None)):
+    """Validates a bearer auth_token against the session cache, without calling ValTool."""
+    token = bearer_token(authorization)
+    cached = session_cache.validate(token) if token else None
+    if cached is None:
+        raise HTTPException(status_code=401, detail="Session not found or expired.")
+    return cached
 
+@router.post("/logout", status_code=204)
+async def logout(authorization: Optional[str] = Header(None)):
+    """Drops the cached session for a bearer auth_token."""
+    token = bearer_token(authorization)
+    if token:
+        session_cache.invalidate(token)
@@ -1,64 +1,48 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import qa_data
-import difflib
+from typing import List, Optional
+from qa_index import get_qa_index
+from topic_classifier import router_topic_classifier
 import logging
-from chatbot import IntelligentChatbot
+from chatbot import get_chatbot
 import asyncio
-import re
-import traceback  # {{ edit: Import traceback for detailed error logging }}
+from itertools import count
+import json
 import os  # {{ edit: Import os for accessing environment variables }}
 
 router = APIRouter()
 
-# Configure logging to capture DEBUG level and add traceback
-logging.basicConfig(
-    level=logging.DEBUG,  # {{ edit: Set logging level to DEBUG }}
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("chatbot_debug.log"),  # {{ edit: Log to a separate debug file }}
-        logging.StreamHandler()
-    ]
-)
+# Handlers and level are configured once in main.py (see logging_config)
 logger = logging.getLogger(__name__)
 
 class ChatRequest(BaseModel):
     user_question: str
-    chat_history: list
+    # Server-side history for this conversation is used when conversation_id is known;
+    # chat_history is only read to seed a new conversation (older clients still send it)
+    conversation_id: Optional[str] = None
+    chat_history: list = []
 
 class ChatResponse(BaseModel):
     response: str
     step: str
+    conversation_id: Optional[str] = None
 
-def find_best_match(user_question, qa_dict):
-    """Finds the best match for the user query in qa_dict."""
-    questions = list(qa_dict.keys())
-    user_question_normalized = user_question.strip().lower()
-
-    # Exact match (case-insensitive)
-    if user_question_normalized in (q.lower() for q in questions):
-        # Retrieve the original case question
-        original_question = next(q for q in questions if q.lower() == user_question_normalized)
-        return qa_dict[original_question], 'exact'
+class BatchChatRequest(BaseModel):
+    # Stateless: answered like a first message of a new conversation, nothing is stored
+    questions: List[str]
 
-    # Partial match using difflib for fuzzy matching
-    matches = difflib.get_close_matches(user_question_normalized, (q.lower() for q in questions), n=1, cutoff=0.6)
-    if matches:
-        matched_question = next(q for q in questions if q.lower() == matches[0])
-        return qa_dict[matched_question], 'partial'
+def find_best_match(user_question, index=None):
+    """Finds the best match for the user query in the shared QA index."""
+    return (index or get_qa_index()).find_best_match(user_question)
 
-    return None, 'no_match'
+def find_best_matches(user_questions, index=None):
+    """find_best_match for a batch, each distinct question looked up once (see QAIndex.match_many)."""
+    return [(match.answer, match.match_type) for match in (index or get_qa_index()).match_many(user_questions)]
 
 def is_us_property_related(user_question):
-    keywords = [
-        'property', 'real estate', 'us market', 'waivio', 'autoval', 
-        'fastr', 'inspection', 'avm', 'appraisal', 'valuation',
-        'mortgage', 'home', 'loan', 'housing', 'estate', 'comp',
-        'comparable', 'rent', 'land', 'broker', 'agent',
-        'valuation', 'market trends', 'equity', 'mortgage rates'
-    ]
-    pattern = r'\b(' + '|'.join(re.escape(k) for k in keywords) + r')\b'
-    return re.search(pattern, user_question.lower()) is not None
+    """True if the question mentions any of the router's US property keywords (ROUTER_KEYWORDS)."""
+    return router_topic_classifier.is_relevant(user_question)
 
 def get_next_step(current_step, user_question):
     """
@@ -73,69 +57,285 @@ def get_next_step(current_step, user_question):
 
 import asyncio  # Ensure asyncio is imported for asynchronous operations
 
-# Remove or comment out the synchronous OpenAI import
-# from openai import OpenAI
+from admission import BUSY_RESPONSE, AdmissionRejected
+from openai_gateway import create_chat_completion, response_cache, stream_chat_completion
+from conversation_store import create_conversation_store
+from metrics import MATCHES, STAGE_SECONDS
+from qa_index import normalize_question
+from traffic_capture import annotate
+from qa_source import get_source_watcher
 
-# Add import for AsyncOpenAI
-from openai import AsyncOpenAI
+# Conversation history lives server-side; clients only send the new message and the id
+conversation_store = create_conversation_store()
 
+# Upper bound on questions per /chat/batch call, and on its concurrent OpenAI calls
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv('CHAT_BATCH_MAX_QUESTIONS', '5000'))
+CHAT_BATCH_CONCURRENCY = int(os.getenv('CHAT_BATCH_CONCURRENCY', '8'))
+# Questions matched per worker-thread hop; keeps each hop short (tens of ms with the n-gram matcher)
+CHAT_BATCH_MATCH_CHUNK = 128
 
+SYSTEM_PROMPT = "You are EvalAssist, an expert assistant for WAIV, specializing in the US property market."
+OFF_TOPIC_RESPONSE = "I'm sorry, I can only assist with questions related to the US property market and WAIV services."
 
-# Initialize a single instance of IntelligentChatbot to be reused
-chatbot_instance = IntelligentChatbot()
+def build_messages(user_question):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_question}
+    ]
 
 async def generate_intelligent_response(user_question):
     """
     Generates an intelligent response using OpenAI's GPT model asynchronously.
     """
     try:
-        response = await chatbot_instance.client.chat.completions.create(
-            model=chatbot_instance.model,
-            messages=[
-                {"role": "system", "content": "You are EvalAssist, an expert assistant for WAIV, specializing in the US property market."},
-                {"role": "user", "content": user_question}
-            ]
-        )
-        return response.choices[0].message.content
+        bot = get_chatbot()
+        return await create_chat_completion(bot.client, bot.model, build_messages(user_question))
+    except AdmissionRejected:
+        # Already logged and counted by the gateway; callers fall back to the dataset
+        raise
     except Exception as e:
-        logger.error(f"Error generating intelligent response: {e}")
-        logger.debug(traceback.format_exc())  # Log full traceback
+        logger.error("Error generating intelligent response: %s", e)
+        logger.debug("Traceback", exc_info=True)
         raise
 
-def handle_user_query_backend(user_question, chat_history):
+def classify_question(user_question):
+    """
+    Returns (dataset answer, match_type) where match_type is 'exact', 'partial',
+    'no_match' (on topic, answered by OpenAI alone) or 'off_topic'.
+    """
+    with STAGE_SECONDS.time('find_best_match'):
+        answer, match_type = find_best_match(user_question)
+    if match_type == 'no_match':
+        with STAGE_SECONDS.time('topic_gate'):
+            if not is_us_property_related(user_question):
+                match_type = 'off_topic'
+    MATCHES.inc(match_type)
+    # Recorded with the request when traffic capture is on (TRAFFIC_CAPTURE_PATH)
+    annotate(match_type=match_type)
+    return answer, match_type
+
+def classify_questions(user_questions):
+    """classify_question for a batch (see find_best_matches). CPU-bound; async callers run it in a thread."""
+    with STAGE_SECONDS.time('find_best_match_batch'):
+        matches = find_best_matches(user_questions)
+    results = []
+    for user_question, (answer, match_type) in zip(user_questions, matches):
+        if match_type == 'no_match' and not is_us_property_related(user_question):
+            match_type = 'off_topic'
+        MATCHES.inc(match_type)
+        results.append((answer, match_type))
+    return results
+
+def classify_batch(user_questions):
+    """
+    classify_questions plus each question's intents (topic names), extracted in one
+    batch: through nlp.pipe with INTENT_EXTRACTOR=spacy. Runs in a worker thread.
+    """
+    classified = classify_questions(user_questions)
+    with STAGE_SECONDS.time('intent_extraction_batch'):
+        intents = get_chatbot().intent_extractor.extract_many(user_questions)
+    return classified, intents
+
+async def answer_for_match(user_question, answer, match_type):
+    """The response text for a classified question, asking OpenAI for partial and unmatched ones."""
+    if match_type == 'exact':
+        return answer
+    if match_type == 'off_topic':
+        return OFF_TOPIC_RESPONSE
+    try:
+        intelligent_response = await generate_intelligent_response(user_question)
+    except AdmissionRejected:
+        # Overloaded: answer from the dataset alone rather than wait for OpenAI
+        return answer if match_type == 'partial' else BUSY_RESPONSE
+    if match_type == 'partial':
+        return f"{answer}\n\n{intelligent_response}"  # {{ edit: Combine dataset and intelligent responses }}
+    return intelligent_response
+
+async def handle_user_query_backend(user_question, chat_history):
     try:
-        answer, match_type = find_best_match(user_question, qa_data.qa_dict)
-        if match_type == 'exact':
-            next_step = get_next_step(chat_history[-1]['step'] if chat_history else 'greeting', user_question)
-            return answer, next_step
-        elif match_type == 'partial':
-            dataset_answer = answer
-            intelligent_response = asyncio.run(generate_intelligent_response(user_question))
-            combined_response = f"{dataset_answer}\n\n{intelligent_response}"
-            next_step = get_next_step(chat_history[-1]['step'] if chat_history else 'greeting', user_question)
-            return combined_response, next_step  # {{ edit: Combine dataset and intelligent responses }}
-        elif is_us_property_related(user_question):
-            intelligent_response = asyncio.run(generate_intelligent_response(user_question))
-            next_step = get_next_step(chat_history[-1]['step'] if chat_history else 'greeting', user_question)
-            return intelligent_response, next_step
-        else:
-            return "I'm sorry, I can only assist with questions related to the US property market and WAIV services.", 'end'
+        answer, match_type = classify_question(user_question)
+        response = await answer_for_match(user_question, answer, match_type)
+        if match_type == 'off_topic':
+            return response, 'end'
+        next_step = get_next_step(chat_history[-1]['step'] if chat_history else 'greeting', user_question)
+        return response, next_step
     except Exception as e:
-        logger.error(f"Error in handle_user_query_backend: {e}")
-        logger.debug(traceback.format_exc())  # {{ edit: Log full traceback }}
+        logger.error("Error in handle_user_query_backend: %s", e)
+        logger.debug("Traceback", exc_info=True)
         raise
 
+async def call_store(method, *args):
+    """Calls a conversation_store method, in a worker thread when the store does blocking I/O."""
+    if conversation_store.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+async def resolve_conversation(request: ChatRequest):
+    """Returns (conversation_id, chat_history), starting a new conversation if the id is unknown."""
+    with STAGE_SECONDS.time('conversation_store'):
+        if request.conversation_id:
+            chat_history = await call_store(conversation_store.get, request.conversation_id)
+            if chat_history is not None:
+                return request.conversation_id, chat_history
+        return await call_store(conversation_store.create, request.chat_history), request.chat_history
+
+async def record_turn(conversation_id, user_question, response, next_step):
+    with STAGE_SECONDS.time('conversation_store'):
+        await call_store(
+            conversation_store.append,
+            conversation_id,
+            {"role": "user", "content": user_question, "step": "user_input"},
+            {"role": "assistant", "content": response, "step": next_step}
+        )
+
 @router.post("/chat")
 async def chat(request: ChatRequest):
     user_question = request.user_question
-    chat_history = request.chat_history
 
     try:
-        response, next_step = handle_user_query_backend(user_question, chat_history)
-        return ChatResponse(response=response, step=next_step)
+        with STAGE_SECONDS.time('total'):
+            conversation_id, chat_history = await resolve_conversation(request)
+            response, next_step = await handle_user_query_backend(user_question, chat_history)
+            await record_turn(conversation_id, user_question, response, next_step)
+        return ChatResponse(response=response, step=next_step, conversation_id=conversation_id)
     except Exception as e:
-        logger.error(f"Error processing chat request: {e}")
-        logger.debug(traceback.format_exc())  # {{ edit: Log full traceback at DEBUG level }}
+        logger.error("Error processing chat request: %s", e)
+        logger.debug("Traceback", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+def sse_event(data, event=None):
+    """Formats one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def stream_user_query_backend(user_question, chat_history):
+    """
+    Streaming counterpart of handle_user_query_backend. Yields the dataset answer
+    first when there is one, then OpenAI tokens as they arrive, and finally the
+    next step as ('step', step).
+    """
+    answer, match_type = classify_question(user_question)
+    if match_type == 'exact':
+        yield 'token', answer
+    elif match_type in ('partial', 'no_match'):
+        if match_type == 'partial':
+            yield 'token', f"{answer}\n\n"
+        bot = get_chatbot()
+        try:
+            async for token in stream_chat_completion(bot.client, bot.model, build_messages(user_question)):
+                yield 'token', token
+        except AdmissionRejected:
+            # Raised before the first token, so the dataset answer (if any) stands alone
+            if match_type == 'no_match':
+                yield 'token', BUSY_RESPONSE
+    else:
+        yield 'token', OFF_TOPIC_RESPONSE
+        yield 'step', 'end'
+        return
+    yield 'step', get_next_step(chat_history[-1]['step'] if chat_history else 'greeting', user_question)
+
+async def chat_event_stream(request: ChatRequest):
+    """SSE frames for /chat/stream: the conversation id, the answer tokens, then the step."""
+    try:
+        conversation_id, chat_history = await resolve_conversation(request)
+        yield sse_event({"conversation_id": conversation_id}, event="conversation")
+        parts = []
+        async for kind, value in stream_user_query_backend(request.user_question, chat_history):
+            if kind == 'token':
+                parts.append(value)
+                yield sse_event({"token": value})
+            else:
+                await record_turn(conversation_id, request.user_question, ''.join(parts), value)
+                yield sse_event({"step": value}, event="step")
+    except Exception as e:
+        logger.error("Error streaming chat response: %s", e)
+        logger.debug("Traceback", exc_info=True)
+        yield sse_event({"detail": "Internal Server Error"}, event="error")
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Same as /chat, but streams the answer as Server-Sent Events."""
+    return StreamingResponse(
+        chat_event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def batch_answer_lines(user_questions):
+    """
+    NDJSON lines for /chat/batch, one per question, in completion order: dataset
+    and off-topic answers as soon as their chunk is matched, then OpenAI answers
+    as they arrive. Repeated questions are answered once and reported under each
+    of their indexes.
+    """
+    groups = {}
+    for i, user_question in enumerate(user_questions):
+        groups.setdefault(normalize_question(user_question), []).append(i)
+    unique = [user_questions[indexes[0]] for indexes in groups.values()]
+    semaphore = asyncio.Semaphore(CHAT_BATCH_CONCURRENCY)
+
+    async def answer(position, answer_text, match_type, intents):
+        user_question = unique[position]
+        try:
+            async with semaphore:
+                response = await answer_for_match(user_question, answer_text, match_type)
+            return position, {"match_type": match_type, "intents": intents, "response": response}
+        except Exception as e:
+            logger.error("Error answering batch question %r: %s", user_question, e)
+            return position, {"match_type": match_type, "intents": intents, "error": "Internal Server Error"}
+
+    def lines(position, result):
+        return ''.join(json.dumps({"index": i, "question": user_questions[i], **result}) + "\n"
+                       for i in groups[normalize_question(unique[position])])
+
+    tasks = []
+    match_types = {}
+    # Recorded with the request when traffic capture is on (TRAFFIC_CAPTURE_PATH)
+    annotate(match_types=match_types)
+    try:
+        for start in range(0, len(unique), CHAT_BATCH_MATCH_CHUNK):
+            # Matching thousands of questions takes seconds; off the event loop and in
+            # chunks, so /chat, /ready and logins keep being served meanwhile
+            classified, intents = await asyncio.to_thread(classify_batch, unique[start:start + CHAT_BATCH_MATCH_CHUNK])
+            for position, (answer_text, match_type), question_intents in zip(count(start), classified, intents):
+                match_types[match_type] = match_types.get(match_type, 0) + 1
+                if match_type in ('exact', 'off_topic'):
+                    response = answer_text if match_type == 'exact' else OFF_TOPIC_RESPONSE
+                    yield lines(position, {"match_type": match_type, "intents": question_intents, "response": response})
+                else:
+                    tasks.append(asyncio.create_task(answer(position, answer_text, match_type, question_intents)))
+        for finished in asyncio.as_completed(tasks):
+            yield lines(*await finished)
+    finally:
+        # The client may disconnect mid-stream; stop the OpenAI calls still queued
+        for task in tasks:
+            task.cancel()
+
+@router.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest):
+    """
+    Answers many independent questions in one call, streamed back as NDJSON as
+    they complete: {"index", "question", "match_type", "intents", "response"} per
+    line ("error" instead of "response" if that question failed). Matching runs in a
+    worker thread; it is one vectorized pass per block only with QA_MATCHER=vector,
+    otherwise one fuzzy lookup per distinct question. Intents are extracted a block
+    at a time too (one nlp.pipe call with INTENT_EXTRACTOR=spacy).
+    """
+    if len(request.questions) > CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {CHAT_BATCH_MAX_QUESTIONS} questions per batch")
+    return StreamingResponse(batch_answer_lines(request.questions), media_type="application/x-ndjson",
+                             headers={"X-Accel-Buffering": "no"})
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the OpenAI response cache."""
+    return response_cache.stats()
 
+@router.get("/qa/source")
+async def qa_source_status():
+    """Reload status of the QA_SOURCE_PATH knowledge base, with its duplicate and shadowed questions."""
+    watcher = get_source_watcher()
+    if watcher is None:
+        raise HTTPException(status_code=404, detail="QA_SOURCE_PATH is not configured")
+    return watcher.status()
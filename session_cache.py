@@ -0,0 +1,176 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+# Per-process key for credential digests; plaintext passwords are never stored
+_CREDENTIAL_KEY = secrets.token_bytes(32)
+
+
+def credential_key(email: str, password: str) -> str:
+    """Keyed digest of a login's credentials."""
+    message = f"{email.strip().lower()}\0{password}".encode('utf-8')
+    return hmac.new(_CREDENTIAL_KEY, message, hashlib.sha256).hexdigest()
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """The 'exp' claim of a JWT (unverified, only used to bound caching), or None."""
+    parts = token.split('.') if token else []
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + '=' * (-len(parts[1]) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+        return float(exp) if exp is not None else None
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    token: Optional[str]
+    session: Any
+
+
+class SessionCache:
+    """
+    Bounded cache of successful ValTool logins.
+
+    Entries are keyed by a digest of the credentials and indexed by the returned
+    auth token, so a repeat login or a token check is answered without calling
+    ValTool. An entry lives until its JWT 'exp' (minus expiry_skew) when the token
+    carries one, otherwise default_ttl, and never longer than max_ttl; least
+    recently used entries go first once max_entries is reached. Concurrent logins
+    for the same credentials share one upstream call (see login()).
+
+    Failed logins are never cached, but a password changed in ValTool keeps
+    working here until the cached entry expires; keep max_ttl short accordingly.
+    """
+
+    def __init__(self, max_entries: int = 10000, default_ttl: float = 900.0, max_ttl: float = 3600.0,
+                 expiry_skew: float = 30.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.expiry_skew = expiry_skew
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_token: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls) -> 'SessionCache':
+        return cls(
+            max_entries=int(os.getenv('SESSION_CACHE_SIZE', '10000')),
+            default_ttl=float(os.getenv('SESSION_CACHE_TTL', '900')),
+            max_ttl=float(os.getenv('SESSION_CACHE_MAX_TTL', '3600')),
+        )
+
+    def get_by_credentials(self, email: str, password: str) -> Optional[Any]:
+        """Cached session for these credentials, or None."""
+        key = credential_key(email, password)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.session
+
+    def validate(self, token: str) -> Optional[Any]:
+        """Cached session that issued token, or None if unknown or expired."""
+        with self._lock:
+            key = self._by_token.get(token)
+            entry = self._live_entry(key) if key else None
+            return entry.session if entry is not None else None
+
+    def put(self, email: str, password: str, session: Any, token: Optional[str] = None):
+        """Caches a successful login; token (if any) sets the TTL and enables validate()."""
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        ttl = self.default_ttl
+        exp = token_expiry(token) if token else None
+        if exp is not None:
+            ttl = exp - self.expiry_skew - now
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        key = credential_key(email, password)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(now + ttl, token, session)
+            if token:
+                self._by_token[token] = key
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, token: str):
+        """Forgets the session that issued token (e.g. on logout)."""
+        with self._lock:
+            key = self._by_token.get(token)
+            if key:
+                self._remove(key)
+
+    async def login(self, email: str, password: str, loader: Callable[[], Awaitable[Any]],
+                    token_of: Callable[[Any], Optional[str]] = lambda session: None) -> Any:
+        """
+        Returns the cached session for the credentials, or awaits loader() to
+        create one. Concurrent calls with the same credentials await the same
+        loader() call instead of each going upstream.
+        """
+        cached = self.get_by_credentials(email, password)
+        if cached is not None:
+            return cached
+
+        key = credential_key(email, password)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            session = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not reported as never-retrieved
+            future.exception()
+            raise
+        else:
+            self.put(email, password, session, token_of(session))
+            future.set_result(session)
+            return session
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'coalesced': self.coalesced, 'inflight': len(self._inflight)}
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.token and self._by_token.get(entry.token) == key:
+            del self._by_token[entry.token]
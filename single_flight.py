@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls: while a call for a key is in flight, later
+    callers with the same key await its result instead of starting their own.
+
+    The call runs as its own task, so a caller that goes away (a client
+    disconnect cancels its request) does not cancel it for the others. Calls are
+    only shared within one event loop; Streamlit sessions each run their own.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Returns the result of call(), or of the identical call already in flight."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._calls.get(key)
+            if task is not None and task.get_loop() is loop and not task.done():
+                self.coalesced += 1
+            else:
+                task = loop.create_task(call())
+                self._calls[key] = task
+                self.started += 1
+                task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        with self._lock:
+            if self._calls.get(key) is task:
+                del self._calls[key]
+        # Retrieved here so a failure nobody is still waiting for is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'started': self.started, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
@@ -1,13 +1,25 @@
 # To use the requests library, ensure it is installed in your environment.
 # You can install it using the following command:
 # pip install requests
+#
+# Credentials are read from the environment (or .env), never from this file:
+#   VALTOOL_API_URL       ValTool base URL
+#   VALTOOL_TEST_EMAIL    account to log in with
+#   VALTOOL_TEST_PASSWORD its password
+# For load and latency testing use benchmarks/suite.py, which runs against local stubs.
+import os
+import sys
+
 import requests
 import logging  # {{ edit: Import the logging module }}
 import json  # {{ edit: Import json for better logging }}
+from dotenv import load_dotenv
+
+load_dotenv()
 
-API_BASE_URL = 'https://valuetest.waivit.net'
-EMAIL = 'pratiksha.talekar@kanakasoftware.com'
-PASSWORD = 'Admin1234!'
+API_BASE_URL = os.getenv('VALTOOL_API_URL', 'https://valuetest.waivit.net')
+EMAIL = os.getenv('VALTOOL_TEST_EMAIL')
+PASSWORD = os.getenv('VALTOOL_TEST_PASSWORD')
 
 # {{ edit: Configure logging to write to testauth_log.log }}
 logging.basicConfig(
@@ -28,7 +40,7 @@ def authenticate_user(email, password, session):
 
     Returns:
         dict: JSON response containing authentication tokens.
-    
+
     Raises:
         requests.HTTPError: If the authentication request fails.
     """
@@ -38,37 +50,40 @@ def authenticate_user(email, password, session):
     response = session.post(url, json=data, headers=headers)
     response.raise_for_status()
     auth_data = response.json()
-    
+
     # {{ edit: Log the complete API response }}
-    logging.debug(f"Authentication Response: {json.dumps(auth_data, indent=2)}")
-    
+    logging.debug("Authentication Response: %s", json.dumps(auth_data, indent=2))
+
     return auth_data
 
 def main():
     """
     Main function to authenticate and display tokens.
     """
+    if not EMAIL or not PASSWORD:
+        sys.exit("Set VALTOOL_TEST_EMAIL and VALTOOL_TEST_PASSWORD (environment or .env) to run this check.")
+
     with requests.Session() as session:
         try:
             auth_data = authenticate_user(EMAIL, PASSWORD, session)
             auth_token = auth_data['waivUser']['meta']['token']  # {{ edit: Extract auth_token correctly }}
-            
+
             # {{ edit: Log the complete API response for analysis }}
-            logging.debug(f"Authentication Response: {auth_data}")
-            
+            logging.debug("Authentication Response: %s", auth_data)
+
             # Print all cookies in the session
             all_cookies = session.cookies.get_dict()
             print("All Cookies:", all_cookies)
-            
+
             # Attempt to retrieve 'test_token' from auth_data or cookies
             test_token = auth_data['waivUser']['meta'].get('test_token') or session.cookies.get('test_token') or session.cookies.get('evp-valuation')
             print(f"Auth Token: {auth_token}")
             print(f"Test Token: {test_token}")
         except requests.HTTPError as http_err:
-            logging.error(f"HTTP error occurred: {http_err}")  # {{ edit: Log HTTP errors }}
+            logging.error("HTTP error occurred: %s", http_err)  # {{ edit: Log HTTP errors }}
             print(f"HTTP error occurred: {http_err}")
         except Exception as err:
-            logging.error(f"An error occurred: {err}")  # {{ edit: Log general errors }}
+            logging.error("An error occurred: %s", err)  # {{ edit: Log general errors }}
             print(f"An error occurred: {err}")
 
 if __name__ == '__main__':
@@ -0,0 +1,64 @@
+import difflib
+import os
+import random
+import sys
+
+import pytest
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# chatbot.py refuses to import without these; nothing here reaches the real services
+os.environ.setdefault('VALTOOL_API_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+OFF_TOPIC_QUERIES = ["What is the weather on Mars?", "Tell me a joke", "How do I bake sourdough bread?",
+                     "Who won the football game last night?"]
+
+
+def original_find_best_match(user_question, qa_dict):
+    """find_best_match as the router had it before QAIndex: a linear scan plus difflib.get_close_matches."""
+    questions = list(qa_dict.keys())
+    user_question_normalized = user_question.strip().lower()
+    if user_question_normalized in (q.lower() for q in questions):
+        original_question = next(q for q in questions if q.lower() == user_question_normalized)
+        return qa_dict[original_question], 'exact'
+    matches = difflib.get_close_matches(user_question_normalized, (q.lower() for q in questions), n=1, cutoff=0.6)
+    if matches:
+        matched_question = next(q for q in questions if q.lower() == matches[0])
+        return qa_dict[matched_question], 'partial'
+    return None, 'no_match'
+
+
+@pytest.fixture(scope='session')
+def baseline_cases():
+    """
+    {family: [(query, original answer, original match type)]} over qa_data: exact
+    questions in other case and spacing, typos, shuffled words, a dropped word, off-topic.
+    """
+    from benchmarks.common import perturb
+    from qa_data import qa_dict
+
+    rng = random.Random(2024)
+    questions = list(qa_dict)
+
+    def shuffled(question):
+        words = question.split()
+        rng.shuffle(words)
+        return ' '.join(words)
+
+    def dropped(question):
+        words = question.split()
+        if len(words) > 1:
+            del words[rng.randrange(len(words))]
+        return ' '.join(words)
+
+    families = {
+        'exact': [f"  {question.upper()} " for question in rng.sample(questions, 20)],
+        'typo': [perturb(rng.choice(questions), rng, edits=rng.randint(1, 3)) for _ in range(50)],
+        'shuffled': [shuffled(rng.choice(questions)) for _ in range(50)],
+        'dropped': [dropped(rng.choice(questions)) for _ in range(50)],
+        'off_topic': OFF_TOPIC_QUERIES,
+    }
+    return {family: [(query, *original_find_best_match(query, qa_dict)) for query in queries]
+            for family, queries in families.items()}
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionRejected, ConcurrencyLimiter
+
+
+async def settle(limiter, task):
+    """Lets scheduled grants run; releases the slot if task ended up holding one. Returns its outcome."""
+    await asyncio.sleep(0.01)
+    try:
+        await task
+    except (AdmissionRejected, asyncio.CancelledError) as e:
+        return e
+    limiter.release()
+    return 'acquired'
+
+
+def assert_idle(limiter):
+    assert (limiter.active, limiter.waiting) == (0, 0)
+
+
+def test_rejects_when_queue_is_full_and_on_timeout():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_waiting=1)
+        await limiter.acquire(timeout=1)
+        waiter = asyncio.create_task(limiter.acquire(timeout=0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await limiter.acquire(timeout=1)
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await waiter
+        limiter.release()
+        return full.value.reason, timed_out.value.reason, limiter
+
+    full, timed_out, limiter = asyncio.run(scenario())
+    assert (full, timed_out) == ('queue_full', 'queue_timeout')
+    assert_idle(limiter)
+
+
+def test_slots_go_to_waiters_in_order():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_waiting=10)
+        await limiter.acquire(timeout=1)
+        order = []
+
+        async def wait(i):
+            await limiter.acquire(timeout=1)
+            order.append(i)
+            await asyncio.sleep(0)
+            limiter.release()
+
+        tasks = [asyncio.create_task(wait(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order, limiter
+
+    order, limiter = asyncio.run(scenario())
+    assert order == [0, 1, 2, 3, 4]
+    assert_idle(limiter)
+
+
+@pytest.mark.parametrize('release_first', [True, False])
+def test_cancelled_waiter_racing_a_grant_does_not_leak_the_slot(release_first):
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_waiting=10)
+        await limiter.acquire(timeout=1)
+        waiter = asyncio.create_task(limiter.acquire(timeout=10))
+        await asyncio.sleep(0)
+        # Both happen before the waiter runs again: the grant is already on its way
+        # (or about to be) when the cancellation lands
+        if release_first:
+            limiter.release()
+            waiter.cancel()
+        else:
+            waiter.cancel()
+            limiter.release()
+        await settle(limiter, waiter)
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert_idle(limiter)
+
+
+@pytest.mark.parametrize('offset', [-0.002, 0.0, 0.002])
+def test_queue_timeout_racing_a_slot_grant(offset):
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_waiting=10)
+        await limiter.acquire(timeout=1)
+        timeout = 0.05
+        waiter = asyncio.create_task(limiter.acquire(timeout=timeout))
+        # A second waiter must get the slot whichever way the race goes
+        follower = asyncio.create_task(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+        asyncio.get_running_loop().call_later(timeout + offset, limiter.release)
+        outcome = await settle(limiter, waiter)
+        await asyncio.sleep(timeout + 0.02)
+        assert await settle(limiter, follower) == 'acquired'
+        return outcome, limiter
+
+    outcome, limiter = asyncio.run(scenario())
+    assert outcome == 'acquired' or getattr(outcome, 'reason', None) == 'queue_timeout'
+    assert_idle(limiter)
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, InternalServerError
+
+from benchmarks import suite
+from benchmarks.common import drive, percentiles
+from benchmarks.stubs import mock_openai_app, serve_in_thread, stub_valtool_app
+from routers import auth
+from valtool_client import ValToolClient
+
+MESSAGES = [{'role': 'user', 'content': 'What is AutoVal?'}]
+
+
+def openai_client(app):
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://openai')
+    return AsyncOpenAI(api_key='sk-mock', base_url='http://openai/v1', http_client=http_client, max_retries=0)
+
+
+def test_mock_openai_answers_through_the_sdk_after_its_latency():
+    async def scenario():
+        client = openai_client(mock_openai_app(latency=0.1))
+        started = time.perf_counter()
+        response = await client.chat.completions.create(model='gpt-3.5-turbo', messages=MESSAGES)
+        return response, time.perf_counter() - started
+
+    response, elapsed = asyncio.run(scenario())
+    assert response.choices[0].message.content == "Mock answer to: What is AutoVal?"
+    assert response.usage.total_tokens == 20 + 6
+    assert 0.1 <= elapsed < 0.5
+
+
+def test_mock_openai_streams_tokens_and_usage():
+    async def scenario():
+        client = openai_client(mock_openai_app(latency=0.04, token_interval=0.001))
+        stream = await client.chat.completions.create(model='gpt-3.5-turbo', messages=MESSAGES, stream=True,
+                                                      stream_options={'include_usage': True})
+        return [chunk async for chunk in stream]
+
+    chunks = asyncio.run(scenario())
+    assert ''.join(chunk.choices[0].delta.content for chunk in chunks if chunk.choices) == \
+        "Mock answer to: What is AutoVal?"
+    assert chunks[-1].usage.completion_tokens == 6
+
+
+def test_mock_openai_fails_its_error_ratio():
+    async def scenario():
+        app = mock_openai_app(latency=0, error_ratio=1.0)
+        await openai_client(app).chat.completions.create(model='gpt-3.5-turbo', messages=MESSAGES)
+
+    with pytest.raises(InternalServerError):
+        asyncio.run(scenario())
+
+
+def test_stub_valtool_speaks_the_login_contract():
+    async def scenario(url):
+        client = ValToolClient(url)
+        try:
+            session = await auth.fetch_auth_response(client, auth.AuthRequest(email='ada@example.com', password='pw'))
+            with pytest.raises(httpx.HTTPStatusError) as rejected:
+                await client.login('ada@example.com', 'wrong')
+            return session, rejected.value.response.status_code
+        finally:
+            await client.aclose()
+
+    with serve_in_thread(stub_valtool_app(latency=0)) as url:
+        session, status = asyncio.run(scenario(url))
+    assert (session.user_name, session.organizations) == ('Ada', ['Stub Lending Co'])
+    assert session.auth_token.startswith('token-ada@example.com-')
+    assert status == 401
+
+
+def test_drive_caps_concurrency():
+    active = peak = 0
+
+    async def send(i):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    elapsed, latencies = asyncio.run(drive(send, 20, 4))
+    assert (peak, len(latencies)) == (4, 20)
+    assert elapsed >= 5 * 0.01
+
+
+def test_summary_reports_percentiles_and_throughput():
+    stats = suite.summarize([0.001 * i for i in range(1, 101)], elapsed=2.0)
+    assert stats == {**percentiles([0.001 * i for i in range(1, 101)]), 'throughput_per_s': 50.0, 'calls': 100}
+    assert (stats['p50_ms'], stats['p99_ms'], stats['max_ms']) == pytest.approx((51, 99, 100))
+
+
+def test_chat_questions_are_a_reproducible_mix():
+    first, second = suite.chat_questions(random.Random(7), 40), suite.chat_questions(random.Random(7), 40)
+    assert first == second
+    assert all(question in suite.OFF_TOPIC for question in first[3::4])
+
+
+def test_compare_reports_changes_and_skips_skipped(tmp_path, capsys):
+    def report(path, revision, p50, throughput):
+        stats = {'p50_ms': p50, 'p99_ms': 2 * p50, 'throughput_per_s': throughput}
+        with open(path, 'w') as f:
+            json.dump({'meta': {'revision': revision},
+                       'micro': {'find_best_match': stats, '_build_messages[history=10]': {'skipped': 'offline'}},
+                       'load': {}}, f)
+        return str(path)
+
+    before = report(tmp_path / 'before.json', 'abc123', 10.0, 100.0)
+    after = report(tmp_path / 'after.json', 'def456', 5.0, 150.0)
+    suite.compare(SimpleNamespace(before=before, after=after))
+
+    output = capsys.readouterr().out
+    assert "before: abc123  after: def456" in output
+    assert "10.000 -> 5.000" in output and "-50.0%" in output and "+50.0%" in output
+    assert "history=10" not in output
+    # An empty section still prints its header
+    assert output.rstrip().endswith("throughput_change")
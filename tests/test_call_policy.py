@@ -0,0 +1,31 @@
+import asyncio
+
+from call_policy import CallPolicy
+
+
+def test_cancelled_hedge_loser_is_not_counted_in_latencies():
+    policy = CallPolicy(hedge=True, hedge_delay=0.02, hedge_max_ratio=1.0)
+
+    async def attempt(hedge):
+        # The first request hangs; its hedge answers at once
+        await asyncio.sleep(0 if hedge else 10)
+        return 'hedge' if hedge else 'first'
+
+    assert asyncio.run(policy.call(attempt, key='model')) == 'hedge'
+    assert policy.stats()['hedges'] == {'won': 1, 'lost': 0, 'failed': 0}
+    assert len(policy._latencies['model']) == 1
+
+
+def test_retries_retryable_errors_only():
+    policy = CallPolicy(max_attempts=3, backoff=0.001, backoff_max=0.001)
+    calls = []
+
+    async def attempt(hedge):
+        calls.append(hedge)
+        if len(calls) < 3:
+            raise TimeoutError
+        return 'ok'
+
+    assert asyncio.run(policy.call(attempt, key='model')) == 'ok'
+    assert calls == [False, False, False]
+    assert policy.stats()['retries'] == {'timeout': 2}
@@ -0,0 +1,124 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import openai_gateway
+from response_cache import ResponseCache
+from routers import chatbot_backend
+from routers.chatbot_backend import BatchChatRequest, batch_answer_lines
+
+EXACT = "What is AutoVal?"
+OFF_TOPIC = "Tell me a joke"
+PARTIAL = "How are property taxes assessed in Texas?"
+NO_MATCH = "Should I refinance my mortgage now?"
+
+
+class CountingClient:
+    """Stands in for AsyncOpenAI: answers after delay seconds, tracking concurrent calls."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = self.active = self.peak = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        question = messages[-1]['content']
+        if question.startswith('FAIL'):
+            raise RuntimeError("upstream down")
+        message = SimpleNamespace(content=f"AI: {question}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = CountingClient()
+    extractor = SimpleNamespace(extract_many=lambda questions: [[] for _ in questions])
+    bot = SimpleNamespace(client=client, model='test-model', intent_extractor=extractor)
+    monkeypatch.setattr(chatbot_backend, 'get_chatbot', lambda: bot)
+    monkeypatch.setattr(openai_gateway, 'response_cache', ResponseCache(max_size=256))
+    # No retries, so a failing question fails once
+    monkeypatch.setattr(openai_gateway.call_policy, 'max_attempts', 1)
+    return client
+
+
+def answer(questions):
+    async def collect():
+        return [json.loads(line) for chunk in [chunk async for chunk in batch_answer_lines(questions)]
+                for line in chunk.splitlines()]
+    return asyncio.run(collect())
+
+
+def test_every_question_gets_one_line_and_repeats_are_answered_once(client):
+    questions = [NO_MATCH, EXACT, f"  {NO_MATCH.upper()} ", OFF_TOPIC, PARTIAL, EXACT.lower()]
+    lines = answer(questions)
+
+    assert sorted(line['index'] for line in lines) == list(range(len(questions)))
+    by_index = {line['index']: line for line in lines}
+    assert [by_index[i]['question'] for i in range(len(questions))] == questions
+    assert [by_index[i]['match_type'] for i in range(len(questions))] == \
+        ['no_match', 'exact', 'no_match', 'off_topic', 'partial', 'exact']
+    assert client.calls == 2
+    assert by_index[0]['response'] == by_index[2]['response'] == f"AI: {NO_MATCH}"
+    assert by_index[4]['response'].endswith(f"\n\nAI: {PARTIAL}")
+    assert by_index[3]['response'] == chatbot_backend.OFF_TOPIC_RESPONSE
+
+
+def test_dataset_answers_come_first_and_openai_calls_are_bounded(client, monkeypatch):
+    monkeypatch.setattr(chatbot_backend, 'CHAT_BATCH_CONCURRENCY', 3)
+    monkeypatch.setattr(chatbot_backend, 'CHAT_BATCH_MATCH_CHUNK', 4)
+    questions = [f"{NO_MATCH} ({i})" for i in range(10)] + [EXACT, OFF_TOPIC]
+    lines = answer(questions)
+
+    # The dataset lines are out as soon as their chunk is matched, before any OpenAI answer
+    assert [line['match_type'] for line in lines[:2]] == ['exact', 'off_topic']
+    assert len(lines) == len(questions)
+    assert (client.calls, client.peak) == (10, 3)
+
+
+def test_a_failed_question_does_not_fail_the_batch(client):
+    lines = answer([f"FAIL {NO_MATCH}", NO_MATCH])
+    by_question = {line['question']: line for line in lines}
+    assert by_question[f"FAIL {NO_MATCH}"]['error'] == "Internal Server Error"
+    assert 'response' not in by_question[f"FAIL {NO_MATCH}"]
+    assert by_question[NO_MATCH]['response'] == f"AI: {NO_MATCH}"
+
+
+def test_disconnecting_stops_the_queued_openai_calls(client, monkeypatch):
+    monkeypatch.setattr(chatbot_backend, 'CHAT_BATCH_CONCURRENCY', 2)
+    client.delay = 0.1
+
+    async def scenario():
+        # The exact answer is yielded once all five OpenAI questions are scheduled
+        lines = batch_answer_lines([f"{NO_MATCH} ({i})" for i in range(5)] + [EXACT])
+        first = await lines.__anext__()
+        await asyncio.sleep(0.01)
+        # What StreamingResponse does when the client goes away
+        await lines.aclose()
+        # Long enough for the queued questions to have started, had they not been cancelled
+        await asyncio.sleep(3 * client.delay)
+        return json.loads(first)
+
+    first = asyncio.run(scenario())
+    assert first['match_type'] == 'exact'
+    # Calls already upstream finish (and fill the response cache); the other three never start
+    assert client.calls == 2
+    assert client.active == 0
+
+
+def test_oversized_batches_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(chatbot_backend, 'CHAT_BATCH_MAX_QUESTIONS', 3)
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(chatbot_backend.chat_batch(BatchChatRequest(questions=[EXACT] * 4)))
+    assert rejected.value.status_code == 413
+    response = asyncio.run(chatbot_backend.chat_batch(BatchChatRequest(questions=[EXACT] * 3)))
+    assert response.media_type == 'application/x-ndjson'
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import openai_gateway
+from conversation_store import InMemoryConversationStore
+from response_cache import ResponseCache
+from routers import chatbot_backend
+from routers.chatbot_backend import ChatRequest
+
+# partial, no_match, partial, partial with the default index
+QUESTIONS = ["How are property taxes assessed in Texas?", "Should I refinance my mortgage now?",
+             "How do I appeal my home appraisal?", "What drives housing prices in Ohio?"]
+LATENCY = 0.2
+
+
+class SlowClient:
+    """Stands in for AsyncOpenAI: answers after LATENCY seconds without blocking the loop."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(LATENCY)
+        message = SimpleNamespace(content=f"AI: {messages[-1]['content']}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = SlowClient()
+    monkeypatch.setattr(chatbot_backend, 'get_chatbot', lambda: SimpleNamespace(client=client, model='test-model'))
+    monkeypatch.setattr(chatbot_backend, 'conversation_store', InMemoryConversationStore())
+    monkeypatch.setattr(openai_gateway, 'response_cache', ResponseCache(max_size=64))
+
+    def no_nested_loops(*args, **kwargs):
+        raise AssertionError("asyncio.run called inside the /chat path")
+
+    monkeypatch.setattr(asyncio, 'run', no_nested_loops)
+    return client
+
+
+def run(coroutine):
+    # asyncio.run is patched out for the code under test
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_concurrent_chats_overlap_and_leave_the_loop_free(client):
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    async def scenario():
+        heartbeat = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(chatbot_backend.chat(ChatRequest(user_question=q)) for q in QUESTIONS))
+        elapsed = time.perf_counter() - started
+        heartbeat.cancel()
+        return responses, elapsed
+
+    responses, elapsed = run(scenario())
+    assert client.calls == len(QUESTIONS)
+    # One OpenAI round trip for all of them, not one after another
+    assert elapsed < 2 * LATENCY
+    assert ticks >= LATENCY / 0.01 / 2
+    for question, response in zip(QUESTIONS, responses):
+        assert response.response.endswith(f"AI: {question}")
+        assert response.step == 'info_gathering'
+
+
+def test_follow_ups_continue_the_server_side_conversation(client):
+    async def scenario():
+        first = await chatbot_backend.chat(ChatRequest(user_question=QUESTIONS[0]))
+        second = await chatbot_backend.chat(ChatRequest(user_question=QUESTIONS[1],
+                                                        conversation_id=first.conversation_id))
+        return first, second
+
+    first, second = run(scenario())
+    assert second.conversation_id == first.conversation_id
+    assert (first.step, second.step) == ('info_gathering', 'conclusion')
+    history = chatbot_backend.conversation_store.get(first.conversation_id)
+    assert [turn['content'] for turn in history] == [QUESTIONS[0], first.response, QUESTIONS[1], second.response]
+
+
+def test_exact_and_off_topic_questions_skip_openai(client):
+    async def scenario():
+        return [await chatbot_backend.chat(ChatRequest(user_question=q)) for q in ("What is AutoVal?", "Tell me a joke")]
+
+    exact, off_topic = run(scenario())
+    assert client.calls == 0
+    assert exact.response == chatbot_backend.get_qa_index().find_best_match("What is AutoVal?")[0]
+    assert (off_topic.response, off_topic.step) == (chatbot_backend.OFF_TOPIC_RESPONSE, 'end')
+
+
+def test_upstream_failures_become_a_500(client, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(client.chat.completions, 'create', fail)
+    with pytest.raises(HTTPException) as error:
+        run(chatbot_backend.chat(ChatRequest(user_question=QUESTIONS[1])))
+    assert error.value.status_code == 500
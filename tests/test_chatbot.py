@@ -0,0 +1,32 @@
+import threading
+import time
+
+import chatbot
+
+
+def test_get_chatbot_builds_one_instance_across_threads(monkeypatch):
+    built = []
+
+    class SlowChatbot:
+        def __init__(self):
+            # Long enough for every thread to get past the first check
+            time.sleep(0.05)
+            built.append(self)
+
+    monkeypatch.setattr(chatbot, 'IntelligentChatbot', SlowChatbot)
+    monkeypatch.setattr(chatbot, '_chatbot', None)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def get():
+        barrier.wait()
+        results.append(chatbot.get_chatbot())
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert all(result is built[0] for result in results)
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import chatbot
+from context_manager import ContextManager, ContextStore
+
+# On-topic questions the dataset has no answer for, with and without a topic intent
+MARKET = "How is the housing market in Ohio trending?"
+INSPECTION = "Can my inspection fail because of mold?"
+FOLLOW_UP = "Should I refinance my mortgage now?"
+
+
+def test_store_keeps_one_context_per_conversation():
+    store = ContextStore(max_entries=10)
+    first = store.get('first')
+    first.update_context(MARKET, ['market'])
+
+    assert store.get('first') is first
+    assert store.get('second') is not first
+    assert store.get('second').current_topic is None
+    # No id: a fresh context each time, never stored
+    assert store.get(None) is not store.get(None)
+    assert len(store) == 2
+
+    store.discard('first')
+    assert store.get('first').current_topic is None
+
+
+def test_store_evicts_the_least_recently_used():
+    store = ContextStore(max_entries=2)
+    first, second = store.get('first'), store.get('second')
+    assert store.get('first') is first
+    store.get('third')
+
+    assert len(store) == 2
+    assert store.get('first') is first
+    assert store.get('second') is not second
+
+
+def test_context_stays_small():
+    context = ContextManager()
+    assert not hasattr(context, '__dict__')
+    assert not context.has_dialogue_state
+    context.dialogue_state['last_intents'] = ['market']
+    assert context.has_dialogue_state
+
+
+def test_system_prompt_text_is_unchanged_by_caching():
+    assert chatbot.cached_system_prompt('market') == chatbot.render_system_prompt('market')
+    context = ContextManager()
+    context.update_context(MARKET, ['market'])
+    bot = object.__new__(chatbot.IntelligentChatbot)
+    assert bot._get_system_prompt(context) == chatbot.render_system_prompt('market')
+    context.dialogue_state['last_intents'] = ['market']
+    assert "'last_intents'" in bot._get_system_prompt(context)
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    prompts = []
+
+    async def create_chat_completion(client, model, messages):
+        prompts.append(messages[0]['content'])
+        return "Generated."
+
+    monkeypatch.setattr(chatbot, 'create_chat_completion', create_chat_completion)
+    monkeypatch.setattr(chatbot, 'get_openai_client', lambda: None)
+    # tiktoken downloads its encodings on first use; word counts are enough here
+    words = SimpleNamespace(count=lambda text: len(text.split()))
+    monkeypatch.setattr(chatbot, 'get_token_counter', lambda model: words)
+    bot = chatbot.IntelligentChatbot()
+    bot.prompts = prompts
+    return bot
+
+
+def test_interleaved_conversations_keep_their_own_topic(bot):
+    async def scenario():
+        for conversation_id, question in [('a', MARKET), ('b', INSPECTION), ('a', FOLLOW_UP), ('b', FOLLOW_UP)]:
+            await bot.generate_response(question, [], conversation_id=conversation_id)
+
+    asyncio.run(scenario())
+    topics = [prompt.split('Current Topic: ')[1].split('\n')[0] for prompt in bot.prompts]
+    assert topics == ['market', 'inspection', 'market', 'inspection']
+    assert bot.contexts.get('a').current_topic == 'market'
+
+
+def test_requests_without_a_conversation_do_not_leak_topics(bot):
+    async def scenario():
+        await bot.generate_response(MARKET, [])
+        await bot.generate_response(FOLLOW_UP, [])
+
+    asyncio.run(scenario())
+    assert 'Current Topic: None' in bot.prompts[1]
+    assert len(bot.contexts) == 0
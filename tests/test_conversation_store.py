@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import conversation_store
+
+from conversation_store import InMemoryConversationStore, SQLiteConversationStore
+from routers import chatbot_backend
+
+
+def turn(content):
+    return {'role': 'user', 'content': content, 'step': 'user_input'}
+
+
+def test_memory_store_evicts_the_least_recently_used():
+    store = InMemoryConversationStore(max_conversations=2)
+    first = store.create([turn('first')])
+    second = store.create([turn('second')])
+    # Reading the first conversation makes the second the least recently used
+    assert store.get(first) == [turn('first')]
+    store.create([turn('third')])
+    assert store.get(first) == [turn('first')]
+    assert store.get(second) is None
+    assert len(store) == 2
+
+
+def test_memory_store_keeps_the_last_turns():
+    store = InMemoryConversationStore(max_turns=3)
+    conversation_id = store.create([turn('0')])
+    store.append(conversation_id, turn('1'), turn('2'))
+    store.append(conversation_id, turn('3'))
+    assert store.get(conversation_id) == [turn('1'), turn('2'), turn('3')]
+
+
+def test_sqlite_store_reads_keep_a_conversation_alive(tmp_path, monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(conversation_store.time, 'time', lambda: now[0])
+    store = SQLiteConversationStore(str(tmp_path / 'conversations.db'), idle_ttl=60)
+    read, unread = store.create([turn('read')]), store.create([turn('unread')])
+
+    # Reads alone, never an append, like the in-memory store
+    for _ in range(3):
+        now[0] += 40
+        assert store.get(read) == [turn('read')]
+    assert store.get(unread) is None
+
+    store.purge_idle()
+    assert store.get(read) == [turn('read')]
+    now[0] += 61
+    assert store.get(read) is None
+
+
+class ThreadRecordingStore(SQLiteConversationStore):
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def get(self, conversation_id):
+        self.threads.add(threading.get_ident())
+        return super().get(conversation_id)
+
+    def append(self, conversation_id, *turns):
+        self.threads.add(threading.get_ident())
+        super().append(conversation_id, *turns)
+
+
+def test_router_runs_sqlite_store_calls_off_the_event_loop(tmp_path, monkeypatch):
+    store = ThreadRecordingStore(str(tmp_path / 'conversations.db'))
+    monkeypatch.setattr(chatbot_backend, 'conversation_store', store)
+
+    async def scenario():
+        request = chatbot_backend.ChatRequest(user_question='What is AutoVal?', chat_history=[])
+        conversation_id, history = await chatbot_backend.resolve_conversation(request)
+        await chatbot_backend.record_turn(conversation_id, 'What is AutoVal?', 'An AVM.', 'greeting')
+        request = chatbot_backend.ChatRequest(user_question='More?', conversation_id=conversation_id)
+        return history, await chatbot_backend.resolve_conversation(request), threading.get_ident()
+
+    history, (conversation_id, resumed), loop_thread = asyncio.run(scenario())
+    assert history == []
+    assert [t['content'] for t in resumed] == ['What is AutoVal?', 'An AVM.']
+    assert store.threads and loop_thread not in store.threads
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+import qa_data
+from intent_extractor import LemmaTableExtractor, SpacyExtractor
+from topic_classifier import US_PROPERTY_TOPICS
+
+KEYWORDS = set(US_PROPERTY_TOPICS)
+
+
+def questions():
+    rng = random.Random(3)
+    sample = rng.sample(list(qa_data.qa_dict), 100)
+    return sample + ["Market trends and valuation after inspections", "Financing, financing!", "", "Tell me a joke"]
+
+
+def extractors():
+    yield LemmaTableExtractor(KEYWORDS)
+    try:
+        import spacy
+        spacy.load('en_core_web_sm')
+    except (ImportError, OSError):
+        return
+    yield SpacyExtractor(KEYWORDS, batch_size=16)
+
+
+@pytest.mark.parametrize('extractor', list(extractors()), ids=lambda extractor: type(extractor).__name__)
+def test_batched_and_single_extraction_agree(extractor):
+    texts = questions()
+    assert extractor.extract_many(texts) == [extractor.extract(text) for text in texts]
+
+
+def test_lemma_table_finds_inflected_intents():
+    extractor = LemmaTableExtractor(KEYWORDS)
+    assert extractor.extract("Market trends and valuations, then inspections") == ['market', 'valuation', 'inspection']
+
+
+def test_batch_lines_carry_each_questions_intents():
+    from chatbot import get_chatbot
+    from routers.chatbot_backend import batch_answer_lines
+
+    # Exact and off-topic questions only: nothing goes to OpenAI
+    exact = next(question for question in qa_data.qa_dict if 'inspection' in question.lower())
+    batch = [exact, "Tell me a joke about cats", exact]
+
+    async def collect():
+        return [json.loads(line) for chunk in [c async for c in batch_answer_lines(batch)]
+                for line in chunk.splitlines()]
+
+    results = sorted(asyncio.run(collect()), key=lambda result: result['index'])
+    extractor = get_chatbot().intent_extractor
+    assert [result['intents'] for result in results] == [extractor.extract(question) for question in batch]
+    assert [result['match_type'] for result in results] == ['exact', 'off_topic', 'exact']
@@ -0,0 +1,98 @@
+import logging
+import logging.handlers
+import queue
+import time
+
+import pytest
+
+import logging_config
+from logging_config import DroppingQueueHandler
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    logging_config.stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    path = tmp_path / 'chatbot.log'
+    monkeypatch.setenv('LOG_FILE', str(path))
+    monkeypatch.setenv('LOG_LEVEL', 'info')
+    return path
+
+
+def test_records_reach_the_file_through_the_queue(root_logger, log_file):
+    listener = logging_config.configure_logging()
+    assert logging_config.configure_logging() is listener
+    assert [type(handler) for handler in root_logger.handlers] == [DroppingQueueHandler]
+
+    logging.getLogger('chat').info("answered %s", 'What is AutoVal?')
+    logging.getLogger('chat').debug("not at INFO")
+    logging_config.stop_logging()
+
+    lines = log_file.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith(" - chat - INFO - answered What is AutoVal?")
+
+
+def test_files_rotate_by_size(root_logger, log_file, monkeypatch):
+    monkeypatch.setenv('LOG_MAX_BYTES', '500')
+    monkeypatch.setenv('LOG_BACKUP_COUNT', '2')
+    logging_config.configure_logging()
+    for i in range(50):
+        logging.getLogger('chat').info("record %d", i)
+    logging_config.stop_logging()
+
+    assert sorted(path.name for path in log_file.parent.iterdir()) == ['chatbot.log', 'chatbot.log.1', 'chatbot.log.2']
+    assert "record 49" in log_file.read_text(encoding='utf-8')
+
+
+class SlowHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        time.sleep(0.02)
+        self.messages.append(record.getMessage())
+
+
+def test_logging_does_not_wait_for_slow_handlers():
+    log_queue = queue.Queue(100)
+    slow = SlowHandler()
+    listener = logging.handlers.QueueListener(log_queue, slow)
+    logger = logging.Logger('hot_path')
+    logger.addHandler(DroppingQueueHandler(log_queue))
+    listener.start()
+
+    started = time.perf_counter()
+    for i in range(20):
+        logger.info("record %d", i)
+    elapsed = time.perf_counter() - started
+    listener.stop()
+
+    # 20 records take 0.4 s to write, and the caller waited for none of them
+    assert elapsed < 0.1
+    assert slow.messages == [f"record {i}" for i in range(20)]
+
+
+def test_records_are_dropped_when_the_queue_is_full(monkeypatch):
+    monkeypatch.setattr(DroppingQueueHandler, 'dropped', 0)
+    log_queue = queue.Queue(2)
+    logger = logging.Logger('hot_path')
+    logger.addHandler(DroppingQueueHandler(log_queue))
+
+    for i in range(5):
+        logger.warning("record %d", i)
+
+    assert log_queue.qsize() == 2
+    assert DroppingQueueHandler.dropped == 3
@@ -0,0 +1,31 @@
+from metrics import Registry
+
+
+def families(text):
+    """{sample or family name: set of line kinds (HELP, TYPE, sample)} of an exposition."""
+    seen = {}
+    for line in text.splitlines():
+        if line.startswith('# '):
+            kind, name = line.split()[1:3]
+        else:
+            kind, name = 'sample', line.split('{')[0].split()[0]
+        seen.setdefault(name, set()).add(kind)
+    return seen
+
+
+def test_counter_families_are_named_like_their_samples():
+    registry = Registry()
+    registry.counter('requests', 'Requests.', ['route']).inc('/chat')
+    registry.collector('cache_hits', 'Cache hits.', lambda: [({}, 3.0)], kind='counter')
+    registry.collector('cache_size', 'Cache size.', lambda: [({}, 7.0)])
+    registry.histogram('latency_seconds', 'Latency.').observe(0.1)
+    text = registry.render()
+
+    assert '# TYPE requests_total counter' in text
+    assert '# TYPE cache_hits_total counter' in text
+    assert '# TYPE cache_size gauge' in text
+    assert '# TYPE latency_seconds histogram' in text
+    seen = families(text)
+    for name in ('requests_total', 'cache_hits_total', 'cache_size'):
+        assert seen[name] == {'HELP', 'TYPE', 'sample'}
+    assert 'requests' not in seen and 'cache_hits' not in seen
@@ -0,0 +1,65 @@
+import difflib
+
+import pytest
+
+from qa_data import qa_dict
+from qa_index import DEFAULT_CUTOFF, QAIndex, normalize_question
+
+# Best difflib ratio 0.6538, against "Can I upgrade an AutoVal order?"
+NEAR_CUTOFF = "can i cancel an order"
+
+
+@pytest.fixture(scope='module')
+def index():
+    return QAIndex(qa_dict, matcher='ngram')
+
+
+def best_ratio(query):
+    query = normalize_question(query)
+    # Key first, query second, as in difflib.get_close_matches: ratio() is not symmetric
+    return max(difflib.SequenceMatcher(None, normalize_question(question), query).ratio() for question in qa_dict)
+
+
+@pytest.mark.parametrize('family', ['exact', 'typo'])
+def test_same_decisions_as_difflib(index, baseline_cases, family):
+    for query, answer, match_type in baseline_cases[family]:
+        assert index.find_best_match(query) == (answer, match_type), query
+
+
+def test_off_topic_questions_get_the_same_match_type(index, baseline_cases):
+    # Below-the-cutoff noise: whether anything clears it must agree, not which key wins
+    for query, _, match_type in baseline_cases['off_topic']:
+        assert index.match(query).match_type == match_type, query
+
+
+@pytest.mark.parametrize('family', ['shuffled', 'dropped'])
+def test_reordered_and_shortened_questions_mostly_agree_with_difflib(index, baseline_cases, family):
+    cases = baseline_cases[family]
+    agree = 0
+    for query, answer, match_type in cases:
+        match = index.match(query)
+        if (match.answer, match.match_type) == (answer, match_type):
+            agree += 1
+            continue
+        # The shortlist can only miss the best key: never a match difflib rejects,
+        # never a better score than difflib's best
+        assert match_type == 'partial', query
+        assert match.match_type == 'no_match' or match.score <= best_ratio(query), query
+    assert agree >= 0.95 * len(cases)
+
+
+def test_scores_are_exact_difflib_ratios_at_or_above_the_cutoff(index, baseline_cases):
+    for cases in baseline_cases.values():
+        for query, _, _ in cases[:10]:
+            for match in index.search(query, k=3):
+                ratio = difflib.SequenceMatcher(None, normalize_question(match.question),
+                                                normalize_question(query)).ratio()
+                assert match.score == ratio >= DEFAULT_CUTOFF, query
+
+
+@pytest.mark.parametrize('cutoff, expected', [(None, 'partial'), (0.65, 'partial'), (0.66, 'no_match')])
+def test_partial_matches_need_the_cutoff(cutoff, expected):
+    match = QAIndex(qa_dict, matcher='ngram', cutoff=cutoff).match(NEAR_CUTOFF)
+    assert match.match_type == expected
+    if expected == 'partial':
+        assert match.question == "Can I upgrade an AutoVal order?"
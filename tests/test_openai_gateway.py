@@ -0,0 +1,212 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import openai_gateway
+from admission import AdmissionController
+from call_policy import CallPolicy
+from metrics import OPENAI_ADMISSIONS, OPENAI_SECONDS
+from response_cache import ResponseCache
+
+
+class StubClient:
+    """Stands in for AsyncOpenAI: answers with the conversation's first user message."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        topic = next(m['content'] for m in messages if m['role'] == 'user')
+        message = SimpleNamespace(content=f"More about: {topic}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResponseCache(max_size=64)
+    monkeypatch.setattr(openai_gateway, 'response_cache', cache)
+    return cache
+
+
+def conversation(topic, question):
+    return [{'role': 'system', 'content': 'You are a property assistant.'},
+            {'role': 'user', 'content': topic},
+            {'role': 'assistant', 'content': 'Sure.'},
+            {'role': 'user', 'content': question}]
+
+
+def test_follow_up_is_not_served_from_another_conversation(cache):
+    client = StubClient()
+
+    async def ask():
+        first = await openai_gateway.create_chat_completion(
+            client, 'gpt-3.5-turbo', conversation('What is AutoVal?', 'tell me more'))
+        second = await openai_gateway.create_chat_completion(
+            client, 'gpt-3.5-turbo', conversation('What is Waivit?', 'tell me more'))
+        return first, second
+
+    first, second = asyncio.run(ask())
+    assert client.calls == 2
+    assert first == "More about: What is AutoVal?"
+    assert second == "More about: What is Waivit?"
+
+
+def test_same_question_in_same_context_is_cached(cache):
+    client = StubClient()
+
+    async def ask():
+        messages = conversation('What is AutoVal?', 'tell me more')
+        return [await openai_gateway.create_chat_completion(client, 'gpt-3.5-turbo', messages) for _ in range(2)]
+
+    first, second = asyncio.run(ask())
+    assert client.calls == 1
+    assert first == second
+    assert cache.stats()['hits'] == 1
+
+
+class FlakyStreamClient:
+    """Streams 'Hello world', after failing to open the first stream with a timeout."""
+
+    def __init__(self, admission):
+        self.admission = admission
+        self.active_at_open = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        self.active_at_open.append(self.admission.limiter.active)
+        if len(self.active_at_open) == 1:
+            raise TimeoutError
+
+        async def chunks():
+            for token in ('Hello', ' world'):
+                yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+            yield SimpleNamespace(usage=None, choices=[])
+        return chunks()
+
+
+def test_stream_admits_and_times_each_attempt(cache, monkeypatch):
+    admission = AdmissionController(max_concurrency=1, max_queue=0, max_wait=0.5)
+    monkeypatch.setattr(openai_gateway, 'admission', admission)
+    monkeypatch.setattr(openai_gateway, 'call_policy', CallPolicy(max_attempts=2, backoff=0.001, backoff_max=0.001))
+    client = FlakyStreamClient(admission)
+    model = 'stream-test-model'
+    admitted = OPENAI_ADMISSIONS.value('admitted')
+
+    async def consume():
+        tokens = []
+        async for token in openai_gateway.stream_chat_completion(client, model, conversation('Hi', 'again')):
+            tokens.append(token)
+            # The slot of the attempt that opened the stream is held while it is consumed
+            assert admission.limiter.active == 1
+        return tokens
+
+    assert asyncio.run(consume()) == ['Hello', ' world']
+    # The failed attempt gave its slot back before the retry was admitted
+    assert client.active_at_open == [1, 1]
+    assert OPENAI_ADMISSIONS.value('admitted') == admitted + 2
+    assert (OPENAI_SECONDS.count(model, 'error'), OPENAI_SECONDS.count(model, 'ok')) == (1, 1)
+    assert admission.limiter.active == 0
+
+
+class EndlessStream:
+    """Stands in for openai's AsyncStream: yields tokens until closed, optionally failing mid-stream."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.sent = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        if self.sent == self.fail_after:
+            raise ConnectionResetError("upstream went away")
+        self.sent += 1
+        await asyncio.sleep(0)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=f"t{self.sent}"))])
+
+    async def close(self):
+        self.closed = True
+
+
+class StreamClient:
+    def __init__(self, stream):
+        self.stream = stream
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        return self.stream
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    admission = AdmissionController(max_concurrency=1, max_queue=0, max_wait=0.5)
+    monkeypatch.setattr(openai_gateway, 'admission', admission)
+    return admission
+
+
+def test_consumer_going_away_closes_the_stream(cache, admission):
+    stream = EndlessStream()
+
+    async def consume_two():
+        tokens = openai_gateway.stream_chat_completion(StreamClient(stream), 'gpt-3.5-turbo',
+                                                       conversation('Hi', 'go on'))
+        received = [await tokens.__anext__(), await tokens.__anext__()]
+        await tokens.aclose()
+        return received
+
+    assert asyncio.run(consume_two()) == ['t1', 't2']
+    assert stream.closed
+    assert admission.limiter.active == 0
+    # An unfinished answer is not cached
+    assert len(cache) == 0
+
+
+def test_error_mid_stream_closes_the_stream(cache, admission):
+    stream = EndlessStream(fail_after=3)
+
+    async def consume():
+        tokens = []
+        with pytest.raises(ConnectionResetError):
+            async for token in openai_gateway.stream_chat_completion(StreamClient(stream), 'gpt-3.5-turbo',
+                                                                     conversation('Hi', 'go on')):
+                tokens.append(token)
+        return tokens
+
+    assert asyncio.run(consume()) == ['t1', 't2', 't3']
+    assert stream.closed
+    assert admission.limiter.active == 0
+
+
+class StallingStream(EndlessStream):
+    """Sends two tokens, then nothing."""
+
+    async def __anext__(self):
+        if self.sent == 2:
+            await asyncio.sleep(3600)
+        return await super().__anext__()
+
+
+def test_stalled_stream_times_out_and_frees_its_slot(cache, admission, monkeypatch):
+    monkeypatch.setattr(openai_gateway, 'call_policy', CallPolicy(attempt_timeout=0.05))
+    stream = StallingStream()
+    model = 'stall-test-model'
+
+    async def consume():
+        tokens = []
+        with pytest.raises(TimeoutError):
+            async for token in openai_gateway.stream_chat_completion(StreamClient(stream), model,
+                                                                     conversation('Hi', 'go on')):
+                tokens.append(token)
+        return tokens
+
+    assert asyncio.run(asyncio.wait_for(consume(), 5)) == ['t1', 't2']
+    assert stream.closed
+    assert admission.limiter.active == 0
+    assert OPENAI_SECONDS.count(model, 'error') == 1
@@ -0,0 +1,46 @@
+import pytest
+
+from qa_data import qa_dict
+from qa_index import DEFAULT_CUTOFF, QAIndex
+
+# Best difflib ratio 0.6538, against "Can I upgrade an AutoVal order?"
+NEAR_CUTOFF = "can i cancel an order"
+
+
+@pytest.fixture(scope='module')
+def index():
+    return QAIndex(qa_dict, matcher='difflib')
+
+
+def test_difflib_matcher_reproduces_the_original_lookup(index, baseline_cases):
+    for family, cases in baseline_cases.items():
+        for query, answer, match_type in cases:
+            assert index.find_best_match(query) == (answer, match_type), (family, query)
+
+
+def test_exact_lookup_ignores_case_and_surrounding_space(index):
+    question, answer = next(iter(qa_dict.items()))
+    match = index.match(f"\t{question.swapcase()}  ")
+    assert match == (answer, 'exact', question, 1.0)
+
+
+def test_duplicate_questions_keep_the_first_answer():
+    index = QAIndex({"What is AutoVal?": "First.", "what is autoval?": "Second."}, matcher='difflib')
+    assert len(index) == 1
+    assert index.match("WHAT IS AUTOVAL?").answer == "First."
+
+
+@pytest.mark.parametrize('cutoff, expected', [(None, 'partial'), (0.65, 'partial'), (0.66, 'no_match')])
+def test_partial_matches_need_the_cutoff(cutoff, expected):
+    index = QAIndex(qa_dict, matcher='difflib', cutoff=cutoff)
+    match = index.match(NEAR_CUTOFF)
+    assert match.match_type == expected
+    if expected == 'partial':
+        assert match.question == "Can I upgrade an AutoVal order?"
+        assert round(match.score, 4) == 0.6538 >= (cutoff or DEFAULT_CUTOFF)
+
+
+def test_match_many_agrees_with_match(index, baseline_cases):
+    queries = [query for cases in baseline_cases.values() for query, _, _ in cases[:6]]
+    queries += queries[:5]
+    assert index.match_many(queries) == [index.match(query) for query in queries]
@@ -0,0 +1,132 @@
+import json
+import random
+
+import pytest
+
+import qa_source
+from benchmarks.common import perturb
+from qa_data import qa_dict
+from qa_index import QAIndex, normalize_question
+from qa_source import IncrementalIndexBuilder, QASourceWatcher, compile_rows, read_rows
+
+
+def base_entries():
+    entries, _ = compile_rows([qa_source.QARow(question, answer, '') for question, answer in qa_dict.items()])
+    return entries
+
+
+def edit(entries, rng, count):
+    """Copy of entries with count answers changed, count questions removed and count added."""
+    entries = dict(entries)
+    keys = rng.sample(list(entries), 2 * count)
+    for key in keys[:count]:
+        question, answer = entries[key]
+        entries[key] = (question, answer + " (updated)")
+    for key in keys[count:]:
+        del entries[key]
+    for _ in range(count):
+        question = f"How does {rng.choice(['AutoVal', 'Waivit', 'ValTool'])} handle case {rng.randrange(10 ** 6)}?"
+        entries[normalize_question(question)] = (question, f"Answer for {question}")
+    return entries
+
+
+def assert_same_as_fresh_build(index, entries, rng):
+    fresh = QAIndex({question: answer for question, answer in entries.values()})
+    questions = [question for question, _ in entries.values()]
+    queries = rng.sample(questions, min(len(questions), 100))
+    queries += [perturb(rng.choice(questions), rng, edits=rng.randint(1, 3)) for _ in range(100)]
+    queries += ["What is the weather on Mars?", "Tell me about plumbing"]
+    assert len(index) == len(fresh)
+    for query in queries:
+        got, expected = index.match(query), fresh.match(query)
+        assert (got.answer, got.match_type, got.score) == (expected.answer, expected.match_type, expected.score), query
+    assert index.match_many(queries) == [index.match(query) for query in queries]
+
+
+def test_incremental_updates_match_a_fresh_build():
+    rng = random.Random(7)
+    entries = base_entries()
+    builder = IncrementalIndexBuilder()
+    builder.build(entries)
+    for _ in range(4):
+        entries = edit(entries, rng, 10)
+        assert_same_as_fresh_build(builder.update(entries), entries, rng)
+
+
+def test_compaction_matches_a_fresh_build(monkeypatch):
+    # Compaction needs more retired ids than COMPACT_MIN_RETIRED and than live questions
+    monkeypatch.setattr(qa_source, 'COMPACT_MIN_RETIRED', 25)
+    rng = random.Random(11)
+    entries = dict(list(base_entries().items())[:60])
+    builder = IncrementalIndexBuilder()
+    builder.build(entries)
+    retired_counts = []
+    for _ in range(6):
+        entries = edit(entries, rng, 10)
+        index = builder.update(entries)
+        retired_counts.append(len(builder._retired))
+        assert_same_as_fresh_build(index, entries, rng)
+    # Retired ids built up, then a rebuild reclaimed them
+    assert max(retired_counts) > 0
+    assert 0 in retired_counts[1:]
+
+
+def test_old_snapshot_is_unaffected_by_later_updates():
+    rng = random.Random(3)
+    entries = base_entries()
+    builder = IncrementalIndexBuilder()
+    old = builder.build(entries)
+    questions = [question for question, _ in entries.values()]
+    queries = questions + [perturb(rng.choice(questions), rng, edits=2) for _ in range(200)]
+    before = [old.match(query) for query in queries]
+
+    removed_key, (removed_question, removed_answer) = next(iter(entries.items()))
+    updated = edit(entries, rng, 20)
+    updated.pop(removed_key, None)
+    # Shares most trigrams with an existing question, so its posting lists are extended
+    added = removed_question.rstrip('?') + " today?"
+    updated[normalize_question(added)] = (added, "New answer.")
+    new = builder.update(updated)
+
+    assert [old.match(query) for query in queries] == before
+    assert old.match(removed_question) == (removed_answer, 'exact', removed_question, 1.0)
+    assert new.match(removed_question).match_type != 'exact'
+    assert old.match(added).match_type != 'exact'
+    assert new.match(added).answer == "New answer."
+
+
+@pytest.mark.parametrize('content', [
+    '{"What is AutoVal?": {"x": 1}}',
+    '{"What is AutoVal?": ["x"]}',
+    '{"What is AutoVal?": 3}',
+    '[1, 2]',
+    '[{"question": "What is AutoVal?", "answer": null}]',
+    '[{"question": 1, "answer": "One."}]',
+])
+def test_read_rows_rejects_non_string_questions_and_answers(tmp_path, content):
+    path = tmp_path / 'qa.json'
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        read_rows(str(path))
+
+
+def test_read_rows_rejects_nested_answers_in_jsonl(tmp_path):
+    path = tmp_path / 'qa.jsonl'
+    path.write_text(json.dumps({'question': 'What is AutoVal?', 'answer': {'x': 1}}) + '\n')
+    with pytest.raises(ValueError):
+        read_rows(str(path))
+
+
+def test_reload_keeps_serving_the_current_index_on_a_bad_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(qa_source, 'set_qa_index', lambda index: None)
+    path = tmp_path / 'qa.json'
+    path.write_text('{"What is AutoVal?": "An automated valuation."}')
+    watcher = QASourceWatcher(str(path))
+    watcher.load()
+    errors = qa_source.QA_RELOADS.value('error')
+
+    path.write_text('[1, 2]')
+    assert watcher.reload_if_changed() is False
+    assert watcher.last_error == "item 1: expected an object with 'question' and 'answer'"
+    assert qa_source.QA_RELOADS.value('error') == errors + 1
+    assert watcher.builder.entries == {'what is autoval?': ('What is AutoVal?', 'An automated valuation.')}
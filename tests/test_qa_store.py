@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import qa_index
+import qa_store
+from qa_data import qa_dict
+from qa_index import QAIndex
+
+
+@pytest.fixture(scope='module')
+def artifact(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('qa') / 'qa_index.bin')
+    qa_store.build_index_file(qa_dict, path, fingerprint=qa_store.source_fingerprint())
+    return path
+
+
+@pytest.fixture(scope='module')
+def queries(baseline_cases):
+    return [query for cases in baseline_cases.values() for query, _, _ in cases[:10]]
+
+
+@pytest.mark.parametrize('matcher', ['difflib', 'ngram', 'vector'])
+def test_loaded_index_answers_like_one_built_in_memory(artifact, queries, matcher):
+    loaded, built = qa_store.load_index(artifact, matcher=matcher), QAIndex(qa_dict, matcher=matcher)
+    assert len(loaded.keys) == len(built.keys)
+    for query in queries:
+        assert loaded.match(query) == built.match(query), query
+    assert loaded.search(queries[0], k=5) == built.search(queries[0], k=5)
+
+
+def test_build_replaces_the_file_atomically(tmp_path):
+    path = str(tmp_path / 'qa_index.bin')
+    qa_store.build_index_file({'What is AutoVal?': 'An AVM.'}, path)
+    old = qa_store.load_index(path, check_source=False)
+    qa_store.build_index_file(qa_dict, path)
+
+    assert os.listdir(tmp_path) == ['qa_index.bin']
+    # An index already mapped keeps answering from the file it mapped
+    assert old.find_best_match('what is autoval?') == ('An AVM.', 'exact')
+    assert len(qa_store.load_index(path, check_source=False).keys) == len(QAIndex(qa_dict).keys)
+
+
+def test_stale_artifacts_are_not_loaded(tmp_path):
+    path = str(tmp_path / 'qa_index.bin')
+    qa_store.build_index_file(qa_dict, path, fingerprint='0' * 64)
+    assert qa_store.load_index(path) is None
+    assert qa_store.load_index(path, check_source=False) is not None
+
+
+def test_unreadable_artifacts_are_not_loaded(tmp_path):
+    path = tmp_path / 'qa_index.bin'
+    assert qa_store.load_index(str(path)) is None
+    path.write_bytes(b'not an index')
+    assert qa_store.load_index(str(path)) is None
+
+
+def test_default_index_rebuilds_in_memory_from_a_stale_artifact(tmp_path, monkeypatch):
+    path = str(tmp_path / 'qa_index.bin')
+    qa_store.build_index_file({'What is AutoVal?': 'An outdated answer.'}, path, fingerprint='0' * 64)
+    monkeypatch.setenv('QA_INDEX_PATH', path)
+    monkeypatch.delenv('QA_SOURCE_PATH', raising=False)
+
+    index = qa_index.load_default_index()
+    assert len(index.keys) == len(QAIndex(qa_dict).keys)
+    assert index.find_best_match('What is AutoVal?') == (qa_dict['What is AutoVal?'], 'exact')
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from benchmarks.common import perturb
+from qa_data import qa_dict
+from qa_index import QAIndex, normalize_question
+from qa_vectors import DEFAULT_VECTOR_CUTOFF
+
+# Best cosine 0.406, against "Can I upgrade an AutoVal order?"
+NEAR_CUTOFF = "how do i cancel my autoval order"
+
+
+@pytest.fixture(scope='module')
+def index():
+    return QAIndex(qa_dict, matcher='vector')
+
+
+def test_search_only_returns_keys_scoring_at_least_the_cutoff(index):
+    rng = random.Random(13)
+    questions = list(qa_dict)
+    queries = [perturb(rng.choice(questions), rng, edits=rng.randint(1, 6)) for _ in range(100)]
+    queries += ["inspection weather", "What is the weather on Mars?", "autoval"]
+    cutoff = index.matcher.cutoff
+    for query in queries:
+        results = index.search(query, k=10)
+        assert all(result.score >= cutoff for result in results), query
+        assert [result.score for result in results] == sorted((result.score for result in results), reverse=True)
+        # The top search result is what match() would answer
+        match = index.match(query)
+        if match.match_type == 'partial':
+            assert results and results[0].answer == match.answer, query
+        elif match.match_type == 'no_match':
+            assert results == [], query
+
+
+def test_search_ignores_weak_overlaps(index):
+    # Shares a word or two with many questions, but is close to none of them
+    assert index.search("What about the weather in the inspection season on Mars?", k=5) == []
+
+
+def test_exact_questions_get_the_same_answer_as_difflib(index, baseline_cases):
+    for query, answer, match_type in baseline_cases['exact']:
+        assert index.find_best_match(query) == (answer, match_type), query
+
+
+@pytest.mark.parametrize('family', ['typo', 'dropped'])
+def test_misspelled_and_shortened_questions_mostly_agree_with_difflib(index, baseline_cases, family):
+    cases = baseline_cases[family]
+    agree = sum(index.find_best_match(query)[0] == answer for query, answer, _ in cases)
+    assert agree >= 0.85 * len(cases)
+
+
+def test_shuffled_questions_find_the_original(index, baseline_cases):
+    # Bag of words: unlike difflib, word order does not matter
+    sources = {tuple(sorted(normalize_question(question).split())): question for question in qa_dict}
+    cases = baseline_cases['shuffled']
+    found = sum(index.match(query).answer == qa_dict[sources[tuple(sorted(normalize_question(query).split()))]]
+                for query, _, _ in cases)
+    assert found >= 0.9 * len(cases)
+
+
+def test_off_topic_questions_do_not_match(index, baseline_cases):
+    for query, _, _ in baseline_cases['off_topic']:
+        assert index.match(query).match_type == 'no_match', query
+
+
+@pytest.mark.parametrize('cutoff, expected', [(None, 'partial'), (0.40, 'partial'), (0.41, 'no_match')])
+def test_partial_matches_need_the_cutoff(cutoff, expected):
+    match = QAIndex(qa_dict, matcher='vector', cutoff=cutoff).match(NEAR_CUTOFF)
+    assert match.match_type == expected
+    if expected == 'partial':
+        assert match.question == "Can I upgrade an AutoVal order?"
+        assert match.score >= (cutoff or DEFAULT_VECTOR_CUTOFF)
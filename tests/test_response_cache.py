@@ -0,0 +1,55 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from response_cache import ResponseCache, SQLiteResponseStore
+
+
+def test_shared_store_serves_other_processes_caches(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    writer = ResponseCache(shared=SQLiteResponseStore(path))
+    reader = ResponseCache(shared=SQLiteResponseStore(path))
+
+    async def put():
+        writer.put('What is AutoVal?', 'gpt-3.5-turbo', 'context', 'An automated valuation.')
+
+    # asyncio.run waits for the background write when it shuts the loop's executor down
+    asyncio.run(put())
+    assert asyncio.run(reader.get('  what is autoval?', 'gpt-3.5-turbo', 'context')) == 'An automated valuation.'
+    assert reader.stats()['shared_hits'] == 1
+    # Copied into the reader's L1
+    assert asyncio.run(reader.get('What is AutoVal?', 'gpt-3.5-turbo', 'context')) == 'An automated valuation.'
+    assert reader.stats()['hits'] == 1
+
+
+def test_database_errors_are_misses_not_failures(tmp_path, monkeypatch):
+    store = SQLiteResponseStore(str(tmp_path / 'cache.db'))
+
+    def locked():
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(store, '_connect', locked)
+    key = ('question', 'model', 'context')
+    assert store.get(key) is None
+    store.put(key, 'answer')
+    store.clear()
+    assert len(store) == 0
+    assert store.errors == 4
+
+
+def test_concurrent_writes_are_all_counted_and_prune_on_schedule(tmp_path, monkeypatch):
+    store = SQLiteResponseStore(str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(store, 'PRUNE_INTERVAL', 8)
+    prunes = []
+    monkeypatch.setattr(store, 'prune', lambda: prunes.append(1))
+    threads, writes = 8, 40
+
+    def write(thread):
+        for i in range(writes):
+            store.put((f"question {thread} {i}", 'gpt-3.5-turbo', 'context'), 'answer')
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(write, range(threads)))
+    assert store._writes == threads * writes
+    assert len(prunes) == threads * writes // 8
+    assert len(store) == threads * writes
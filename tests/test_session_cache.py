@@ -0,0 +1,145 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+import session_cache
+from session_cache import SessionCache, token_expiry
+
+
+def jwt(**claims):
+    def encode(part):
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).rstrip(b'=').decode()
+    return f"{encode({'alg': 'HS256'})}.{encode(claims)}.signature"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(session_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_token_expiry_reads_the_exp_claim():
+    assert token_expiry(jwt(exp=1_700_000_600)) == 1_700_000_600.0
+    assert token_expiry(jwt(sub='someone')) is None
+    assert token_expiry('not-a-jwt') is None
+    assert token_expiry('a.!!!.c') is None
+
+
+def test_ttl_comes_from_the_jwt_exp(clock):
+    cache = SessionCache(default_ttl=900, max_ttl=3600, expiry_skew=30)
+    token = jwt(exp=clock[0] + 600)
+    cache.put('a@example.com', 'pw', 'session', token)
+
+    clock[0] += 569
+    assert cache.get_by_credentials('a@example.com', 'pw') == 'session'
+    assert cache.validate(token) == 'session'
+    # Expires skew seconds before the token does, well before default_ttl
+    clock[0] += 1
+    assert cache.get_by_credentials('a@example.com', 'pw') is None
+    assert cache.validate(token) is None
+
+
+def test_ttl_is_capped_and_defaults_without_exp(clock):
+    cache = SessionCache(default_ttl=900, max_ttl=3600, expiry_skew=30)
+    cache.put('long@example.com', 'pw', 'long', jwt(exp=clock[0] + 86400))
+    cache.put('plain@example.com', 'pw', 'plain', jwt(sub='plain'))
+    cache.put('expired@example.com', 'pw', 'expired', jwt(exp=clock[0] + 10))
+
+    assert cache.get_by_credentials('expired@example.com', 'pw') is None
+    clock[0] += 899
+    assert cache.get_by_credentials('plain@example.com', 'pw') == 'plain'
+    clock[0] += 1
+    assert cache.get_by_credentials('plain@example.com', 'pw') is None
+    clock[0] += 2699
+    assert cache.get_by_credentials('long@example.com', 'pw') == 'long'
+    clock[0] += 1
+    assert cache.get_by_credentials('long@example.com', 'pw') is None
+
+
+def test_login_caches_with_the_token_ttl_and_coalesces(clock):
+    cache = SessionCache(expiry_skew=30)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {'token': jwt(exp=clock[0] + 300)}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.login('a@example.com', 'pw', loader, lambda s: s['token'])
+                                      for _ in range(5)))
+
+    sessions = asyncio.run(scenario())
+    assert calls == 1
+    assert all(session is sessions[0] for session in sessions)
+    assert cache.stats()['coalesced'] == 4
+    assert cache.validate(sessions[0]['token']) is sessions[0]
+
+    clock[0] += 270
+    asyncio.run(scenario())
+    assert calls == 2
+
+
+def test_cancelled_leader_propagates_cancelled_error_to_followers():
+    cache = SessionCache()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(10 if calls == 1 else 0)
+        return 'session'
+
+    async def scenario():
+        leader = asyncio.create_task(cache.login('a@example.com', 'pw', loader))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(cache.login('a@example.com', 'pw', loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        outcomes = await asyncio.gather(leader, *followers, return_exceptions=True)
+        # Nothing was cached and nothing is left in flight: the next login goes upstream
+        retried = await cache.login('a@example.com', 'pw', loader)
+        return outcomes, retried
+
+    outcomes, retried = asyncio.run(scenario())
+    assert all(isinstance(outcome, asyncio.CancelledError) for outcome in outcomes)
+    assert retried == 'session'
+    assert calls == 2
+    assert cache.stats()['inflight'] == 0
+
+
+def test_cancelled_follower_does_not_cancel_the_login():
+    cache = SessionCache()
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return 'session'
+
+    async def scenario():
+        leader = asyncio.create_task(cache.login('a@example.com', 'pw', loader))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.login('a@example.com', 'pw', loader))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(scenario()) == 'session'
+    assert cache.get_by_credentials('a@example.com', 'pw') == 'session'
+
+
+def test_failed_logins_are_not_cached():
+    cache = SessionCache()
+
+    async def loader():
+        raise PermissionError("bad credentials")
+
+    with pytest.raises(PermissionError):
+        asyncio.run(cache.login('a@example.com', 'pw', loader))
+    assert cache.stats()['size'] == 0
+    assert cache.stats()['inflight'] == 0
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class Upstream:
+    """A call that blocks until released, counting how often it is started."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return f"result {self.calls}"
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        callers = [asyncio.create_task(flight.run('key', upstream)) for _ in range(5)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await asyncio.gather(*callers), upstream.calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ['result 1'] * 5
+    assert calls == 1
+    assert stats == {'started': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_cancelled_leader_does_not_cancel_the_call_for_followers():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        leader = asyncio.create_task(flight.run('key', upstream))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.run('key', upstream)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers), upstream.calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == ['result 1'] * 3
+    assert calls == 1
+
+
+def test_cancelled_call_propagates_cancelled_error_to_every_caller():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        leader = asyncio.create_task(flight.run('key', upstream))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.run('key', upstream)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # The shared call itself goes away (e.g. the loop shutting it down)
+        flight._calls['key'].cancel()
+        outcomes = await asyncio.gather(leader, *followers, return_exceptions=True)
+        # The key is free again: the next caller starts a new call
+        retry = asyncio.create_task(flight.run('key', upstream))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return outcomes, await retry, flight.stats()
+
+    outcomes, retried, stats = asyncio.run(scenario())
+    assert all(isinstance(outcome, asyncio.CancelledError) for outcome in outcomes)
+    assert retried == 'result 2'
+    assert stats == {'started': 2, 'coalesced': 3, 'in_flight': 0}
+
+
+def test_failure_reaches_every_caller_and_is_not_cached():
+    async def scenario():
+        flight = SingleFlight()
+        attempts = 0
+
+        async def failing():
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream down")
+
+        outcomes = await asyncio.gather(*(flight.run('key', failing) for _ in range(3)), return_exceptions=True)
+        outcomes.append(await asyncio.gather(flight.run('key', failing), return_exceptions=True))
+        return outcomes, attempts
+
+    outcomes, attempts = asyncio.run(scenario())
+    assert [str(outcome) for outcome in outcomes[:3]] == ["upstream down"] * 3
+    assert isinstance(outcomes[3][0], RuntimeError)
+    assert attempts == 2
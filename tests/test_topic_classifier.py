@@ -0,0 +1,63 @@
+import random
+import re
+
+import pytest
+
+import qa_data
+from topic_classifier import ROUTER_KEYWORDS, US_PROPERTY_TOPICS, router_topic_classifier, topic_classifier
+
+# Off topic for the router, though they use words of the chatbot's broader vocabulary
+BROAD_TERMS = ["Can I make an offer on this used car?", "What is the value of pi?",
+               "How do I repair my bike?", "Is my credit card contract fair?"]
+OFF_TOPIC = ["Who won the football game last night?", "What's a good pasta recipe?"] + BROAD_TERMS
+
+
+def router_regex(question):
+    """The router's check before it was precompiled."""
+    pattern = r'\b(' + '|'.join(re.escape(k) for k in ROUTER_KEYWORDS) + r')\b'
+    return re.search(pattern, question.lower()) is not None
+
+
+def test_router_check_matches_its_original_keyword_regex():
+    rng = random.Random(5)
+    words = [word for question in qa_data.qa_dict for word in question.split()] + ROUTER_KEYWORDS
+    questions = list(qa_data.qa_dict) + OFF_TOPIC
+    questions += [' '.join(rng.sample(words, 4)) for _ in range(2000)]
+    questions += ["Are these properties cheap?", "How many loans can I take?", "homes", "compliance"]
+    for question in questions:
+        assert router_topic_classifier.is_relevant(question) == router_regex(question), question
+
+
+@pytest.mark.parametrize('question', BROAD_TERMS)
+def test_router_keeps_broad_chatbot_terms_off_topic(question):
+    assert not router_topic_classifier.is_relevant(question)
+    assert topic_classifier.is_relevant(question)
+
+
+def chatbot_substring_scan(question):
+    """The chatbot's relevance check before it was precompiled."""
+    question_lower = question.lower()
+    return any(keyword.lower() in question_lower for keywords in US_PROPERTY_TOPICS.values() for keyword in keywords)
+
+
+@pytest.mark.parametrize('question', [
+    "Is the home valued fairly?", "Who estimated the repairs?", "They offered less than asking",
+    "Is a garage conversion permitted?", "Is the land titled?", "Are the inspectors licensed?",
+    "When is closing?", "Which brokers do you work with?",
+])
+def test_chatbot_check_keeps_inflected_forms(question):
+    assert chatbot_substring_scan(question)
+    assert topic_classifier.is_relevant(question)
+
+
+def test_chatbot_check_agrees_with_its_substring_scan_on_the_dataset():
+    for question in list(qa_data.qa_dict) + OFF_TOPIC:
+        assert topic_classifier.is_relevant(question) == chatbot_substring_scan(question), question
+
+
+def test_chatbot_categories_follow_word_starts():
+    assert topic_classifier.categories("Who are the best brokers for rental properties?") == \
+        ['professional', 'investment']
+    assert topic_classifier.categories("Was it valued before the offer?") == ['valuation', 'transaction']
+    # Only word starts count, unlike the old substring scan
+    assert topic_classifier.categories("Ask the pirates") == []
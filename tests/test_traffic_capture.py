@@ -0,0 +1,97 @@
+import asyncio
+import json
+import queue
+
+import pytest
+
+from traffic_capture import TrafficCapture, TrafficCaptureMiddleware, annotate
+
+
+async def streaming_app(scope, receive, send):
+    """Reads the whole body, annotates the request and streams a two-part response."""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    annotate(match_type='exact')
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'data: {"token": "a"}\n\n', 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def post(capture, path, payload, app=streaming_app):
+    """Sends payload (split in two body messages) through the middleware; returns the queued records."""
+    data = json.dumps(payload).encode()
+    messages = [{'type': 'http.request', 'body': data[:10], 'more_body': True},
+                {'type': 'http.request', 'body': data[10:], 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path}
+    asyncio.run(TrafficCaptureMiddleware(app, capture)(scope, receive, send))
+    assert sent[0]['status'] == 200
+    records = []
+    while True:
+        try:
+            records.append(capture._queue.get_nowait())
+        except queue.Empty:
+            return records
+
+
+@pytest.fixture
+def capture(tmp_path):
+    return TrafficCapture(str(tmp_path / 'traffic.jsonl'), salt='test')
+
+
+def test_streamed_chat_is_captured_sanitized(capture):
+    [record] = post(capture, '/chatbot/chat/stream', {
+        'user_question': 'Call me at 555-123-4567 about loan 12345678', 'conversation_id': 'abc'})
+    assert record['path'] == '/chatbot/chat/stream'
+    assert record['status'] == 200
+    assert record['question'] == 'Call me at <phone> about loan <number>'
+    assert record['conversation'] == capture.pseudonym('c', 'abc')
+    assert record['match_type'] == 'exact'
+
+
+def test_batch_is_captured_with_every_question(capture):
+    [record] = post(capture, '/chatbot/chat/batch', {'questions': ['What is AutoVal?', 'Mail a@b.com']})
+    assert record['questions'] == ['What is AutoVal?', 'Mail <email>']
+
+
+def test_login_keeps_no_credentials(capture):
+    [record] = post(capture, '/auth/login', {'email': 'someone@example.com', 'password': 'secret'})
+    assert record['user'] == capture.pseudonym('u', 'someone@example.com')
+    assert 'secret' not in json.dumps(record) and 'someone' not in json.dumps(record)
+
+
+def test_other_paths_are_not_captured(capture):
+    assert post(capture, '/chatbot/cache/stats', {'x': 1}) == []
+
+
+def test_writer_appends_records_as_jsonl(capture):
+    capture.start()
+    capture.record({'path': '/chatbot/chat', 'question': 'q'})
+    capture.stop()
+    with open(capture.path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'path': '/chatbot/chat', 'question': 'q'}]
+
+
+def test_replay_reads_streamed_and_batch_bodies():
+    from types import SimpleNamespace
+
+    from benchmarks.replay import body_errors, conversation_id_of
+
+    sse = SimpleNamespace(status_code=200, text='event: conversation\ndata: {"conversation_id": "c1"}\n\n'
+                                                 'data: {"token": "Hi"}\n\n'
+                                                 'event: error\ndata: {"detail": "Internal Server Error"}\n\n')
+    ndjson = SimpleNamespace(status_code=200, text='{"index": 0, "response": "a"}\n{"index": 1, "error": "x"}\n')
+    assert conversation_id_of('/chatbot/chat/stream', sse) == 'c1'
+    assert body_errors('/chatbot/chat/stream', sse) == 1
+    assert body_errors('/chatbot/chat/batch', ndjson) == 1
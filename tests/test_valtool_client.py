@@ -0,0 +1,139 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from routers import auth
+from session_cache import SessionCache
+from valtool_client import ValToolClient
+
+LOGIN_RESPONSE = {
+    'waivUser': {'meta': {'token': 'auth-token', 'test_token': 'test-token'},
+                 'data': {'name': 'Ada', 'email': 'ada@example.com', 'phone': '555-0100'}},
+    'waivOrgs': {'data': [{'name': 'WAIV'}, {'name': 'Acme'}]},
+}
+
+
+class ValToolServer:
+    """A keep-alive HTTP/1.1 server answering every request with LOGIN_RESPONSE after delay seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.connections = 0
+        self.bodies = []
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        self.url = f"http://{host}:{port}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = next((int(line.split(b':')[1]) for line in head.split(b'\r\n')
+                               if line.lower().startswith(b'content-length:')), 0)
+                self.bodies.append(json.loads(await reader.readexactly(length)))
+                await asyncio.sleep(self.delay)
+                body = json.dumps(LOGIN_RESPONSE).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+
+def test_logins_reuse_one_keep_alive_connection():
+    async def scenario():
+        async with ValToolServer() as server:
+            client = ValToolClient(server.url)
+            results = [await client.login('ada@example.com', f'pw{i}') for i in range(5)]
+            await client.aclose()
+            return server, results
+
+    server, results = asyncio.run(scenario())
+    assert server.connections == 1
+    assert server.bodies[0] == {'EMail': 'ada@example.com', 'Password': 'pw0'}
+    assert all(data == LOGIN_RESPONSE for data, _ in results)
+
+
+def test_requests_beyond_max_in_flight_time_out_waiting_for_the_pool():
+    async def scenario():
+        async with ValToolServer(delay=0.3) as server:
+            client = ValToolClient(server.url, max_in_flight=1, pool_timeout=0.05)
+            outcomes = await asyncio.gather(client.login('a@example.com', 'pw'), client.login('b@example.com', 'pw'),
+                                            return_exceptions=True)
+            await client.aclose()
+            return outcomes
+
+    outcomes = asyncio.run(scenario())
+    assert sum(isinstance(outcome, httpx.PoolTimeout) for outcome in outcomes) == 1
+    assert sum(isinstance(outcome, tuple) for outcome in outcomes) == 1
+
+
+def test_the_shared_client_is_created_once_per_app():
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace()))
+    client = auth.get_valtool_client(request)
+    assert auth.get_valtool_client(request) is client
+    asyncio.run(client.aclose())
+
+
+class StubValTool:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    async def login(self, email, password):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return LOGIN_RESPONSE, {}
+
+
+@pytest.fixture
+def session_cache(monkeypatch):
+    cache = SessionCache()
+    monkeypatch.setattr(auth, 'session_cache', cache)
+    return cache
+
+
+def test_login_extracts_the_session_and_caches_it(session_cache):
+    valtool = StubValTool()
+    request = auth.AuthRequest(email='ada@example.com', password='pw')
+
+    async def scenario():
+        return [await auth.login(request, valtool) for _ in range(2)]
+
+    first, second = asyncio.run(scenario())
+    assert valtool.calls == 1
+    assert second is first
+    assert (first.auth_token, first.test_token, first.user_name, first.organizations) == \
+        ('auth-token', 'test-token', 'Ada', ['WAIV', 'Acme'])
+    assert session_cache.validate('auth-token') is first
+
+
+def upstream_status(status):
+    request = httpx.Request('POST', 'http://valtool/api/login')
+    return httpx.HTTPStatusError("login failed", request=request, response=httpx.Response(status, request=request))
+
+
+@pytest.mark.parametrize('error, status', [
+    (upstream_status(401), 401),
+    (httpx.PoolTimeout("pool exhausted"), 503),
+    (httpx.ReadTimeout("slow upstream"), 504),
+    (httpx.ConnectError("refused"), 500),
+])
+def test_upstream_failures_map_to_http_errors(session_cache, error, status):
+    valtool = StubValTool(error)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(auth.login(auth.AuthRequest(email='ada@example.com', password='pw'), valtool))
+    assert raised.value.status_code == status
+    assert session_cache.stats()['size'] == 0
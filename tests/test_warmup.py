@@ -0,0 +1,40 @@
+import asyncio
+
+from warmup import Warmup
+
+
+def fail():
+    raise OSError("offline")
+
+
+def run(warmup):
+    asyncio.run(warmup.run())
+    return warmup.status()
+
+
+def test_ready_once_every_step_loaded():
+    status = run(Warmup([('qa_index', lambda: None), ('chatbot', lambda: None)]))
+    assert status['ready']
+    assert {name: c['state'] for name, c in status['components'].items()} == {'qa_index': 'ready', 'chatbot': 'ready'}
+
+
+def test_failed_best_effort_step_does_not_hold_back_readiness():
+    warmup = Warmup([('qa_index', lambda: None), ('token_encoder', fail)], best_effort=['token_encoder'])
+    status = run(warmup)
+    assert status['ready']
+    component = status['components']['token_encoder']
+    assert (component['state'], component['critical']) == ('failed', False)
+    assert component['error'] == "OSError('offline')"
+
+
+def test_failed_critical_step_keeps_the_service_unready():
+    warmup = Warmup([('qa_index', fail), ('token_encoder', lambda: None)], best_effort=['token_encoder'])
+    status = run(warmup)
+    assert not status['ready']
+    assert status['components']['qa_index']['critical']
+
+
+def test_disabled_warmup_is_always_ready():
+    warmup = Warmup([('qa_index', fail)], enabled=False)
+    assert warmup.ready
+    assert warmup.status()['components']['qa_index']['state'] == 'lazy'
@@ -0,0 +1,71 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """tiktoken encoder for model, loaded once per process on first use."""
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class TokenCounter:
+    """
+    Memoized token counts for one model.
+
+    Counts are kept in an LRU keyed by a digest of the content rather than the
+    content itself, so chat history that is resent on every turn is only encoded
+    once and the memo stays small.
+    """
+
+    def __init__(self, model: str, max_entries: int = 50000):
+        self.model = model
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text."""
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached is not None:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return cached
+        tokens = len(get_encoding(self.model).encode(text))
+        with self._lock:
+            self.misses += 1
+            self._counts[key] = tokens
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._counts), 'hits': self.hits, 'misses': self.misses}
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Number of content tokens across messages."""
+        return sum(self.count(message.get('content', '')) for message in messages)
+
+
+@functools.lru_cache(maxsize=None)
+def get_token_counter(model: str) -> TokenCounter:
+    """Shared TokenCounter for model."""
+    return TokenCounter(model)
+
+
+def num_tokens_from_messages(messages, model="gpt-3.5-turbo"):
+    """Returns the number of tokens used by a list of messages."""
+    return get_token_counter(model).count_messages(messages)
@@ -0,0 +1,118 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# Topic vocabulary of IntelligentChatbot. Categories double as intent names (see
+# IntelligentChatbot._extract_intents), so new terms go into an existing category
+# rather than a new one.
+US_PROPERTY_TOPICS: Dict[str, List[str]] = {
+    "market": ["market", "trends", "housing market", "real estate market"],
+    "valuation": ["evaluation", "appraisal", "value", "estimate", "AVM", "FASTR", "AVV", "BPO", "CMA"],
+    "inspection": ["inspection", "home inspection", "property inspection", "condition", "inspector"],
+    "transaction": ["buying", "selling", "offer", "contract", "negotiation", "closing"],
+    "financing": ["mortgage", "rates", "loan", "credit", "pre-approval", "down payment", "refinance"],
+    "ownership": ["property tax", "homeowner's insurance", "insurance", "repair", "maintenance", "HOA"],
+    "investment": ["investment", "rental", "REIT", "investor", "rental property", "income property"],
+    "legal": ["title", "deed", "lien", "zoning", "permit", "occupancy"],
+    "professional": ["broker", "agent", "appraiser", "inspector", "attorney"],
+    "platform": ["Waivit", "Waiv"]  # Keep platform-specific terms separate
+}
+
+# The FastAPI router's narrower check for whether a question goes to OpenAI at all;
+# kept apart from US_PROPERTY_TOPICS so broad words there ("offer", "value") do not
+# send off-topic questions upstream
+ROUTER_KEYWORDS: List[str] = [
+    'property', 'real estate', 'us market', 'waivio', 'autoval',
+    'fastr', 'inspection', 'avm', 'appraisal', 'valuation',
+    'mortgage', 'home', 'loan', 'housing', 'estate', 'comp',
+    'comparable', 'rent', 'land', 'broker', 'agent',
+    'market trends', 'equity', 'mortgage rates'
+]
+
+
+def _surface_forms(keyword: str) -> List[str]:
+    # Plurals of the last word: -s, -es (and -ed, -ing, ...) are words the keyword starts; -y -> -ies is not
+    forms = [keyword]
+    if keyword.endswith('y') and len(keyword) > 2 and keyword[-2] not in 'aeiou':
+        forms.append(keyword[:-1] + 'ies')
+    return forms
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation over words with shared prefixes factored out
+    ("loan|lien|land" -> "l(?:oan|ien|and)"), so the engine follows one branch per
+    character instead of retrying every keyword at every position.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def emit(node) -> str:
+        ends_here = '' in node
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f"(?:{body})?" if ends_here else body
+
+    return emit(trie)
+
+
+class TopicClassifier:
+    """
+    Precompiled multi-keyword matcher over a topic vocabulary.
+
+    All keywords are compiled into one prefix-factored regex, so one finditer pass
+    over the question yields every matched keyword and its categories. By default
+    a keyword matches at the start of a word, so inflections count too ("valued",
+    "offered", "inspectors"); with whole_words it must be the entire word.
+    """
+
+    def __init__(self, topics: Dict[str, List[str]], whole_words: bool = False):
+        self.topics = topics
+        self.keyword_to_categories: Dict[str, List[str]] = {}
+        for category, keywords in topics.items():
+            for keyword in keywords:
+                categories = self.keyword_to_categories.setdefault(keyword.lower(), [])
+                if category not in categories:
+                    categories.append(category)
+        self.form_to_keyword: Dict[str, str] = {
+            form: keyword for keyword in self.keyword_to_categories
+            for form in ([keyword] if whole_words else _surface_forms(keyword))
+        }
+        end = r"\b" if whole_words else ""
+        self.pattern = re.compile(r"\b(" + _trie_pattern(self.form_to_keyword) + r")" + end)
+
+    def matches(self, text: str) -> List[Tuple[str, List[str]]]:
+        """(keyword, categories) for every keyword occurrence in text, in order."""
+        return [(self.form_to_keyword[m.group(1)], self.keyword_to_categories[self.form_to_keyword[m.group(1)]])
+                for m in self.pattern.finditer(text.lower())]
+
+    def categories(self, text: str) -> List[str]:
+        """Distinct categories matched in text, in order of first occurrence."""
+        found: List[str] = []
+        for _, categories in self.matches(text):
+            for category in categories:
+                if category not in found:
+                    found.append(category)
+        return found
+
+    def first_match(self, text: str):
+        """(keyword, categories) of the first keyword in text, or None."""
+        match = self.pattern.search(text.lower())
+        if match is None:
+            return None
+        keyword = self.form_to_keyword[match.group(1)]
+        return keyword, self.keyword_to_categories[keyword]
+
+    def is_relevant(self, text: str) -> bool:
+        """True if text mentions any topic keyword."""
+        return self.pattern.search(text.lower()) is not None
+
+
+topic_classifier = TopicClassifier(US_PROPERTY_TOPICS)
+# Exact whole words, as the router always matched them
+router_topic_classifier = TopicClassifier({'us_property': ROUTER_KEYWORDS}, whole_words=True)
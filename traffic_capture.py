@@ -0,0 +1,224 @@
+"""
+Opt-in capture of chat (/chatbot/chat, /chatbot/chat/stream, /chatbot/chat/batch)
+and /auth/login traffic to JSONL, for replay with benchmarks/replay.py.
+
+Enabled by TRAFFIC_CAPTURE_PATH; off by default. Each captured request becomes
+one line:
+
+    {"ts": 1760774400.123, "path": "/chatbot/chat", "status": 200, "duration_ms": 412.5,
+     "question": "...", "conversation": "c-1f2e...", "history_turns": 0, "match_type": "partial"}
+    {"ts": 1760774400.789, "path": "/chatbot/chat/batch", "status": 200, "duration_ms": 950.2,
+     "questions": ["...", "..."], "match_types": {"exact": 1, "partial": 1}}
+    {"ts": 1760774401.456, "path": "/auth/login", "status": 200, "duration_ms": 88.1, "user": "u-9a0b..."}
+
+Records are sanitized before they are queued: passwords are never kept, emails
+and conversation ids are replaced by keyed pseudonyms (stable within one
+TRAFFIC_CAPTURE_SALT, so repeat users and conversations stay recognizable), and
+emails, phone numbers and long digit runs inside questions are masked.
+
+Request handling only appends to an in-memory queue; a background thread writes
+batches to a buffered file and flushes every TRAFFIC_CAPTURE_FLUSH_INTERVAL
+seconds. When the queue (TRAFFIC_CAPTURE_QUEUE_SIZE) is full, records are dropped
+rather than slowing requests down.
+"""
+import atexit
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CAPTURED_PATHS = frozenset({'/chatbot/chat', '/chatbot/chat/stream', '/chatbot/chat/batch', '/auth/login'})
+# Request bodies larger than this are not captured (nor buffered for capture)
+MAX_BODY_BYTES = 64 * 1024
+
+_EMAIL = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+_PHONE = re.compile(r'(?<!\w)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\w)')
+_DIGITS = re.compile(r'\d{6,}')
+
+# Fields the request handlers add to the current request's capture record (see annotate)
+_annotations: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar('traffic_annotations', default=None)
+
+
+def annotate(**fields):
+    """Adds fields (e.g. match_type) to the capture record of the request being handled, if any."""
+    annotations = _annotations.get()
+    if annotations is not None:
+        annotations.update(fields)
+
+
+def mask_text(text: str) -> str:
+    """Masks emails, phone numbers and long digit runs (account, loan or SSN numbers)."""
+    text = _EMAIL.sub('<email>', text)
+    text = _PHONE.sub('<phone>', text)
+    return _DIGITS.sub('<number>', text)
+
+
+class TrafficCapture:
+    """Queue plus background writer for sanitized request records."""
+
+    def __init__(self, path: str, salt: Optional[str] = None, sample_rate: float = 1.0,
+                 flush_interval: float = 1.0, batch_size: int = 256, max_queue: int = 10000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._salt = (salt or secrets.token_hex(16)).encode('utf-8')
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['TrafficCapture']:
+        path = os.getenv('TRAFFIC_CAPTURE_PATH')
+        if not path:
+            return None
+        return cls(
+            path,
+            salt=os.getenv('TRAFFIC_CAPTURE_SALT'),
+            sample_rate=float(os.getenv('TRAFFIC_CAPTURE_SAMPLE', '1')),
+            flush_interval=float(os.getenv('TRAFFIC_CAPTURE_FLUSH_INTERVAL', '1')),
+            max_queue=int(os.getenv('TRAFFIC_CAPTURE_QUEUE_SIZE', '10000')),
+        )
+
+    def pseudonym(self, prefix: str, value: str) -> str:
+        digest = hmac.new(self._salt, value.strip().lower().encode('utf-8'), hashlib.blake2b).hexdigest()
+        return f"{prefix}-{digest[:16]}"
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def sanitize(self, path: str, body: Dict) -> Dict:
+        """The replayable, PII-free part of a request body."""
+        if path == '/auth/login':
+            return {'user': self.pseudonym('u', str(body.get('email', '')))}
+        if path == '/chatbot/chat/batch':
+            questions = body.get('questions')
+            return {'questions': [mask_text(str(question)) for question in questions]
+                    if isinstance(questions, list) else []}
+        record = {'question': mask_text(str(body.get('user_question', '')))}
+        if body.get('conversation_id'):
+            record['conversation'] = self.pseudonym('c', str(body['conversation_id']))
+        record['history_turns'] = len(body.get('chat_history') or [])
+        return record
+
+    def record(self, record: Dict):
+        """Queues one record without blocking; drops it if the writer is behind."""
+        try:
+            self._queue.put_nowait(record)
+            self.captured += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='traffic-capture', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Writes out everything queued and stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8', buffering=1024 * 1024) as f:
+            while True:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    f.flush()
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = None in batch
+                lines = [json.dumps(record, ensure_ascii=False) + '\n' for record in batch if record is not None]
+                f.writelines(lines)
+                self.written += len(lines)
+                if stopping:
+                    f.flush()
+                    return
+
+    def stats(self) -> Dict[str, int]:
+        return {'captured': self.captured, 'written': self.written, 'dropped': self.dropped,
+                'queued': self._queue.qsize()}
+
+
+class TrafficCaptureMiddleware:
+    """
+    ASGI middleware recording CAPTURED_PATHS requests to a TrafficCapture. The
+    request body is teed as the app reads it, so nothing is parsed twice and the
+    app sees the original stream; the record is built after the response is sent.
+    """
+
+    def __init__(self, app, capture: TrafficCapture):
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] not in CAPTURED_PATHS
+                or not self.capture.sampled()):
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        size = 0
+        status = None
+        started = time.perf_counter()
+        ts = time.time()
+        annotations: Dict = {}
+        token = _annotations.set(annotations)
+
+        async def tee_receive():
+            nonlocal size
+            message = await receive()
+            if message['type'] == 'http.request' and size <= MAX_BODY_BYTES:
+                body = message.get('body', b'')
+                size += len(body)
+                chunks.append(body)
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, tee_receive, capture_send)
+        finally:
+            _annotations.reset(token)
+            duration_ms = (time.perf_counter() - started) * 1000
+            if size <= MAX_BODY_BYTES:
+                self._record(scope['path'], b''.join(chunks), status, ts, duration_ms, annotations)
+
+    def _record(self, path: str, body: bytes, status: Optional[int], ts: float, duration_ms: float,
+                annotations: Dict):
+        try:
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                return
+            record = {'ts': round(ts, 3), 'path': path, 'status': status, 'duration_ms': round(duration_ms, 2),
+                      **self.capture.sanitize(path, payload), **annotations}
+        except (ValueError, TypeError):
+            # Not JSON; the app has already answered it with a 422
+            return
+        self.capture.record(record)
@@ -0,0 +1,60 @@
+import os
+import time
+from typing import Dict, Tuple
+
+import httpx
+
+from metrics import VALTOOL_LOGIN_SECONDS
+
+
+class ValToolClient:
+    """
+    Shared async client for the ValTool API.
+
+    One httpx.AsyncClient is created per process (in the app lifespan) so logins
+    reuse pooled keep-alive connections instead of paying a TCP+TLS handshake
+    each time. max_in_flight caps concurrent upstream requests; callers beyond it
+    wait up to pool_timeout seconds for a connection and then get httpx.PoolTimeout.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10.0, connect_timeout: float = 3.0,
+                 pool_timeout: float = 2.0, max_in_flight: int = 100, max_keepalive: int = 20,
+                 keepalive_expiry: float = 60.0):
+        self.base_url = base_url
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={'Content-Type': 'application/json'},
+            timeout=httpx.Timeout(timeout, connect=connect_timeout, pool=pool_timeout),
+            limits=httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_keepalive,
+                                keepalive_expiry=keepalive_expiry),
+        )
+
+    @classmethod
+    def from_env(cls) -> 'ValToolClient':
+        return cls(
+            os.getenv('VALTOOL_API_URL', ''),
+            timeout=float(os.getenv('VALTOOL_TIMEOUT', '10')),
+            connect_timeout=float(os.getenv('VALTOOL_CONNECT_TIMEOUT', '3')),
+            pool_timeout=float(os.getenv('VALTOOL_POOL_TIMEOUT', '2')),
+            max_in_flight=int(os.getenv('VALTOOL_MAX_IN_FLIGHT', '100')),
+            max_keepalive=int(os.getenv('VALTOOL_MAX_KEEPALIVE', '20')),
+        )
+
+    async def login(self, email: str, password: str) -> Tuple[Dict, Dict[str, str]]:
+        """
+        Posts credentials to /api/login and returns (response JSON, cookies).
+        Raises httpx.HTTPStatusError for non-2xx responses.
+        """
+        started = time.perf_counter()
+        try:
+            response = await self._client.post('/api/login', json={'EMail': email, 'Password': password})
+        except httpx.HTTPError as e:
+            VALTOOL_LOGIN_SECONDS.observe(time.perf_counter() - started, type(e).__name__)
+            raise
+        VALTOOL_LOGIN_SECONDS.observe(time.perf_counter() - started, f"{response.status_code // 100}xx")
+        response.raise_for_status()
+        return response.json(), dict(response.cookies)
+
+    async def aclose(self):
+        await self._client.aclose()
+
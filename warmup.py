@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Step = Tuple[str, Callable[[], object]]
+
+# Steps the API router serves fine without (e.g. tiktoken offline, or no spaCy model):
+# they are retried lazily by the code that needs them, and do not hold back /ready
+BEST_EFFORT_STEPS = ('token_encoder', 'intent_extractor')
+
+
+def default_steps() -> List[Step]:
+    """The chatbot resources that are otherwise loaded by the first request that needs them."""
+    from chatbot import get_chatbot
+    from openai_gateway import get_openai_client
+    from qa_index import get_qa_index
+    from token_budget import get_encoding
+
+    return [
+        ('qa_index', get_qa_index),
+        ('chatbot', get_chatbot),
+        ('token_encoder', lambda: get_encoding(get_chatbot().model)),
+        ('openai_client', get_openai_client),
+        ('intent_extractor', lambda: get_chatbot().intent_extractor.extract('market')),
+    ]
+
+
+class Warmup:
+    """
+    Loads heavy resources in background threads at startup so the first requests
+    do not pay for them. Steps run concurrently and the server keeps accepting
+    requests meanwhile; status() reports per-step progress for the readiness probe.
+    Only critical steps (all but best_effort) gate readiness.
+    """
+
+    def __init__(self, steps: List[Step], enabled: bool = True, best_effort: Iterable[str] = ()):
+        self.steps = steps
+        self.enabled = enabled
+        self.best_effort = frozenset(best_effort)
+        self.states: Dict[str, str] = {name: 'pending' if enabled else 'lazy' for name, _ in steps}
+        self.durations: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> 'Warmup':
+        enabled = os.getenv('STARTUP_WARMUP', 'true').lower() not in ('0', 'false', 'no')
+        return cls(default_steps(), enabled=enabled, best_effort=BEST_EFFORT_STEPS)
+
+    def start(self):
+        """Schedules the warm-up on the running event loop (no-op when disabled)."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_step(name, load) for name, load in self.steps))
+        logger.info("Warm-up finished in %.2fs: %s", time.perf_counter() - started, self.states)
+
+    async def _run_step(self, name: str, load: Callable[[], object]):
+        self.states[name] = 'loading'
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(load)
+        except Exception as e:
+            # The resource is retried lazily by the next request that needs it
+            self.states[name] = 'failed'
+            self.errors[name] = repr(e)
+            logger.exception("Warm-up step %s failed", name)
+        else:
+            self.states[name] = 'ready'
+        self.durations[name] = time.perf_counter() - started
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def ready(self) -> bool:
+        """True once every critical step has loaded, or always when warm-up is disabled."""
+        return not self.enabled or all(state == 'ready' for name, state in self.states.items()
+                                       if name not in self.best_effort)
+
+    def status(self) -> Dict:
+        return {
+            'ready': self.ready,
+            'warmup': self.enabled,
+            'components': {
+                name: {'state': state, 'critical': name not in self.best_effort,
+                       'seconds': self.durations.get(name), 'error': self.errors.get(name)}
+                for name, state in self.states.items()
+            },
+        }